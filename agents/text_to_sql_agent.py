@@ -57,7 +57,12 @@ SCHEMA = yaml.dump(
     default_flow_style=False,
     sort_keys=False
 )
-vis_template_json = json.dumps(metadata.get("visualized_template", []), ensure_ascii=False, indent=2)
+# sql_multi được sql_flow thực thi trực tiếp với bind params, không đưa vào prompt
+vis_template_json = json.dumps(
+    [{k: v for k, v in t.items() if k != "sql_multi"} for t in metadata.get("visualized_template", [])],
+    ensure_ascii=False,
+    indent=2
+)
 
 ERROR_MESSAGES = {
     "missing_date": "Cannot generate SQL: missing date information",
@@ -128,6 +133,35 @@ Examples:
         debug_mode=True,
     )
 
+def select_template(templates: list, sub_query: str) -> dict:
+    """Chọn template đầu tiên có intent_keywords xuất hiện trong query."""
+    query_lower = sub_query.lower()
+    for t in templates:
+        for keyword in t.get('intent_keywords', []):
+            if keyword in query_lower:
+                return t
+    return None
+
+def build_multi_ticker_query(template: dict, tickers: list, date_range: dict = None) -> tuple:
+    """Tạo câu SQL dạng multi-symbol (symbol = ANY(:tickers)) và bind params cho toàn bộ danh sách tickers."""
+    params = {
+        'tickers': [t.upper() for t in tickers],
+        'start_date': date_range['start_date'] if date_range else '2024-01-01',
+        'end_date': date_range['end_date'] if date_range else '2024-12-31',
+    }
+    sql_query = re.sub(r'\s+', ' ', template['sql_multi']).strip()
+    return sql_query, params
+
+def inline_params(sql_query: str, params: dict) -> str:
+    """Nhúng bind params vào câu SQL (dùng khi chỉ trả về chuỗi SQL)."""
+    def to_literal(value):
+        if isinstance(value, (list, tuple)):
+            return "ARRAY[" + ",".join(to_literal(v) for v in value) + "]"
+        return "'" + str(value).replace("'", "''") + "'"
+    for name, value in params.items():
+        sql_query = re.sub(rf'(?<!:):{name}\b', lambda _: to_literal(value), sql_query)
+    return sql_query
+
 def run_with_fallback(self, sub_query: str, metadata: dict = None) -> str:
     logger.info(f"Received sub_query: {sub_query}, metadata: {metadata}")
     try:
@@ -136,15 +170,8 @@ def run_with_fallback(self, sub_query: str, metadata: dict = None) -> str:
         date_range = metadata.get('date_range', None)
 
         # Select template based on query
-        template = None
         query_lower = sub_query.lower()
-        for t in templates:
-            for keyword in t.get('intent_keywords', []):
-                if keyword in query_lower:
-                    template = t
-                    break
-            if template:
-                break
+        template = select_template(templates, sub_query)
 
         if not template:
             logger.error("No template found for query")
@@ -161,8 +188,12 @@ def run_with_fallback(self, sub_query: str, metadata: dict = None) -> str:
             'end_date': date_range['end_date'] if date_range else '2024-12-31',
         }
 
+        # Nhiều tickers: dùng dạng multi-symbol để lấy tất cả trong một query
+        if len(tickers) > 1 and 'sql_multi' in template:
+            sql_query, multi_params = build_multi_ticker_query(template, tickers, date_range)
+            sql_query = inline_params(sql_query, multi_params)
         # Handle case where no tickers are provided
-        if not tickers and '{ticker}' in template['sql']:
+        elif not tickers and '{ticker}' in template['sql']:
             company_name = query_lower.replace('.', '').replace(',', '').replace('the ', '')
             # Danh sách công ty ngắn gọn cho regex
             company_names = [
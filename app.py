@@ -5,6 +5,8 @@ import asyncio
 import json
 import queue
 import re
+import threading
+import time
 from agents.orchestrator import create_orchestrator
 from agents.text_to_sql_agent import create_text_to_sql_agent
 from agents.chat_completion_agent import create_chat_completion_agent
@@ -14,6 +16,9 @@ from tools.rag_tool import CustomRAGTool
 from flow.orchestrator_flow import orchestrator_flow
 from utils.logging import setup_logging, get_collected_logs
 from utils.company_mapping import build_company_mapping
+from config.env import REQUEST_TIMEOUT_S, INGEST_WORKER_ENABLED
+from tools.ingest_worker import read_ingest_status, start_ingest_process
+from utils.db import get_pool_metrics
 from pydantic import BaseModel
 import uvicorn
 
@@ -29,6 +34,24 @@ orchestrator = create_orchestrator()
 sql_tool = CustomSQLTool()
 rag_tool = CustomRAGTool()
 
+# Worker nạp tài liệu chạy trong process riêng (nice) để OCR/embedding không tranh CPU với query
+ingest_process = None
+
+@app.on_event("startup")
+async def start_ingest_worker():
+    global ingest_process
+    if INGEST_WORKER_ENABLED:
+        ingest_process = start_ingest_process()
+
+@app.on_event("shutdown")
+async def stop_ingest_worker():
+    if ingest_process is not None and ingest_process.poll() is None:
+        ingest_process.terminate()
+        try:
+            await asyncio.to_thread(ingest_process.wait, 30)
+        except Exception:
+            ingest_process.kill()
+
 # Load valid companies from company_mapping
 VALID_COMPANIES = build_company_mapping()
 
@@ -50,7 +73,10 @@ def normalize_company_name(query):
     logger.info(f"Normalized query: {standardized_query}")
     return standardized_query
 
-async def process_query_generator(query: str):
+async def process_query_generator(query: str, request: Request = None):
+    # Hủy query SQL đang chạy khi client ngắt kết nối hoặc request quá hạn
+    cancel_event = threading.Event()
+    deadline = time.monotonic() + REQUEST_TIMEOUT_S
     try:
         logger.info(f"Received query: {query}")
         normalized_query = normalize_company_name(query)
@@ -65,11 +91,17 @@ async def process_query_generator(query: str):
                 sql_tool,
                 rag_tool,
                 chat_completion_agent,
-                thinking_queue=thinking_queue
+                thinking_queue=thinking_queue,
+                deadline=deadline,
+                cancel_event=cancel_event
             )
 
         task = asyncio.create_task(run_orchestrator())
         while not task.done():
+            if request is not None and await request.is_disconnected():
+                logger.warning(f"Client disconnected, cancelling query: {query}")
+                cancel_event.set()
+                return
             try:
                 message = thinking_queue.get_nowait()
                 yield f"event: thinking\ndata: {json.dumps({'message': message}, ensure_ascii=False)}\n\n"
@@ -87,11 +119,14 @@ async def process_query_generator(query: str):
     except Exception as e:
         logger.error(f"Error in process_query_generator: {str(e)}")
         yield f"event: error\ndata: {json.dumps({'message': f'Internal server error: {str(e)}'}, ensure_ascii=False)}\n\n"
+    finally:
+        # Generator bị đóng khi client ngắt kết nối giữa chừng
+        cancel_event.set()
 
 @app.get("/process_query")
 async def process_query(request: Request, query: str):
     logger.info(f"Accessing /process_query with query: {query}")
-    return StreamingResponse(process_query_generator(query), media_type="text/event-stream")
+    return StreamingResponse(process_query_generator(query, request), media_type="text/event-stream")
 
 class QueryRequest(BaseModel):
     query: str
@@ -100,7 +135,9 @@ class QueryRequest(BaseModel):
 async def query_team(request: QueryRequest):
     logger.info(f"Received query for Agent Team: {request.query}")
     normalized_query = normalize_company_name(request.query)
-    response = orchestrator_flow(normalized_query, orchestrator, text_to_sql_agent, sql_tool, rag_tool, chat_completion_agent)
+    deadline = time.monotonic() + REQUEST_TIMEOUT_S
+    # Chạy trên thread pool như /process_query: không chặn event loop, các RAG query đồng thời được micro-batch
+    response = await asyncio.to_thread(orchestrator_flow, normalized_query, orchestrator, text_to_sql_agent, sql_tool, rag_tool, chat_completion_agent, deadline=deadline)
 
     if response["status"] == "error" or response["data"].get("result") is None or not response["data"]["result"]:
         response = {
@@ -112,5 +149,17 @@ async def query_team(request: QueryRequest):
 
     return {"response": json.dumps(response, ensure_ascii=False)}
 
+@app.get("/metrics")
+async def metrics():
+    # Pool connection theo engine (serving / ingest / replica), tỉ lệ hit của embedding cache và kích thước micro-batch RAG
+    metrics = {"pool": get_pool_metrics()}
+    if rag_tool.embedding_cache is not None:
+        metrics["embedding_cache"] = rag_tool.embedding_cache.stats()
+    if rag_tool.query_batcher is not None:
+        metrics["rag_batching"] = rag_tool.batching_stats()
+    if INGEST_WORKER_ENABLED:
+        metrics["ingest"] = read_ingest_status()
+    return metrics
+
 if __name__ == "__main__":
     uvicorn.run(app, host="0.0.0.0", port=8010)
\ No newline at end of file
@@ -12,4 +12,113 @@ GROQ_MODEL = os.getenv("GROQ_MODEL", "llama-3.1-8b-instant")
 QDRANT_HOST = os.getenv("QDRANT_HOST", "localhost")
 QDRANT_PORT = int(os.getenv("QDRANT_PORT", 6333))
 RAG_DATA_DIR = os.getenv("RAG_DATA_DIR", os.path.join(BASE_DIR, "data", "rag_documents"))
-MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY", "")
\ No newline at end of file
+MISTRAL_API_KEY = os.getenv("MISTRAL_API_KEY", "")
+
+# Giới hạn thực thi cho câu SQL do LLM sinh ra
+SQL_STATEMENT_TIMEOUT_MS = int(os.getenv("SQL_STATEMENT_TIMEOUT_MS", 15000))
+SQL_EXPLAIN_GUARD = os.getenv("SQL_EXPLAIN_GUARD", "true").lower() == "true"
+SQL_MAX_PLAN_COST = float(os.getenv("SQL_MAX_PLAN_COST", 1000000))
+SQL_MAX_PLAN_ROWS = int(os.getenv("SQL_MAX_PLAN_ROWS", 500000))
+REQUEST_TIMEOUT_S = float(os.getenv("REQUEST_TIMEOUT_S", 90))
+
+# SQL backend: postgres (mặc định) hoặc duckdb (in-process trên Parquet)
+SQL_BACKEND = os.getenv("SQL_BACKEND", "postgres").lower()
+PARQUET_DIR = os.getenv("PARQUET_DIR", os.path.join(BASE_DIR, "data", "parquet"))
+DUCKDB_THREADS = int(os.getenv("DUCKDB_THREADS", 0))
+
+# Price store memory-mapped phục vụ các template time-series trước khi fallback về SQL
+PRICE_STORE_DIR = os.getenv("PRICE_STORE_DIR", os.path.join(BASE_DIR, "data", "price_store"))
+PRICE_STORE_ENABLED = os.getenv("PRICE_STORE_ENABLED", "true").lower() == "true"
+
+# Engine profiles: serving (query người dùng) và ingest (download/upsert hàng loạt)
+DATABASE_REPLICA_URL = os.getenv("DATABASE_REPLICA_URL", "")
+SQL_POOL_SIZE = int(os.getenv("SQL_POOL_SIZE", 5))
+SQL_MAX_OVERFLOW = int(os.getenv("SQL_MAX_OVERFLOW", 5))
+SQL_POOL_TIMEOUT_S = float(os.getenv("SQL_POOL_TIMEOUT_S", 5))
+SQL_CONNECT_TIMEOUT_S = int(os.getenv("SQL_CONNECT_TIMEOUT_S", 5))
+INGEST_POOL_SIZE = int(os.getenv("INGEST_POOL_SIZE", 2))
+INGEST_STATEMENT_TIMEOUT_MS = int(os.getenv("INGEST_STATEMENT_TIMEOUT_MS", 0))
+
+# Số process OCR song song khi nạp tài liệu RAG
+OCR_WORKERS = int(os.getenv("OCR_WORKERS", os.cpu_count() or 1))
+RAG_MANIFEST_PATH = os.getenv("RAG_MANIFEST_PATH", os.path.join(BASE_DIR, "data", "rag_manifest.json"))
+# Trang có text layer ít hơn ngưỡng này (ký tự) sẽ được OCR
+TEXT_LAYER_MIN_CHARS = int(os.getenv("TEXT_LAYER_MIN_CHARS", 200))
+# Rasterize trang cần OCR (từng trang một, qua file tạm): DPI, grayscale và số trang tối đa đọc từ mỗi PDF (0 = không giới hạn)
+OCR_DPI = int(os.getenv("OCR_DPI", 200))
+OCR_GRAYSCALE = os.getenv("OCR_GRAYSCALE", "true").lower() == "true"
+PDF_PAGE_BUDGET = int(os.getenv("PDF_PAGE_BUDGET", 100))
+# Cache text OCR theo hash ảnh trang; vượt OCR_CACHE_MAX_MB thì xóa các trang lâu không dùng nhất (0 = không giới hạn)
+OCR_CACHE_ENABLED = os.getenv("OCR_CACHE_ENABLED", "true").lower() == "true"
+OCR_CACHE_DIR = os.getenv("OCR_CACHE_DIR", os.path.join(BASE_DIR, "data", "ocr_cache"))
+OCR_CACHE_MAX_MB = int(os.getenv("OCR_CACHE_MAX_MB", 1024))
+
+# Pipeline nạp tài liệu RAG: kích thước batch encode và số batch tối đa chờ giữa các stage
+EMBED_BATCH_SIZE = int(os.getenv("EMBED_BATCH_SIZE", 64))
+PIPELINE_QUEUE_BATCHES = int(os.getenv("PIPELINE_QUEUE_BATCHES", 4))
+# Chunk theo token của embedding model (all-MiniLM-L6-v2 cắt ở 256 token, gồm [CLS]/[SEP])
+CHUNK_MAX_TOKENS = int(os.getenv("CHUNK_MAX_TOKENS", 240))
+CHUNK_OVERLAP_TOKENS = int(os.getenv("CHUNK_OVERLAP_TOKENS", 32))
+
+# Cache embedding trên đĩa (chunk) và LRU trong bộ nhớ (query)
+EMBEDDING_CACHE_ENABLED = os.getenv("EMBEDDING_CACHE_ENABLED", "true").lower() == "true"
+EMBEDDING_CACHE_DIR = os.getenv("EMBEDDING_CACHE_DIR", os.path.join(BASE_DIR, "data", "embedding_cache"))
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", 1024))
+
+# Hybrid search: dense + sparse (lexical) gộp bằng reciprocal rank fusion
+HYBRID_SEARCH_ENABLED = os.getenv("HYBRID_SEARCH_ENABLED", "true").lower() == "true"
+HYBRID_PREFETCH_LIMIT = int(os.getenv("HYBRID_PREFETCH_LIMIT", 20))
+# Profile của collection financial_docs: default | int8 | binary | low_memory (xem utils/qdrant_schema.py)
+QDRANT_COLLECTION_PROFILE = os.getenv("QDRANT_COLLECTION_PROFILE", "default")
+
+# Vector backend: qdrant (server) hoặc embedded (index trong process, memory-mapped trong EMBEDDED_INDEX_DIR)
+VECTOR_BACKEND = os.getenv("VECTOR_BACKEND", "qdrant").lower()
+EMBEDDED_INDEX_DIR = os.getenv("EMBEDDED_INDEX_DIR", os.path.join(BASE_DIR, "data", "vector_index"))
+# Dưới ngưỡng này (số row) embedded index search chính xác; lớn hơn thì dùng IVF do populate_rag.py build
+EMBEDDED_EXACT_MAX_ROWS = int(os.getenv("EMBEDDED_EXACT_MAX_ROWS", 50000))
+IVF_NPROBE = int(os.getenv("IVF_NPROBE", 16))
+
+# Runtime của embedding model: torch | onnx | onnx_int8 (ONNX Runtime, weight quantize int8), 0 thread = mặc định của runtime
+EMBEDDING_RUNTIME = os.getenv("EMBEDDING_RUNTIME", "torch").lower()
+EMBEDDING_THREADS = int(os.getenv("EMBEDDING_THREADS", 0))
+EMBEDDING_ONNX_DIR = os.getenv("EMBEDDING_ONNX_DIR", os.path.join(BASE_DIR, "data", "onnx_models"))
+EMBEDDING_WARMUP = os.getenv("EMBEDDING_WARMUP", "true").lower() == "true"
+
+# Micro-batching query embedding và vector search giữa các request RAG đồng thời
+MICRO_BATCH_ENABLED = os.getenv("MICRO_BATCH_ENABLED", "true").lower() == "true"
+MICRO_BATCH_MAX_SIZE = int(os.getenv("MICRO_BATCH_MAX_SIZE", 64))
+MICRO_BATCH_WAIT_MS = float(os.getenv("MICRO_BATCH_WAIT_MS", 3))
+
+# Bảng financial_facts: chỉ số tài chính trích xuất từ tài liệu RAG lúc ingest
+FACTS_STORE_ENABLED = os.getenv("FACTS_STORE_ENABLED", "true").lower() == "true"
+
+# Đa dạng hóa kết quả RAG: lấy RAG_MMR_CANDIDATES ứng viên kèm vector, bỏ chunk gần trùng (MinHash) rồi chọn top theo MMR
+RAG_MMR_ENABLED = os.getenv("RAG_MMR_ENABLED", "true").lower() == "true"
+RAG_MMR_CANDIDATES = int(os.getenv("RAG_MMR_CANDIDATES", 20))
+RAG_MMR_LAMBDA = float(os.getenv("RAG_MMR_LAMBDA", 0.7))
+RAG_DUPLICATE_THRESHOLD = float(os.getenv("RAG_DUPLICATE_THRESHOLD", 0.8))
+
+# Retrieval hai tầng: chọn tối đa RAG_CANDIDATE_DOCUMENTS tài liệu qua vector tóm tắt (tài liệu + section RAG_SECTION_CHUNKS chunk),
+# rồi chỉ search chunk trong các tài liệu đó; mỗi tài liệu góp tối đa RAG_MAX_CHUNKS_PER_DOCUMENT kết quả
+RAG_TWO_STAGE_ENABLED = os.getenv("RAG_TWO_STAGE_ENABLED", "true").lower() == "true"
+RAG_CANDIDATE_DOCUMENTS = int(os.getenv("RAG_CANDIDATE_DOCUMENTS", 10))
+RAG_SECTION_CHUNKS = int(os.getenv("RAG_SECTION_CHUNKS", 8))
+RAG_MAX_CHUNKS_PER_DOCUMENT = int(os.getenv("RAG_MAX_CHUNKS_PER_DOCUMENT", 2))
+
+# Ingest nền: theo dõi RAG_DATA_DIR (poll), nạp file mới/đổi sau khi ổn định INGEST_DEBOUNCE_S giây,
+# trong process riêng có nice, ít thread embedding và ít process OCR để không ảnh hưởng latency phục vụ
+INGEST_WORKER_ENABLED = os.getenv("INGEST_WORKER_ENABLED", "false").lower() == "true"
+INGEST_POLL_INTERVAL_S = float(os.getenv("INGEST_POLL_INTERVAL_S", 10))
+INGEST_DEBOUNCE_S = float(os.getenv("INGEST_DEBOUNCE_S", 30))
+INGEST_MAX_FILES_PER_RUN = int(os.getenv("INGEST_MAX_FILES_PER_RUN", 4))
+INGEST_WORKER_OCR_WORKERS = int(os.getenv("INGEST_WORKER_OCR_WORKERS", 1))
+INGEST_WORKER_THREADS = int(os.getenv("INGEST_WORKER_THREADS", 1))
+INGEST_WORKER_NICE = int(os.getenv("INGEST_WORKER_NICE", 10))
+INGEST_STATUS_PATH = os.getenv("INGEST_STATUS_PATH", os.path.join(BASE_DIR, "data", "ingest_status.json"))
+
+# Job table SQLite (cạnh RAG manifest) lưu checkpoint từng file (text trích xuất, chunk, embedding) để chạy lại tiếp từ chỗ dừng;
+# mỗi worker nhận INGEST_JOB_CLAIM_FILES file một lượt, claim hết hạn sau INGEST_JOB_LEASE_S giây, file lỗi được thử tối đa INGEST_JOB_MAX_ATTEMPTS lần
+INGEST_JOBS_ENABLED = os.getenv("INGEST_JOBS_ENABLED", "true").lower() == "true"
+INGEST_JOB_CLAIM_FILES = int(os.getenv("INGEST_JOB_CLAIM_FILES", 8))
+INGEST_JOB_LEASE_S = float(os.getenv("INGEST_JOB_LEASE_S", 1800))
+INGEST_JOB_MAX_ATTEMPTS = int(os.getenv("INGEST_JOB_MAX_ATTEMPTS", 3))
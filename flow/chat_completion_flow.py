@@ -4,6 +4,7 @@ import yaml
 from pathlib import Path
 from phi.agent import Agent, RunResponse
 from utils.logging import setup_logging
+from utils.financial_facts import prepare_rag_summary
 import re
 
 BASE_DIR = Path(__file__).resolve().parent.parent
@@ -17,41 +18,6 @@ def load_config() -> dict:
     logger.info("Successfully loaded chat completion config")
     return config
 
-def prepare_rag_summary(rag_documents: list, config: dict) -> str:
-    if not rag_documents or not all(isinstance(doc, dict) and 'document' in doc and 'filename' in doc and 'company' in doc for doc in rag_documents):
-        return config['formatting']['rag']['empty_message']['vi']
-
-    rag_by_company = {}
-    financial_metrics_pattern = re.compile(r'(Net revenue|Net income|Operating expenses|Diluted.*earnings per share|Total volume|Payments volume|Transactions processed)\s*(FY\s*\d{4})?\s*[:=]?\s*\$?([\d,.]+[TBM]?|\d+\.\d+[TBM]?)', re.IGNORECASE)
-
-    for doc in rag_documents:
-        company = doc['company']
-        if company not in rag_by_company:
-            rag_by_company[company] = []
-        
-        content = doc['document']
-        metrics = financial_metrics_pattern.findall(content)
-        
-        metrics_by_year = {}
-        for metric, year, value in metrics:
-            year = year.strip() if year else "Unknown Year"
-            if year not in metrics_by_year:
-                metrics_by_year[year] = []
-            value = value.replace(',', '').replace('$', '')
-            metrics_by_year[year].append(f"{metric}: {value}")
-        
-        formatted_metrics = []
-        for year, metric_list in metrics_by_year.items():
-            formatted_metrics.append(f"{year}: {', '.join(metric_list)}")
-        
-        if not formatted_metrics:
-            content = content[:1000] + ("..." if len(content) > 1000 else "")
-            formatted_metrics = [content]
-        
-        rag_by_company[company].append(f"{company}: {'; '.join(formatted_metrics)} from {doc['filename']}")
-
-    return "\n".join(f"{company}: " + "; ".join(entries) for company, entries in rag_by_company.items())
-
 def prepare_sql_summary(sql_response: str, config: dict, tickers: list) -> str:
     # Nếu sql_response không chứa dữ liệu, trả về empty message
     if "Dữ liệu từ cơ sở dữ liệu" not in sql_response:
@@ -5,6 +5,7 @@ from phi.agent import Agent, RunResponse
 from utils.logging import setup_logging, get_collected_logs
 from utils.response import standardize_response
 from utils.response_parser import parse_response_to_json
+from utils.financial_facts import prepare_rag_summary
 from flow.sql_flow import sql_flow
 from flow.rag_flow import rag_flow
 from flow.chat_completion_flow import chat_completion_flow
@@ -127,47 +128,6 @@ def load_config() -> dict:
     logger.info("Successfully loaded chat completion config")
     return config
 
-def prepare_rag_summary(rag_documents: list, config: dict) -> str:
-    if not rag_documents or not all(isinstance(doc, dict) and 'document' in doc and 'filename' in doc and 'company' in doc for doc in rag_documents):
-        return config['formatting']['rag']['empty_message']['vi']
-
-    rag_by_company = {}
-    # Regex để tìm các chỉ số tài chính kèm năm (ví dụ: "Net revenue FY 2022: $29,310")
-    financial_metrics_pattern = re.compile(r'(Net revenue|Net income|Operating expenses|Diluted.*earnings per share|Total volume|Payments volume|Transactions processed)\s*(FY\s*\d{4})?\s*[:=]?\s*\$?([\d,.]+[TBM]?|\d+\.\d+[TBM]?)', re.IGNORECASE)
-
-    for doc in rag_documents:
-        company = doc['company']
-        if company not in rag_by_company:
-            rag_by_company[company] = []
-        
-        # Trích xuất các chỉ số tài chính
-        content = doc['document']
-        metrics = financial_metrics_pattern.findall(content)
-        
-        # Nhóm dữ liệu theo năm
-        metrics_by_year = {}
-        for metric, year, value in metrics:
-            year = year.strip() if year else "Unknown Year"
-            if year not in metrics_by_year:
-                metrics_by_year[year] = []
-            # Chuẩn hóa giá trị: loại bỏ dấu phẩy và ký tự không cần thiết
-            value = value.replace(',', '').replace('$', '')
-            metrics_by_year[year].append(f"{metric}: {value}")
-        
-        # Định dạng lại metrics theo năm
-        formatted_metrics = []
-        for year, metric_list in metrics_by_year.items():
-            formatted_metrics.append(f"{year}: {', '.join(metric_list)}")
-        
-        # Nếu không tìm thấy chỉ số, lấy tối đa 1000 ký tự
-        if not formatted_metrics:
-            content = content[:1000] + ("..." if len(content) > 1000 else "")
-            formatted_metrics = [content]
-        
-        rag_by_company[company].append(f"{company}: {'; '.join(formatted_metrics)} from {doc['filename']}")
-
-    return "\n".join(f"{company}: " + "; ".join(entries) for company, entries in rag_by_company.items())
-
 def prepare_sql_summary(sql_response: str, config: dict, tickers: list, required_columns: list = None, dashboard_enabled: bool = False) -> str:
     if "Dữ liệu từ cơ sở dữ liệu" not in sql_response:
         return config['formatting']['sql']['empty_message']['vi']
@@ -190,7 +150,7 @@ def prepare_sql_summary(sql_response: str, config: dict, tickers: list, required
                 formatted_data = [f"{ticker}: {ticker_map[ticker]} USD" for ticker in tickers if ticker in ticker_map]
                 summaries.append(", ".join(formatted_data))
             elif "avg_close_price" in required_columns:
-                formatted_data = [f"{tickers[0] if tickers else 'Company'}: {record['avg_close_price']} USD" for record in data]
+                formatted_data = [f"{record.get('symbol', tickers[0] if tickers else 'Company')}: {record['avg_close_price']} USD" for record in data]
                 summaries.append(", ".join(formatted_data))
             elif "daily_return" in required_columns:
                 valid_returns = [record['daily_return'] for record in data if isinstance(record['daily_return'], (int, float)) and not pd.isna(record['daily_return'])]
@@ -247,7 +207,7 @@ def prepare_dashboard_summary(dashboard_info: dict, config: dict) -> str:
             summary += " " + ", ".join(key_points) + "."
     return summary
 
-def orchestrator_flow(query: str, orchestrator: Agent, sql_agent, sql_tool, rag_tool, chat_completion_agent, thinking_queue=None, chat_history=None) -> dict:
+def orchestrator_flow(query: str, orchestrator: Agent, sql_agent, sql_tool, rag_tool, chat_completion_agent, thinking_queue=None, chat_history=None, deadline: float = None, cancel_event=None) -> dict:
     metadata = load_metadata()
     visualize_agent = create_visualize_agent()
     
@@ -311,7 +271,7 @@ def orchestrator_flow(query: str, orchestrator: Agent, sql_agent, sql_tool, rag_
                     "date_range": data.get("date_range"),
                     "visualized_template": metadata["visualized_template"]
                 }
-                final_response = sql_flow(sub_query, sql_agent, sql_tool, metadata=metadata_with_columns)
+                final_response = sql_flow(sub_query, sql_agent, sql_tool, metadata=metadata_with_columns, deadline=deadline, cancel_event=cancel_event)
                 response_for_chat = final_response["response_for_chat"]
                 actual_result = final_response["actual_result"]
                 sql_response = limit_sql_records(response_for_chat, max_records=5)
@@ -337,8 +297,8 @@ def orchestrator_flow(query: str, orchestrator: Agent, sql_agent, sql_tool, rag_
                 
                 if thinking_queue:
                     thinking_queue.put("Đang tìm kiếm tài liệu RAG...")
-                # Truyền optimized_sub_query và company vào rag_flow
-                rag_documents = rag_flow(optimized_sub_query, rag_tool, company=company)
+                # Truyền optimized_sub_query, company và date_range vào rag_flow
+                rag_documents = rag_flow(optimized_sub_query, rag_tool, tickers=tickers, company=company, date_range=data.get("date_range"), sql_tool=sql_tool)
                 if thinking_queue:
                     thinking_queue.put(f"RAG: {json.dumps(rag_documents, ensure_ascii=False)[:200]}...")
                 logger.info(f"RAG Documents: {rag_documents}")
@@ -3,21 +3,32 @@ from utils.logging import setup_logging
 
 logger = setup_logging()
 
-def rag_flow(sub_query: str, rag_tool, tickers: list = None, company: str = None) -> list:
-    """Xử lý flow của RAG: gọi rag_tool để lấy tài liệu, trả về danh sách tài liệu gốc."""
+def rag_flow(sub_query: str, rag_tool, tickers: list = None, company: str = None, date_range: dict = None, sql_tool=None) -> list:
+    """Xử lý flow của RAG: gọi rag_tool để lấy tài liệu, trả về danh sách tài liệu gốc.
+
+    Có sql_tool thì câu hỏi về một chỉ số cụ thể được tra trước trong bảng financial_facts; query chỉ hỏi giá trị
+    và đủ facts cho mọi công ty, năm được hỏi thì không cần vector search, còn lại facts được gộp với kết quả của run().
+    """
     try:
-        logger.info(f"Executing RAG query: {sub_query}, tickers: {tickers}, company: {company}")
-        # Gọi rag_tool với sub_query, tickers và company
-        documents = rag_tool.run(sub_query, company=company, tickers=tickers)
+        logger.info(f"Executing RAG query: {sub_query}, tickers: {tickers}, company: {company}, date_range: {date_range}")
+        facts_documents = []
+        if sql_tool is not None:
+            facts_documents, complete = rag_tool.lookup_facts(sub_query, sql_tool.backend, company=company, tickers=tickers, date_range=date_range)
+            if complete:
+                logger.info(f"Answered from financial_facts: {len(facts_documents)} documents")
+                return facts_documents
+
+        # Gọi rag_tool với sub_query, tickers, company và date_range (lọc theo năm)
+        documents = rag_tool.run(sub_query, company=company, tickers=tickers, date_range=date_range)
         logger.debug(f"Documents from rag_tool: {str(documents)[:100]}...")
 
         # Kiểm tra lỗi từ rag_tool
         if isinstance(documents, list) and documents and "error" in documents[0]:
             logger.warning(f"No relevant documents found for query: {sub_query}")
-            return documents
+            return facts_documents or documents
 
         logger.info(f"Retrieved {len(documents)} documents")
-        return documents
+        return facts_documents + documents
 
     except Exception as e:
         logger.error(f"Error in rag_flow: {str(e)}")
@@ -3,15 +3,96 @@ import re
 from phi.agent import RunResponse
 from utils.logging import setup_logging
 from utils.response import standardize_response
+from agents.text_to_sql_agent import build_multi_ticker_query
+from utils.template_match import match_template
+from config.env import PRICE_STORE_ENABLED
+from utils.price_store import get_price_store
 import pandas as pd
 
 logger = setup_logging()
 
-def sql_flow(sub_query: str, sql_agent, sql_tool, metadata: dict = None) -> dict:
+def group_rows_by_symbol(rows: list) -> dict:
+    """Nhóm các dòng kết quả theo symbol (giữ thứ tự) để vẽ biểu đồ nhiều đường."""
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row.get("symbol"), []).append(row)
+    return grouped
+
+def execute_sql(sql_tool, sql_query: str, params: dict = None, deadline: float = None, cancel_event=None) -> tuple:
+    """Thực thi câu SQL qua sql_tool, trả về (result_data, error_message)."""
     try:
-        logger.info(f"Calling sql_agent with sub_query: {sub_query}")
-        sql_response = sql_agent.run(sub_query, metadata=metadata or {})
+        tool_response = sql_tool.execute(sql_query, params=params, deadline=deadline, cancel_event=cancel_event)
+        tool_response_dict = json.loads(tool_response)
+        logger.info(f"Parsed tool response: {json.dumps(tool_response_dict, ensure_ascii=False)}")
+    except Exception as e:
+        logger.error(f"Error executing query with sql_tool: {str(e)}")
+        return [], f"Lỗi thực thi query: {str(e)}"
+
+    if tool_response_dict.get("status") == "error":
+        return [], tool_response_dict.get("message", "Lỗi thực thi query.")
+
+    result_data = tool_response_dict["data"].get("result", [])
+    if isinstance(result_data, pd.DataFrame):
+        result_data = result_data.to_dict('records')
+    elif not isinstance(result_data, list):
+        logger.error(f"Invalid result data format: {type(result_data)}")
+        return [], "Dữ liệu trả về không hợp lệ từ cơ sở dữ liệu."
+    return result_data, None
+
+def build_sql_response(sub_query: str, sql_query: str, result_data: list, token_metrics: dict) -> dict:
+    response_for_chat = (
+        f"Dữ liệu từ cơ sở dữ liệu cho truy vấn '{sub_query}': {json.dumps(result_data, ensure_ascii=False)}"
+        if result_data
+        else f"Không tìm thấy dữ liệu trong cơ sở dữ liệu cho truy vấn '{sub_query}'."
+    )
+    response = {
+        "response_for_chat": response_for_chat,
+        "actual_result": result_data,
+        "token_metrics": token_metrics,
+        "sql_query": sql_query  # Thêm câu SQL vào final_response
+    }
+    if result_data and "symbol" in result_data[0]:
+        response["grouped_result"] = group_rows_by_symbol(result_data)
+    return response
+
+def sql_flow(sub_query: str, sql_agent, sql_tool, metadata: dict = None, deadline: float = None, cancel_event=None) -> dict:
+    try:
+        metadata = metadata or {}
         token_metrics = {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0}
+
+        tickers = metadata.get("tickers") or []
+        # Chỉ bỏ qua sql_agent (price store, sql_multi) khi query khớp đúng một template và không hỏi thêm phép tổng hợp nào
+        matched_template = match_template(metadata.get("visualized_template", []), sub_query, tickers, metadata.get("date_range"))
+
+        # Template time-series/returns/rolling average: trả lời từ price store in-process trước
+        if PRICE_STORE_ENABLED and tickers and matched_template:
+            price_store = get_price_store()
+            if price_store is not None:
+                date_range = metadata.get("date_range") or {}
+                result_data = price_store.answer_template(
+                    matched_template["name"], tickers,
+                    date_range.get("start_date", "2024-01-01"), date_range.get("end_date", "2024-12-31")
+                )
+                if result_data is not None:
+                    logger.info(f"Served template {matched_template['name']} for {tickers} from price store ({len(result_data)} rows)")
+                    return build_sql_response(sub_query, f"price_store:{matched_template['name']}", result_data, token_metrics)
+
+        # Nhiều tickers: chạy một query multi-symbol cho cả danh sách thay vì N lần round trip
+        if len(tickers) > 1 and matched_template and "sql_multi" in matched_template:
+            sql_query, params = build_multi_ticker_query(matched_template, tickers, metadata.get("date_range"))
+            logger.info(f"Executing multi-ticker template {matched_template['name']} for {params['tickers']}: {sql_query}")
+            result_data, error_message = execute_sql(sql_tool, sql_query, params, deadline, cancel_event)
+            if error_message:
+                return {
+                    "response_for_chat": error_message,
+                    "actual_result": [],
+                    "token_metrics": token_metrics,
+                    "sql_query": sql_query
+                }
+            return build_sql_response(sub_query, sql_query, result_data, token_metrics)
+
+        logger.info(f"Calling sql_agent with sub_query: {sub_query}")
+        sql_response = sql_agent.run(sub_query, metadata=metadata)
         if isinstance(sql_response, RunResponse):
             metrics = getattr(sql_response, 'metrics', {})
             input_tokens = metrics.get('input_tokens', 0)
@@ -33,48 +114,21 @@ def sql_flow(sub_query: str, sql_agent, sql_tool, metadata: dict = None) -> dict
                 "token_metrics": token_metrics,
                 "sql_query": "Không tạo được câu SQL"
             }
-        
+
         sql_query = re.sub(r'```(?:sql|json)?|```|\n|\t', '', sql_response).strip()
         if not sql_query.endswith(';'):
             sql_query += ';'
         logger.info(f"Executing SQL query with sql_tool: {sql_query}")
-        try:
-            tool_response = sql_tool.run(sql_query)
-            tool_response_dict = json.loads(tool_response)
-            logger.info(f"Parsed tool response: {json.dumps(tool_response_dict, ensure_ascii=False)}")
-        except Exception as e:
-            logger.error(f"Error executing query with sql_tool: {str(e)}")
+        result_data, error_message = execute_sql(sql_tool, sql_query, deadline=deadline, cancel_event=cancel_event)
+        if error_message:
             return {
-                "response_for_chat": f"Lỗi thực thi query: {str(e)}",
+                "response_for_chat": error_message,
                 "actual_result": [],
                 "token_metrics": token_metrics,
                 "sql_query": sql_query
             }
-        
-        result_data = tool_response_dict["data"].get("result", [])
-        if isinstance(result_data, pd.DataFrame):
-            result_data = result_data.to_dict('records')
-        elif not isinstance(result_data, list):
-            logger.error(f"Invalid result data format: {type(result_data)}")
-            return {
-                "response_for_chat": "Dữ liệu trả về không hợp lệ từ cơ sở dữ liệu.",
-                "actual_result": [],
-                "token_metrics": token_metrics,
-                "sql_query": sql_query
-            }
-
-        response_for_chat = (
-            f"Dữ liệu từ cơ sở dữ liệu cho truy vấn '{sub_query}': {json.dumps(result_data, ensure_ascii=False)}"
-            if result_data
-            else f"Không tìm thấy dữ liệu trong cơ sở dữ liệu cho truy vấn '{sub_query}'."
-        )
 
-        return {
-            "response_for_chat": response_for_chat,
-            "actual_result": result_data,
-            "token_metrics": token_metrics,
-            "sql_query": sql_query  # Thêm câu SQL vào final_response
-        }
+        return build_sql_response(sub_query, sql_query, result_data, token_metrics)
     except Exception as e:
         logger.error(f"Error in sql_flow: {str(e)}")
         return {
@@ -82,4 +136,4 @@ def sql_flow(sub_query: str, sql_agent, sql_tool, metadata: dict = None) -> dict
             "actual_result": [],
             "token_metrics": {"input_tokens": 0, "output_tokens": 0, "total_tokens": 0},
             "sql_query": "Lỗi trong sql_flow"
-        }
\ No newline at end of file
+        }
@@ -0,0 +1,81 @@
+# scripts/benchmark_chunker.py
+import argparse
+import re
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from utils.chunker import chunk_text, make_token_counter
+
+PROSE = (
+    "Total net sales increased 2.8% compared to 2023, driven by higher services revenue. "
+    "Operating expenses grew at a slower pace, reflecting continued investment in research and development. "
+    "Gross margin percentage was 46.2% for fiscal 2024! Cash flow from operations remained strong? "
+)
+TABLE = "| Segment | 2024 | 2023 | Change |\n| Americas | 167,045 | 162,560 | 3% |\n| Europe | 101,328 | 94,294 | 7% |\n"
+
+
+def legacy_chunk_text(text, chunk_size=1000):
+    """Chunker cũ trong CustomRAGTool._load_documents (cắt theo ký tự), giữ lại để so sánh."""
+    chunks = []
+    while len(text) > chunk_size:
+        match = re.search(r'([.!?\n])\s', text[:chunk_size][::-1])
+        if match:
+            last_period_index = chunk_size - match.start() - 1
+        else:
+            space_index = text[:chunk_size].rfind(' ')
+            last_period_index = space_index if space_index != -1 else chunk_size
+
+        chunk = text[:last_period_index].strip()
+        if len(chunk) >= 50:
+            chunks.append(chunk)
+        text = text[last_period_index+1:].lstrip()
+
+    if len(text.strip()) >= 50:
+        chunks.append(text.strip())
+    return chunks
+
+
+def build_document(pages: int) -> str:
+    # Mỗi trang giống đầu ra của format_page_text: các dòng bảng rồi một dòng văn bản đã làm sạch
+    return "".join(TABLE + PROSE * 12 + "\n" for _ in range(pages))
+
+
+def time_call(fn, repeat: int) -> float:
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - start) * 1000)
+    return statistics.median(timings)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="So sánh chunker token-aware với chunker cũ trên một tài liệu lớn")
+    parser.add_argument("--pages", type=int, default=1000)
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--tokenizer", action="store_true", help="Đếm token bằng tokenizer của all-MiniLM-L6-v2 thay vì ước lượng")
+    args = parser.parse_args()
+
+    text = build_document(args.pages)
+    tokenizer = None
+    if args.tokenizer:
+        from sentence_transformers import SentenceTransformer
+        tokenizer = SentenceTransformer("all-MiniLM-L6-v2").tokenizer
+    count_tokens = make_token_counter(tokenizer)
+
+    legacy_ms = time_call(lambda: legacy_chunk_text(text), args.repeat)
+    new_ms = time_call(lambda: chunk_text(text, count_tokens=count_tokens), args.repeat)
+    print(f"document: {args.pages} pages, {len(text):,} characters")
+    print(f"legacy chunker: {legacy_ms:10.2f} ms  ({len(legacy_chunk_text(text))} chunks)")
+    print(f"token chunker:  {new_ms:10.2f} ms  ({len(chunk_text(text, count_tokens=count_tokens))} chunks)")
+    print(f"speedup: {legacy_ms / new_ms:.1f}x")
+
+
+if __name__ == "__main__":
+    main()
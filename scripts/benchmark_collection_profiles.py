@@ -0,0 +1,173 @@
+# scripts/benchmark_collection_profiles.py
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.http import models
+from config.env import QDRANT_HOST, QDRANT_PORT
+from utils.logging import setup_logging
+from utils.qdrant_schema import COLLECTION_PROFILES, DENSE_VECTOR_SIZE, create_financial_collection, get_profile, search_params
+
+logger = setup_logging()
+
+UPLOAD_BATCH_SIZE = 256
+
+
+def load_corpus_vectors(client, collection_name: str) -> np.ndarray:
+    """Đọc toàn bộ dense vector của collection thật (scroll theo trang)."""
+    vectors = []
+    offset = None
+    while True:
+        points, offset = client.scroll(collection_name=collection_name, limit=1000, offset=offset, with_vectors=True, with_payload=False)
+        for point in points:
+            vector = point.vector[""] if isinstance(point.vector, dict) else point.vector
+            vectors.append(vector)
+        if offset is None:
+            break
+    return np.asarray(vectors, dtype=np.float32)
+
+
+def scale_corpus(vectors: np.ndarray, factor: int, seed: int = 42) -> np.ndarray:
+    """Nhân corpus factor lần bằng các bản sao có nhiễu nhỏ để ước lượng hành vi ở quy mô lớn hơn."""
+    if factor <= 1:
+        return vectors
+    rng = np.random.default_rng(seed)
+    copies = [vectors] + [vectors + rng.normal(0, 0.05, vectors.shape).astype(np.float32) for _ in range(factor - 1)]
+    return np.concatenate(copies)
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def brute_force_topk(corpus: np.ndarray, queries: np.ndarray, k: int) -> list:
+    """Ground truth: cosine chính xác trên toàn bộ corpus."""
+    corpus = normalize(corpus)
+    queries = normalize(queries)
+    truth = []
+    # Theo block query để ma trận điểm không vượt quá vài trăm MB khi corpus lớn
+    for start in range(0, len(queries), 16):
+        scores = queries[start:start + 16] @ corpus.T
+        top = np.argpartition(-scores, kth=min(k, scores.shape[1] - 1), axis=1)[:, :k]
+        truth.extend(set(row.tolist()) for row in top)
+    return truth
+
+
+def estimate_ram_bytes(profile: dict, n: int, dim: int = DENSE_VECTOR_SIZE) -> int:
+    """Ước lượng RAM cho vector + HNSW graph (không tính payload và sparse index)."""
+    bytes_per_vector = {None: dim * 4, "int8": dim, "binary": dim // 8}[profile["quantization"]]
+    vectors = n * bytes_per_vector
+    if profile["quantization"] is None and profile["on_disk"]:
+        vectors = 0
+    # Layer 0 có 2m link, mỗi link 4 byte; các layer trên không đáng kể
+    graph = 0 if profile.get("hnsw_on_disk") else n * profile["m"] * 2 * 4
+    return vectors + graph
+
+
+def wait_for_index(client, collection_name: str, timeout_s: float = 600) -> None:
+    start = time.monotonic()
+    while time.monotonic() - start < timeout_s:
+        info = client.get_collection(collection_name)
+        if info.status == models.CollectionStatus.GREEN:
+            return
+        time.sleep(1)
+    logger.warning(f"Collection {collection_name} still indexing after {timeout_s}s")
+
+
+def benchmark_profile(client, profile_name: str, corpus: np.ndarray, queries: np.ndarray, truth: list, k: int) -> dict:
+    collection_name = f"bench_{profile_name}"
+    if client.collection_exists(collection_name):
+        client.delete_collection(collection_name)
+    create_financial_collection(client, collection_name, profile_name)
+    try:
+        for start in range(0, len(corpus), UPLOAD_BATCH_SIZE):
+            batch = corpus[start:start + UPLOAD_BATCH_SIZE]
+            client.upsert(
+                collection_name=collection_name,
+                points=[models.PointStruct(id=start + i, vector=vector.tolist()) for i, vector in enumerate(batch)],
+                wait=True
+            )
+        wait_for_index(client, collection_name)
+
+        params = search_params(profile_name)
+        latencies = []
+        recalls = []
+        for query, expected in zip(queries, truth):
+            started = time.perf_counter()
+            hits = client.query_points(collection_name=collection_name, query=query.tolist(), search_params=params, limit=k).points
+            latencies.append((time.perf_counter() - started) * 1000)
+            recalls.append(len({hit.id for hit in hits} & expected) / k)
+
+        exact_latencies = []
+        for query in queries[:min(len(queries), 20)]:
+            started = time.perf_counter()
+            client.query_points(collection_name=collection_name, query=query.tolist(), search_params=search_params(profile_name, exact=True), limit=k)
+            exact_latencies.append((time.perf_counter() - started) * 1000)
+
+        latencies.sort()
+        return {
+            "recall": statistics.mean(recalls),
+            "p50_ms": statistics.median(latencies),
+            "p95_ms": latencies[int(0.95 * (len(latencies) - 1))],
+            "exact_p50_ms": statistics.median(exact_latencies),
+        }
+    finally:
+        client.delete_collection(collection_name)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Recall/latency/RAM của các collection profile so với brute-force chính xác")
+    parser.add_argument("--collection", default="financial_docs", help="Collection lấy vector corpus thật")
+    parser.add_argument("--profiles", default=",".join(COLLECTION_PROFILES))
+    parser.add_argument("--scale", type=int, default=1, help="Nhân corpus (bản sao có nhiễu) để thử quy mô lớn hơn")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--k", type=int, default=5)
+    parser.add_argument("--project", type=int, default=100, help="Hệ số quy mô để ước lượng RAM (ví dụ 100x số filing)")
+    args = parser.parse_args()
+
+    client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
+    base = load_corpus_vectors(client, args.collection)
+    if len(base) == 0:
+        logger.error(f"Collection {args.collection} has no vectors, run scripts/populate_rag.py first")
+        return
+    corpus = scale_corpus(base, args.scale)
+
+    # Query: vector của corpus có nhiễu (gần với phân phối query thật hơn là vector ngẫu nhiên)
+    rng = np.random.default_rng(7)
+    picks = rng.choice(len(corpus), size=min(args.queries, len(corpus)), replace=False)
+    queries = corpus[picks] + rng.normal(0, 0.1, (len(picks), corpus.shape[1])).astype(np.float32)
+
+    started = time.perf_counter()
+    truth = brute_force_topk(corpus, queries, args.k)
+    brute_ms = (time.perf_counter() - started) * 1000 / len(queries)
+    print(f"corpus: {len(corpus):,} vectors ({len(base):,} real x{args.scale}), {len(queries)} queries, k={args.k}")
+    print(f"numpy brute force: {brute_ms:.2f} ms/query (recall 1.000)")
+
+    header = f"{'profile':<12} {'recall@k':>9} {'p50 ms':>8} {'p95 ms':>8} {'exact p50':>10} {'RAM now':>10} {f'RAM x{args.project}':>12}"
+    print(header)
+    for profile_name in [p.strip() for p in args.profiles.split(",") if p.strip()]:
+        profile = get_profile(profile_name)
+        try:
+            result = benchmark_profile(client, profile_name, corpus, queries, truth, args.k)
+        except Exception as e:
+            logger.error(f"Profile {profile_name} failed: {str(e)}")
+            continue
+        ram_now = estimate_ram_bytes(profile, len(corpus)) / 2**20
+        ram_projected = estimate_ram_bytes(profile, len(base) * args.project) / 2**20
+        print(
+            f"{profile_name:<12} {result['recall']:>9.3f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+            f"{result['exact_p50_ms']:>10.2f} {ram_now:>8.1f}MB {ram_projected:>10.1f}MB"
+        )
+
+
+if __name__ == "__main__":
+    main()
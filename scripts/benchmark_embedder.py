@@ -0,0 +1,131 @@
+# scripts/benchmark_embedder.py
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import numpy as np
+from config.env import EMBED_BATCH_SIZE, EMBEDDING_THREADS
+from utils.embedder import RUNTIMES, load_embedder
+
+MODEL_NAME = "all-MiniLM-L6-v2"
+COMPANIES = ["Apple", "Microsoft", "Boeing", "Goldman Sachs", "Walmart", "Nike", "Chevron", "Visa"]
+METRICS = ["total revenue", "net income", "operating margin", "diluted earnings per share", "free cash flow", "R&D expenses"]
+SENTENCES = [
+    "Total net sales increased {p}% compared to {y}, driven by higher services revenue.",
+    "Operating expenses grew at a slower pace, reflecting continued investment in research and development.",
+    "Gross margin percentage was {p}.{q}% for fiscal {y}, compared to {r}.{q}% in the prior year.",
+    "| Segment | {y} | {z} | Change |\n| Americas | {a},045 | {b},560 | {p}% |",
+    "The Company repurchased ${a} billion of its common stock and paid dividends of ${p}.{q} billion.",
+    "Cash flow from operations remained strong at ${b} million despite foreign currency headwinds.",
+]
+
+
+def build_queries(n: int) -> list:
+    return [f"What was {COMPANIES[i % len(COMPANIES)]}'s {METRICS[i % len(METRICS)]} in {2020 + i % 5}?" for i in range(n)]
+
+
+def build_chunks(n: int, seed: int = 0) -> list:
+    """Chunk giả lập độ dài ~CHUNK_MAX_TOKENS với số liệu khác nhau để cache/padding không làm sai kết quả."""
+    rng = np.random.default_rng(seed)
+    chunks = []
+    for _ in range(n):
+        parts = []
+        for _ in range(int(rng.integers(4, 10))):
+            year = int(rng.integers(2019, 2025))
+            parts.append(SENTENCES[int(rng.integers(len(SENTENCES)))].format(
+                p=int(rng.integers(1, 40)), q=int(rng.integers(10)), r=int(rng.integers(30, 60)),
+                y=year, z=year - 1, a=int(rng.integers(10, 400)), b=int(rng.integers(100, 999))
+            ))
+        chunks.append(" ".join(parts))
+    return chunks
+
+
+def query_latencies(embedder, queries: list) -> list:
+    latencies = []
+    for query in queries:
+        start = time.perf_counter()
+        embedder.encode(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+    return sorted(latencies)
+
+
+def benchmark(runtime: str, threads: int, queries: list, chunks: list, batch_size: int) -> dict:
+    start = time.perf_counter()
+    embedder = load_embedder(MODEL_NAME, runtime=runtime, threads=threads, warmup=False)
+    load_ms = (time.perf_counter() - start) * 1000
+    # Request đầu tiên khi không warm-up: chi phí khởi tạo lười mà warm-up lúc startup loại bỏ
+    start = time.perf_counter()
+    embedder.encode(queries[0])
+    first_ms = (time.perf_counter() - start) * 1000
+    latencies = query_latencies(embedder, queries)
+    start = time.perf_counter()
+    chunk_vectors = np.asarray(embedder.encode(chunks, batch_size=batch_size), dtype=np.float32)
+    ingest_s = time.perf_counter() - start
+    return {
+        "load_ms": load_ms,
+        "first_ms": first_ms,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))],
+        "chunks_per_s": len(chunks) / ingest_s,
+        "query_vectors": np.stack([np.asarray(embedder.encode(query), dtype=np.float32) for query in queries]),
+        "chunk_vectors": chunk_vectors,
+    }
+
+
+def normalize(vectors: np.ndarray) -> np.ndarray:
+    return vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+
+
+def parity(baseline: dict, candidate: dict, k: int) -> dict:
+    """Cosine giữa vector của hai runtime cho cùng text, và độ trùng top-k chunk của mỗi query."""
+    chunk_cos = np.sum(normalize(baseline["chunk_vectors"]) * normalize(candidate["chunk_vectors"]), axis=1)
+    query_cos = np.sum(normalize(baseline["query_vectors"]) * normalize(candidate["query_vectors"]), axis=1)
+    base_scores = normalize(baseline["query_vectors"]) @ normalize(baseline["chunk_vectors"]).T
+    cand_scores = normalize(candidate["query_vectors"]) @ normalize(candidate["chunk_vectors"]).T
+    base_top = np.argsort(-base_scores, axis=1)[:, :k]
+    cand_top = np.argsort(-cand_scores, axis=1)[:, :k]
+    overlap = [len(set(a) & set(b)) / k for a, b in zip(base_top, cand_top)]
+    return {
+        "cos_mean": float(np.concatenate([chunk_cos, query_cos]).mean()),
+        "cos_min": float(np.concatenate([chunk_cos, query_cos]).min()),
+        "topk_overlap": float(np.mean(overlap)),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="So sánh runtime embedding (ONNX/int8) với PyTorch: latency query, throughput ingest, parity cosine")
+    parser.add_argument("--runtimes", default=",".join(RUNTIMES))
+    parser.add_argument("--threads", type=int, default=EMBEDDING_THREADS, help="0 = mặc định của runtime")
+    parser.add_argument("--queries", type=int, default=200)
+    parser.add_argument("--chunks", type=int, default=1024)
+    parser.add_argument("--batch-size", type=int, default=EMBED_BATCH_SIZE)
+    parser.add_argument("--k", type=int, default=5)
+    args = parser.parse_args()
+
+    queries = build_queries(args.queries)
+    chunks = build_chunks(args.chunks)
+    runtimes = [runtime.strip() for runtime in args.runtimes.split(",") if runtime.strip()]
+    if "torch" not in runtimes:
+        runtimes.insert(0, "torch")
+
+    results = {runtime: benchmark(runtime, args.threads, queries, chunks, args.batch_size) for runtime in runtimes}
+    baseline = results["torch"]
+    print(f"{len(queries)} queries, {len(chunks)} chunks, batch size {args.batch_size}, threads {args.threads or 'default'}")
+    print(f"{'runtime':<10} {'load ms':>9} {'1st query':>10} {'p50 ms':>8} {'p95 ms':>8} {'chunks/s':>9} {'speedup':>8} {'cos mean':>9} {'cos min':>8} {f'top{args.k}':>6}")
+    for runtime, result in results.items():
+        match = parity(baseline, result, args.k)
+        print(
+            f"{runtime:<10} {result['load_ms']:>9.0f} {result['first_ms']:>10.1f} {result['p50_ms']:>8.2f} {result['p95_ms']:>8.2f} "
+            f"{result['chunks_per_s']:>9.1f} {result['chunks_per_s'] / baseline['chunks_per_s']:>7.2f}x "
+            f"{match['cos_mean']:>9.4f} {match['cos_min']:>8.4f} {match['topk_overlap']:>6.3f}"
+        )
+
+
+if __name__ == "__main__":
+    main()
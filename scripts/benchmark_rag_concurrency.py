@@ -0,0 +1,79 @@
+# scripts/benchmark_rag_concurrency.py
+import argparse
+import statistics
+import sys
+import time
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from tools.rag_tool import CustomRAGTool
+from tools.vector_backends import create_vector_backend
+from config.env import VECTOR_BACKEND
+
+COMPANIES = ["Apple", "Microsoft", "Boeing", "Goldman Sachs", "Walmart", "Nike", "Chevron", "Visa"]
+METRICS = ["total revenue", "net income", "operating margin", "diluted earnings per share", "free cash flow", "R&D expenses"]
+
+
+def build_queries(n: int) -> list:
+    # Query khác nhau để LRU query embedding không che mất chi phí encode
+    return [f"What was {COMPANIES[i % len(COMPANIES)]}'s {METRICS[i % len(METRICS)]} in {2020 + i % 5}? (#{i})" for i in range(n)]
+
+
+def run_load(rag_tool, queries: list, concurrency: int) -> dict:
+    latencies = []
+
+    def call(query):
+        start = time.perf_counter()
+        rag_tool.run(query)
+        latencies.append((time.perf_counter() - start) * 1000)
+
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(call, queries))
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return {
+        "qps": len(queries) / elapsed,
+        "p50_ms": statistics.median(latencies),
+        "p95_ms": latencies[int(0.95 * (len(latencies) - 1))],
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Throughput của CustomRAGTool.run dưới tải đồng thời, có và không có micro-batching")
+    parser.add_argument("--backend", default=VECTOR_BACKEND, choices=["qdrant", "embedded"])
+    parser.add_argument("--concurrency", default="1,10,50,100")
+    parser.add_argument("--queries", type=int, default=500)
+    args = parser.parse_args()
+
+    backend = create_vector_backend(args.backend)
+    tools = {
+        "per-request": CustomRAGTool(vector_backend=backend, micro_batching=False),
+        "micro-batch": CustomRAGTool(vector_backend=backend, micro_batching=True),
+    }
+    for rag_tool in tools.values():
+        # Tắt LRU query để mỗi lần run() đều encode
+        rag_tool.embedding_cache = None
+
+    print(f"backend: {backend.name}, {args.queries} queries per level")
+    print(f"{'mode':<12} {'concurrency':>11} {'qps':>8} {'p50 ms':>8} {'p95 ms':>8} {'avg batch':>10}")
+    for concurrency in [int(c) for c in args.concurrency.split(",") if c.strip()]:
+        for mode, rag_tool in tools.items():
+            queries = build_queries(args.queries)
+            before = rag_tool.batching_stats()
+            result = run_load(rag_tool, queries, concurrency)
+            after = rag_tool.batching_stats()
+            avg_batch = "-"
+            if after:
+                batches = after["encode"]["batches"] - before["encode"]["batches"]
+                items = after["encode"]["items"] - before["encode"]["items"]
+                avg_batch = f"{items / batches:.1f}" if batches else "-"
+            print(f"{mode:<12} {concurrency:>11} {result['qps']:>8.1f} {result['p50_ms']:>8.1f} {result['p95_ms']:>8.1f} {avg_batch:>10}")
+
+
+if __name__ == "__main__":
+    main()
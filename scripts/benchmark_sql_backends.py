@@ -0,0 +1,82 @@
+# scripts/benchmark_sql_backends.py
+import argparse
+import statistics
+import sys
+import time
+from pathlib import Path
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+import yaml
+from tools.sql_backends import PostgresBackend, DuckDBBackend
+from utils.logging import setup_logging
+
+logger = setup_logging()
+
+def load_templates() -> list:
+    with open(BASE_DIR / "config" / "visualized_template.yml", "r") as file:
+        return yaml.safe_load(file)["visualized_template"]
+
+def render_template(template: dict, tickers: list, start_date: str, end_date: str) -> list:
+    """Tạo các câu SQL cần đo cho một template: dạng single-ticker và (nếu có) dạng multi-ticker."""
+    columns = [t.lower() for t in tickers]
+    params = {
+        "ticker": tickers[0],
+        "tickers": ",".join(f"'{t}'" for t in tickers),
+        "start_date": start_date,
+        "end_date": end_date,
+        # Placeholder của heatmap_returns: lợi nhuận ngày của từng ticker và ma trận tương quan
+        "tickers_columns": ", ".join(
+            f"MAX(CASE WHEN symbol = '{t}' THEN close_price END) AS {c}" for t, c in zip(tickers, columns)
+        ),
+        "correlation_columns": ", ".join(
+            f"CORR({a}, {b}) AS {a}_{b}" for i, a in enumerate(columns) for b in columns[i:]
+        ),
+        "not_null_conditions": " AND ".join(f"{c} IS NOT NULL" for c in columns),
+    }
+    queries = [(template["name"], template["sql"].format(**params), None)]
+    if "sql_multi" in template:
+        queries.append((f"{template['name']} (multi)", template["sql_multi"], {
+            "tickers": tickers, "start_date": start_date, "end_date": end_date
+        }))
+    return queries
+
+def time_query(backend, sql: str, params: dict, repeat: int) -> tuple:
+    backend.query(sql, params=params)  # warm-up
+    timings = []
+    rows = 0
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = backend.query(sql, params=params)
+        timings.append((time.perf_counter() - start) * 1000)
+        rows = len(result)
+    return statistics.median(timings), max(timings), rows
+
+def main():
+    parser = argparse.ArgumentParser(description="So sánh PostgreSQL và DuckDB trên mọi template trong visualized_template.yml")
+    parser.add_argument("--repeat", type=int, default=20)
+    parser.add_argument("--tickers", default="AAPL,MSFT,IBM")
+    parser.add_argument("--start-date", default="2024-01-01")
+    parser.add_argument("--end-date", default="2024-12-31")
+    args = parser.parse_args()
+
+    tickers = [t.strip().upper() for t in args.tickers.split(",") if t.strip()]
+    backends = [PostgresBackend(), DuckDBBackend()]
+
+    print(f"{'template':<50} " + " ".join(f"{b.name + ' p50/max ms':>24} {'rows':>6}" for b in backends))
+    for template in load_templates():
+        for name, sql, params in render_template(template, tickers, args.start_date, args.end_date):
+            cells = []
+            for backend in backends:
+                try:
+                    p50, worst, rows = time_query(backend, sql, params, args.repeat)
+                    cells.append(f"{p50:>11.2f}/{worst:<12.2f} {rows:>6}")
+                except Exception as e:
+                    logger.error(f"{backend.name} failed on {name}: {str(e)}")
+                    cells.append(f"{'error':>24} {'-':>6}")
+            print(f"{name:<50} " + " ".join(cells))
+
+if __name__ == "__main__":
+    main()
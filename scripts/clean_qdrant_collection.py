@@ -1,47 +1,53 @@
 # scripts/clean_qdrant_collection.py
+import argparse
 import sys
 from pathlib import Path
-from qdrant_client import QdrantClient
-from qdrant_client.http import models
 
 # Thêm thư mục gốc dự án vào sys.path
 BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(BASE_DIR))
 
 from utils.logging import setup_logging
-from config.env import QDRANT_HOST, QDRANT_PORT
+from config.env import QDRANT_COLLECTION_PROFILE
+from utils.rag_manifest import RagManifest
+from utils.qdrant_schema import COLLECTION_PROFILES
+from tools.vector_backends import QdrantBackend
 
 logger = setup_logging()
 
-def clean_qdrant_collection(collection_name="financial_docs"):
-    """Xóa dữ liệu trong collection của Qdrant."""
+def clean_qdrant_collection(collection_name="financial_docs", profile=QDRANT_COLLECTION_PROFILE, migrate=False):
+    """Xóa dữ liệu trong collection của Qdrant và tạo lại collection trống theo profile.
+
+    collection_name là alias: collection trống mới được tạo và alias chuyển sang trước khi xóa collection cũ.
+    Để đổi profile/nạp lại mà RAG vẫn phục vụ trong lúc nạp, dùng scripts/reindex_rag.py.
+    collection_name còn là collection thường (tạo trước khi dùng alias) thì cần migrate=True (--migrate) để thay bằng alias.
+    """
     try:
-        # Khởi tạo Qdrant client
-        client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
-        
+        backend = QdrantBackend(collection_name, profile)
+
         # Kiểm tra collection tồn tại
-        collections = client.get_collections()
-        if collection_name not in [col.name for col in collections.collections]:
+        old_collection = backend.physical_collection()
+        if old_collection is None:
             logger.warning(f"Collection {collection_name} không tồn tại trong Qdrant")
             return
-        
-        # Xóa collection
-        client.delete_collection(collection_name=collection_name)
-        logger.info(f"Đã xóa collection {collection_name} trong Qdrant")
-
-        # Tạo lại collection trống
-        client.create_collection(
-            collection_name=collection_name,
-            vectors_config=models.VectorParams(
-                size=384,  # Kích thước vector của all-MiniLM-L6-v2
-                distance=models.Distance.COSINE
-            )
-        )
-        logger.info(f"Đã tạo lại collection {collection_name} trống trong Qdrant")
-    
+
+        # Tạo collection trống, chuyển alias rồi xóa collection cũ
+        backend.clear(migrate=migrate)
+        logger.info(f"Đã xóa collection {old_collection} và trỏ {collection_name} tới collection trống {backend.physical_collection()}")
+
+        # Manifest không còn khớp với collection rỗng, lần populate sau sẽ nạp lại toàn bộ
+        manifest = RagManifest(path=backend.manifest_path)
+        manifest.clear()
+        manifest.save()
+
     except Exception as e:
         logger.error(f"Lỗi khi xóa collection {collection_name}: {str(e)}")
         raise
 
 if __name__ == "__main__":
-    clean_qdrant_collection()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Xóa và tạo lại collection Qdrant")
+    parser.add_argument("--collection", default="financial_docs")
+    parser.add_argument("--profile", default=QDRANT_COLLECTION_PROFILE, choices=list(COLLECTION_PROFILES))
+    parser.add_argument("--migrate", action="store_true", help="Cho phép xóa collection thường tên trùng alias để tạo alias")
+    args = parser.parse_args()
+    clean_qdrant_collection(args.collection, args.profile, args.migrate)
\ No newline at end of file
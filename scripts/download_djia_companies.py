@@ -9,10 +9,10 @@ sys.path.append(str(BASE_DIR))
 import requests
 import time
 import random
-from sqlalchemy import create_engine, text
-from config.env import DATABASE_URL, ALPHA_VANTAGE_API_KEY
+from sqlalchemy import text
+from config.env import ALPHA_VANTAGE_API_KEY
 from utils.logging import setup_logging
-from utils.validators import validate_database_url
+from utils.db import get_engine
 
 logger = setup_logging()
 
@@ -75,8 +75,7 @@ def get_company_info_with_retry(ticker, max_retries=5, initial_delay=10):
 
 def save_to_postgres(companies_info):
     try:
-        validate_database_url(DATABASE_URL)
-        engine = create_engine(DATABASE_URL)
+        engine = get_engine("ingest")
         with engine.connect() as conn:
             for info in companies_info:
                 if info is None:
@@ -11,10 +11,11 @@ import pandas as pd
 import time
 import random
 from datetime import datetime, date, timedelta
-from sqlalchemy import create_engine, text
-from config.env import DATABASE_URL, ALPHA_VANTAGE_API_KEY
+from sqlalchemy import text
+from config.env import ALPHA_VANTAGE_API_KEY
 from utils.logging import setup_logging
-from utils.validators import validate_database_url
+from utils.price_store import refresh_price_store
+from utils.db import get_engine
 
 logger = setup_logging()
 
@@ -98,8 +99,7 @@ def download_stock_prices_with_retry(ticker, start_date, end_date, max_retries=5
 
 def save_to_postgres(prices):
     try:
-        validate_database_url(DATABASE_URL)
-        engine = create_engine(DATABASE_URL)
+        engine = get_engine("ingest")
         with engine.connect() as conn:
             for _, row in prices.iterrows():
                 conn.execute(
@@ -132,6 +132,8 @@ def save_to_postgres(prices):
                     }
                 )
             conn.commit()
+            # Dựng lại price store từ stock_prices sau khi ingest
+            refresh_price_store(conn)
         logger.info("Stock prices saved to PostgreSQL successfully")
     except Exception as e:
         logger.error(f"Failed to save stock prices to PostgreSQL: {str(e)}")
@@ -0,0 +1,78 @@
+# scripts/index_snapshot.py
+import argparse
+import os
+import sys
+import time
+from pathlib import Path
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from config.env import EMBEDDING_RUNTIME, QDRANT_COLLECTION_PROFILE, RAG_DATA_DIR, VECTOR_BACKEND, FACTS_STORE_ENABLED
+from tools.rag_tool import INGEST_SETTINGS
+from tools.vector_backends import create_vector_backend
+from utils.embedder import embedding_fingerprint
+from utils.financial_facts import save_file_facts
+from utils.index_snapshot import export_snapshot, import_snapshot
+from utils.logging import setup_logging
+
+logger = setup_logging()
+
+SNAPSHOT_DIR = os.path.join(BASE_DIR, "data", "snapshots")
+
+
+def export_command(args):
+    backend = create_vector_backend(args.backend, collection_name=args.collection)
+    output = args.output or os.path.join(SNAPSHOT_DIR, f"{args.collection}-{backend.name}-{time.strftime('%Y%m%d-%H%M%S')}.zip")
+    meta = export_snapshot(backend, output)
+    print(f"{output}: {meta['count']} points, {len(meta['files'])} files, model {meta['model']}, {os.path.getsize(output) / 2**20:.1f} MiB")
+
+
+def import_command(args):
+    start = time.perf_counter()
+    backend = create_vector_backend(args.backend, collection_name=args.collection, profile=args.profile)
+    expected_model = None if args.skip_model_check else embedding_fingerprint(INGEST_SETTINGS["model"], EMBEDDING_RUNTIME)
+    result = import_snapshot(args.snapshot, backend, expected_model=expected_model, replace=args.replace, migrate=args.migrate)
+    index_stats = backend.build_index()
+    if index_stats:
+        logger.info(f"Built {backend.name} index: {index_stats}")
+    files = result["meta"]["files"]
+    if FACTS_STORE_ENABLED:
+        try:
+            save_file_facts(list(files), result["facts"])
+        except Exception as e:
+            logger.warning(f"Financial facts store unavailable, facts lookups will fall back to vector search: {str(e)}")
+    # populate_rag.py coi file không còn trong RAG_DATA_DIR là đã bị xóa và xóa point của nó
+    missing = [filename for filename in files if not os.path.exists(os.path.join(RAG_DATA_DIR, filename))]
+    if missing:
+        logger.warning(f"{len(missing)} snapshot source files are not in RAG_DATA_DIR; copy them before running populate_rag.py: {missing[:10]}")
+    print(f"Imported {result['points']} points ({len(files)} files) into {backend.name} in {time.perf_counter() - start:.1f}s")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export/import snapshot của vector index RAG (vector, payload, manifest file nguồn, model fingerprint)")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+
+    export_parser = subparsers.add_parser("export", help="Ghi index đã nạp ra một file snapshot")
+    export_parser.add_argument("--backend", default=VECTOR_BACKEND, choices=["qdrant", "embedded"])
+    export_parser.add_argument("--collection", default="financial_docs")
+    export_parser.add_argument("--output", help=f"Mặc định: {SNAPSHOT_DIR}/<collection>-<backend>-<thời gian>.zip")
+    export_parser.set_defaults(func=export_command)
+
+    import_parser = subparsers.add_parser("import", help="Bulk upload snapshot vào backend của node này")
+    import_parser.add_argument("snapshot")
+    import_parser.add_argument("--backend", default=VECTOR_BACKEND, choices=["qdrant", "embedded"])
+    import_parser.add_argument("--collection", default="financial_docs")
+    import_parser.add_argument("--profile", default=QDRANT_COLLECTION_PROFILE, help="Profile khi phải tạo collection Qdrant mới")
+    import_parser.add_argument("--replace", action="store_true", help="Xóa collection đích nếu đã có dữ liệu")
+    import_parser.add_argument("--migrate", action="store_true", help="Với --replace: cho phép xóa collection Qdrant thường tên trùng alias để tạo alias")
+    import_parser.add_argument("--skip-model-check", action="store_true", help="Bỏ qua kiểm tra model fingerprint (EMBEDDING_RUNTIME)")
+    import_parser.set_defaults(func=import_command)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    main()
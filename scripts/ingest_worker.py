@@ -0,0 +1,47 @@
+# scripts/ingest_worker.py
+import argparse
+import os
+import signal
+import sys
+import threading
+from pathlib import Path
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from config.env import INGEST_WORKER_NICE, INGEST_WORKER_THREADS
+from tools.ingest_worker import IngestWorker
+from tools.rag_tool import CustomRAGTool
+from utils.logging import setup_logging
+
+logger = setup_logging()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Worker nền nạp tài liệu mới/đổi trong RAG_DATA_DIR vào vector backend")
+    parser.add_argument("--once", action="store_true", help="Chỉ chạy một lượt (không debounce) rồi thoát")
+    args = parser.parse_args()
+
+    # Ưu tiên CPU thấp hơn process phục vụ query; process OCR con kế thừa niceness này
+    if INGEST_WORKER_NICE and hasattr(os, "nice"):
+        os.nice(INGEST_WORKER_NICE)
+    rag_tool = CustomRAGTool(micro_batching=False, embedding_threads=INGEST_WORKER_THREADS)
+    worker = IngestWorker(rag_tool, ocr_nice=0)
+    if args.once:
+        worker.watcher.debounce_s = 0
+        while worker.run_once():
+            pass
+        return
+
+    stop_event = threading.Event()
+    signal.signal(signal.SIGTERM, lambda signum, frame: stop_event.set())
+    try:
+        worker.run(stop_event)
+    except KeyboardInterrupt:
+        pass
+    logger.info("Background ingest worker stopped")
+
+
+if __name__ == "__main__":
+    main()
@@ -6,17 +6,15 @@ from pathlib import Path
 BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.append(str(BASE_DIR))
 
-from sqlalchemy import create_engine, text
-from config.env import DATABASE_URL
+from sqlalchemy import text
 from utils.logging import setup_logging
-from utils.validators import validate_database_url
+from utils.db import get_engine
 
 logger = setup_logging()
 
 def init_database():
     try:
-        validate_database_url(DATABASE_URL)
-        engine = create_engine(DATABASE_URL)
+        engine = get_engine("ingest")
         with engine.connect() as conn:
             # Create companies table
             conn.execute(text("""
@@ -51,6 +49,22 @@ def init_database():
                     UNIQUE(symbol, date)
                 )
             """))
+            # Chỉ số tài chính trích xuất từ tài liệu RAG lúc ingest (utils/financial_facts.py)
+            conn.execute(text("""
+                CREATE TABLE IF NOT EXISTS financial_facts (
+                    id SERIAL PRIMARY KEY,
+                    company VARCHAR(255) NOT NULL,
+                    symbol VARCHAR(10),
+                    metric VARCHAR(64) NOT NULL,
+                    fiscal_year INTEGER,
+                    value DOUBLE PRECISION NOT NULL,
+                    unit VARCHAR(8),
+                    filename VARCHAR(255) NOT NULL,
+                    point_id VARCHAR(64) NOT NULL
+                )
+            """))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_financial_facts_lookup ON financial_facts (company, metric, fiscal_year)"))
+            conn.execute(text("CREATE INDEX IF NOT EXISTS idx_financial_facts_filename ON financial_facts (filename)"))
             conn.commit()
         logger.info("Database initialized successfully")
     except Exception as e:
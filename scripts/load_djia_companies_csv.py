@@ -7,10 +7,11 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.append(str(BASE_DIR))
 
 import pandas as pd
-from sqlalchemy import create_engine, text
-from config.env import DATABASE_URL
+from sqlalchemy import text
+from config.env import SQL_BACKEND
+from tools.sql_backends import write_parquet_table
 from utils.logging import setup_logging
-from utils.validators import validate_database_url
+from utils.db import get_engine
 
 logger = setup_logging()
 
@@ -56,6 +57,17 @@ def save_to_postgres(df, conn):
         logger.error(f"Failed to insert data into 'companies' table: {str(e)}")
         raise
 
+def save_to_parquet(df):
+    """Ghi companies ra Parquet cho DuckDB backend."""
+    try:
+        parquet_df = df.copy()
+        decimal_columns = ["pe_ratio", "dividend_yield", "week_high_52", "week_low_52"]
+        parquet_df[decimal_columns] = parquet_df[decimal_columns].round(2)
+        write_parquet_table(parquet_df, "companies")
+    except Exception as e:
+        logger.error(f"Failed to write 'companies' Parquet: {str(e)}")
+        raise
+
 def main():
     csv_file = os.path.join(BASE_DIR, "data", "djia_companies_20250426.csv")
     
@@ -64,9 +76,13 @@ def main():
         if not os.path.exists(csv_file):
             raise FileNotFoundError(f"CSV file not found: {csv_file}")
 
+        if SQL_BACKEND == "duckdb":
+            save_to_parquet(load_companies_csv(csv_file))
+            logger.info("Successfully loaded companies data from CSV to Parquet")
+            return
+
         # Kết nối PostgreSQL
-        validate_database_url(DATABASE_URL)
-        engine = create_engine(DATABASE_URL)
+        engine = get_engine("ingest")
         with engine.connect() as conn:
             # Truncate bảng companies
             truncate_companies_table(conn)
@@ -7,10 +7,12 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.append(str(BASE_DIR))
 
 import pandas as pd
-from sqlalchemy import create_engine, text
-from config.env import DATABASE_URL
+from sqlalchemy import text
+from config.env import SQL_BACKEND
+from tools.sql_backends import write_parquet_table
+from utils.price_store import build_price_store, refresh_price_store
 from utils.logging import setup_logging
-from utils.validators import validate_database_url
+from utils.db import get_engine
 
 logger = setup_logging()
 
@@ -102,6 +104,27 @@ def save_to_postgres(df, conn):
         logger.error(f"Failed to insert data into 'stock_prices' table: {str(e)}")
         raise
 
+def save_to_parquet(df):
+    """Ghi stock_prices ra Parquet cho DuckDB backend, cùng kiểu dữ liệu với bảng PostgreSQL."""
+    try:
+        columns = ["symbol", "date", "open_price", "high_price", "low_price", "close_price",
+                   "volume", "dividends", "stock_splits"]
+        parquet_df = df[columns].copy()
+        parquet_df["date"] = parquet_df["date"].dt.date
+        # DECIMAL(10, 2) trong PostgreSQL
+        price_columns = ["open_price", "high_price", "low_price", "close_price", "dividends", "stock_splits"]
+        parquet_df[price_columns] = parquet_df[price_columns].round(2)
+        parquet_df = parquet_df.drop_duplicates(subset=["symbol", "date"], keep="last").sort_values(["symbol", "date"])
+        write_parquet_table(parquet_df, "stock_prices")
+    except Exception as e:
+        logger.error(f"Failed to write 'stock_prices' Parquet: {str(e)}")
+        raise
+    # Parquet đã ghi xong: lỗi dựng price store chỉ là cảnh báo, query fallback về SQL
+    try:
+        build_price_store(parquet_df)
+    except Exception as e:
+        logger.warning(f"Failed to build price store, queries fall back to SQL: {str(e)}")
+
 def main():
     csv_file = os.path.join(BASE_DIR, "data", "djia_prices_20250426.csv")
     
@@ -110,15 +133,22 @@ def main():
         if not os.path.exists(csv_file):
             raise FileNotFoundError(f"CSV file not found: {csv_file}")
 
+        if SQL_BACKEND == "duckdb":
+            save_to_parquet(load_stock_prices_csv(csv_file))
+            logger.info("Successfully loaded stock prices data from CSV to Parquet")
+            return
+
         # Kết nối PostgreSQL
-        validate_database_url(DATABASE_URL)
-        engine = create_engine(DATABASE_URL)
+        engine = get_engine("ingest")
         with engine.connect() as conn:
             # Đọc và xử lý CSV
             df = load_stock_prices_csv(csv_file)
             
             # Lưu vào PostgreSQL
             save_to_postgres(df, conn)
+
+            # Dựng lại price store từ stock_prices sau khi ingest
+            refresh_price_store(conn)
         
         logger.info("Successfully loaded stock prices data from CSV to PostgreSQL")
     except Exception as e:
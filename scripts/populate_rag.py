@@ -1,4 +1,5 @@
 # scripts/populate_rag.py
+import argparse
 import os
 import sys
 from pathlib import Path
@@ -8,6 +9,10 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.insert(0, str(BASE_DIR))  # Thêm vào đầu sys.path để ưu tiên
 
 from tools.rag_tool import CustomRAGTool
+from tools.vector_backends import create_vector_backend
+from config.env import QDRANT_COLLECTION_PROFILE, VECTOR_BACKEND
+from utils.ingest_jobs import IngestJobStore, ingest_jobs_path
+from utils.qdrant_schema import COLLECTION_PROFILES
 from utils.logging import setup_logging
 
 logger = setup_logging()
@@ -15,15 +20,32 @@ logger.debug(f"sys.path: {sys.path}")
 logger.debug(f"BASE_DIR: {BASE_DIR}")
 
 
-def populate_rag():
-    """Vector hóa và upsert tài liệu từ RAG_DATA_DIR vào Qdrant."""
+def populate_rag(profile: str = QDRANT_COLLECTION_PROFILE, backend: str = VECTOR_BACKEND, retry_failed: bool = False):
+    """Vector hóa và upsert tài liệu từ RAG_DATA_DIR vào vector backend (profile dùng khi collection Qdrant chưa tồn tại).
+
+    Chạy lại sau khi bị dừng giữa chừng sẽ tiếp tục từ checkpoint trong job table; nhiều process populate_rag.py
+    có thể chạy song song và chia nhau các file. retry_failed: thử lại các file đã lỗi INGEST_JOB_MAX_ATTEMPTS lần.
+    Với backend embedded, sau khi nạp sẽ compact index và build IVF nếu corpus vượt EMBEDDED_EXACT_MAX_ROWS.
+    """
     try:
-        rag_tool = CustomRAGTool()
+        vector_backend = create_vector_backend(backend, profile=profile)
+        if retry_failed:
+            reset = IngestJobStore(ingest_jobs_path(vector_backend.manifest_path)).reset_attempts()
+            logger.info(f"Retrying {reset} previously failed files")
+        rag_tool = CustomRAGTool(collection_profile=profile, vector_backend=vector_backend)
         rag_tool._load_documents()
-        logger.info("RAG documents populated successfully")
+        index_stats = vector_backend.build_index()
+        if index_stats:
+            logger.info(f"Built {vector_backend.name} index: {index_stats}")
+        logger.info(f"RAG documents populated successfully ({vector_backend.name} backend)")
     except Exception as e:
         logger.error(f"Failed to populate RAG documents: {str(e)}")
         raise
 
 if __name__ == "__main__":
-    populate_rag()
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Nạp tài liệu RAG vào Qdrant hoặc embedded index")
+    parser.add_argument("--profile", default=QDRANT_COLLECTION_PROFILE, choices=list(COLLECTION_PROFILES))
+    parser.add_argument("--backend", default=VECTOR_BACKEND, choices=["qdrant", "embedded"])
+    parser.add_argument("--retry-failed", action="store_true", help="Thử lại các file đã hết số lần thử trong job table")
+    args = parser.parse_args()
+    populate_rag(args.profile, args.backend, args.retry_failed)
\ No newline at end of file
@@ -0,0 +1,157 @@
+# scripts/reindex_rag.py
+import argparse
+import json
+import os
+import shutil
+import sys
+from pathlib import Path
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.insert(0, str(BASE_DIR))
+
+from config.env import QDRANT_COLLECTION_PROFILE, RAG_MANIFEST_PATH
+from tools.rag_tool import CustomRAGTool
+from tools.vector_backends import QdrantBackend
+from utils.qdrant_schema import COLLECTION_PROFILES, resolve_collection, switch_alias, versioned_collection_name, versioned_collections
+from utils.rag_manifest import collection_manifest_path
+from utils.ingest_jobs import copy_ingest_jobs, ingest_jobs_path
+from utils.logging import setup_logging
+
+logger = setup_logging()
+
+# Query kiểm tra collection mới trước khi chuyển alias: mỗi query phải trả về tài liệu (ghi đè bằng --queries).
+# Ngoài các query chung, mỗi công ty trong corpus (tối đa MAX_COMPANY_QUERIES) có một query lọc theo công ty.
+DEFAULT_VALIDATION_QUERIES = [
+    {"query": "What was the net revenue in the latest fiscal year?"},
+    {"query": "Net income and diluted earnings per share"},
+    {"query": "What are the main risk factors?"},
+]
+MAX_COMPANY_QUERIES = 5
+
+
+def corpus_queries(manifest_path: str) -> list:
+    """Query theo công ty cho các file trong manifest (công ty lấy từ tên file như lúc ingest)."""
+    if not os.path.exists(manifest_path):
+        return []
+    with open(manifest_path) as file:
+        filenames = sorted(json.load(file).get("files", {}))
+    companies = []
+    for filename in filenames:
+        company = filename.replace(".pdf", "").split("_")[0]
+        if company not in companies:
+            companies.append(company)
+    return [{"query": "Net revenue and net income", "company": company} for company in companies[:MAX_COMPANY_QUERIES]]
+
+
+def activate_manifest(alias: str, new_collection: str, old_collection: str = None) -> None:
+    """Manifest của alias (RAG_MANIFEST_PATH) thành manifest của new_collection; manifest hiện tại được lưu lại cho old_collection.
+
+    Job table nạp tài liệu (ingest_jobs_path của manifest) đi cùng manifest, để lần populate/worker sau có lịch sử của collection đang phục vụ.
+    """
+    if old_collection and os.path.exists(RAG_MANIFEST_PATH):
+        shutil.copyfile(RAG_MANIFEST_PATH, collection_manifest_path(old_collection))
+    if old_collection and os.path.exists(ingest_jobs_path(RAG_MANIFEST_PATH)):
+        copy_ingest_jobs(ingest_jobs_path(RAG_MANIFEST_PATH), ingest_jobs_path(collection_manifest_path(old_collection)))
+    copy_ingest_jobs(ingest_jobs_path(collection_manifest_path(new_collection)), ingest_jobs_path(RAG_MANIFEST_PATH))
+    source = collection_manifest_path(new_collection)
+    if not os.path.exists(source):
+        logger.warning(f"No manifest for {new_collection}, next populate_rag.py run will re-ingest every file")
+        return
+    tmp_path = RAG_MANIFEST_PATH + ".tmp"
+    shutil.copyfile(source, tmp_path)
+    os.replace(tmp_path, RAG_MANIFEST_PATH)
+
+
+def validate(rag_tool, queries: list, min_points: int) -> list:
+    """Các lỗi kiểm tra collection của rag_tool (rỗng nếu đạt)."""
+    errors = []
+    count = rag_tool.backend.count()
+    if count < min_points:
+        errors.append(f"collection has {count} points, expected at least {min_points}")
+    for item in queries:
+        results = rag_tool.run(item["query"], company=item.get("company"), tickers=item.get("tickers"), date_range=item.get("date_range"))
+        failed = not results or any("error" in result for result in results)
+        logger.info(f"Validation query {item['query']!r}: {'FAILED' if failed else [result['filename'] for result in results]}")
+        if failed:
+            errors.append(f"no documents for {item['query']!r}: {results[0].get('error') if results else 'empty result'}")
+    return errors
+
+
+def prune(client, alias: str, keep: int) -> None:
+    """Giữ keep collection có phiên bản mới nhất (gồm collection alias đang trỏ tới), xóa phần còn lại."""
+    current = resolve_collection(client, alias)
+    old = [name for name in versioned_collections(client, alias) if name != current]
+    for name in old[:max(0, len(old) - (keep - 1))]:
+        client.delete_collection(collection_name=name)
+        if os.path.exists(collection_manifest_path(name)):
+            os.remove(collection_manifest_path(name))
+        logger.info(f"Deleted old collection {name}")
+
+
+def reindex(alias: str, profile: str, queries: list = None, min_ratio: float = 0.9, keep: int = 2, migrate: bool = False) -> bool:
+    """Nạp toàn bộ tài liệu vào collection mới, kiểm tra rồi chuyển alias; RAG vẫn phục vụ collection cũ trong lúc nạp.
+
+    queries: query kiểm tra, mặc định DEFAULT_VALIDATION_QUERIES cộng query theo từng công ty trong corpus.
+    migrate: cho phép xóa alias nếu nó đang là collection thường (lần chuyển sang alias đầu tiên, không rollback được).
+    """
+    live = QdrantBackend(alias, profile)
+    old_collection = live.physical_collection()
+    if old_collection == alias and not migrate:
+        logger.error(f"{alias} is a plain collection that will be deleted when the alias is created; rerun with --migrate to confirm")
+        return False
+    old_count = live.count() if old_collection else 0
+    new_collection = versioned_collection_name(alias)
+    logger.info(f"Reindexing into {new_collection} (profile={profile}), {alias} keeps serving {old_collection} ({old_count} points)")
+
+    build = QdrantBackend(new_collection, profile, alias=False)
+    rag_tool = CustomRAGTool(collection_profile=profile, vector_backend=build, micro_batching=False)
+    rag_tool._load_documents()
+
+    queries = queries if queries is not None else DEFAULT_VALIDATION_QUERIES + corpus_queries(build.manifest_path)
+    errors = validate(rag_tool, queries, max(1, int(old_count * min_ratio)))
+    if errors:
+        logger.error(f"Validation of {new_collection} failed, {alias} still points to {old_collection}: {errors}")
+        return False
+
+    previous = switch_alias(build.client, alias, new_collection, migrate=migrate)
+    activate_manifest(alias, new_collection, previous)
+    logger.info(f"Reindex finished: {alias} -> {new_collection} ({build.count()} points), previous collection {previous} kept for rollback")
+    prune(build.client, alias, keep)
+    return True
+
+
+def rollback(alias: str) -> bool:
+    """Trỏ alias về collection có phiên bản ngay trước collection hiện tại."""
+    live = QdrantBackend(alias)
+    current = live.physical_collection()
+    older = [name for name in versioned_collections(live.client, alias) if current is None or name < current]
+    if not older:
+        logger.error(f"No previous collection to roll {alias} back to (current: {current})")
+        return False
+    switch_alias(live.client, alias, older[-1])
+    activate_manifest(alias, older[-1], current)
+    logger.info(f"Rolled back {alias}: {current} -> {older[-1]}")
+    return True
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Reindex tài liệu RAG vào collection Qdrant mới rồi chuyển alias, không gián đoạn query")
+    parser.add_argument("--alias", default="financial_docs")
+    parser.add_argument("--profile", default=QDRANT_COLLECTION_PROFILE, choices=list(COLLECTION_PROFILES))
+    parser.add_argument("--queries", help="File JSON: list các {\"query\", \"company\", \"tickers\", \"date_range\"} dùng để kiểm tra")
+    parser.add_argument("--min-ratio", type=float, default=0.9, help="Số point tối thiểu so với collection hiện tại")
+    parser.add_argument("--keep", type=int, default=2, help="Số collection có phiên bản được giữ (gồm collection mới)")
+    parser.add_argument("--rollback", action="store_true", help="Trỏ alias về collection trước đó")
+    parser.add_argument("--migrate", action="store_true", help="Cho phép xóa collection thường tên trùng alias để tạo alias (một lần, không rollback)")
+    args = parser.parse_args()
+
+    if args.rollback:
+        ok = rollback(args.alias)
+    else:
+        validation_queries = None
+        if args.queries:
+            with open(args.queries) as file:
+                validation_queries = json.load(file)
+        ok = reindex(args.alias, args.profile, validation_queries, args.min_ratio, max(2, args.keep), args.migrate)
+    sys.exit(0 if ok else 1)
@@ -0,0 +1,43 @@
+import sys
+from pathlib import Path
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+import unittest
+from utils.chunker import chunk_text, split_segments
+
+def count_words(texts):
+    return [len(text.split()) for text in texts]
+
+class TestChunker(unittest.TestCase):
+    def test_sentence_segments_keep_decimals(self):
+        text = "Revenue grew 5.2% to $3.1 billion. Margins improved! Outlook unchanged"
+        sentences = [text[start:end] for start, end, _ in split_segments(text)]
+        self.assertEqual(sentences, ["Revenue grew 5.2% to $3.1 billion.", "Margins improved!", "Outlook unchanged"])
+
+    def test_chunks_respect_token_limit_and_offsets(self):
+        text = " ".join(f"Sentence number {i} describes quarterly results in detail." for i in range(200))
+        chunks = chunk_text(text, max_tokens=40, overlap_tokens=0, count_tokens=count_words)
+        self.assertGreater(len(chunks), 1)
+        for chunk, start, end in chunks:
+            self.assertEqual(chunk, text[start:end])
+            self.assertLessEqual(len(chunk.split()), 40)
+            self.assertTrue(chunk.endswith("."))
+
+    def test_overlap_repeats_trailing_sentences(self):
+        text = " ".join(f"Item {i} closes the period." for i in range(30))
+        chunks = chunk_text(text, max_tokens=20, overlap_tokens=5, count_tokens=count_words)
+        for (_, _, previous_end), (_, next_start, _) in zip(chunks, chunks[1:]):
+            self.assertLess(next_start, previous_end)
+
+    def test_table_block_kept_intact(self):
+        table = "| Segment | 2024 | 2023 |\n| Americas | 167,045 | 162,560 |\n| Europe | 101,328 | 94,294 |"
+        prose = " ".join(f"Paragraph sentence {i} about performance." for i in range(20))
+        text = prose + "\n" + table + "\n" + prose
+        chunks = chunk_text(text, max_tokens=30, overlap_tokens=0, count_tokens=count_words)
+        self.assertEqual(sum(table in chunk for chunk, _, _ in chunks), 1)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,66 @@
+import sys
+from pathlib import Path
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+import unittest
+import numpy as np
+from utils.diversify import diversify, jaccard_estimate, minhash_signature
+
+BOILERPLATE = ("The following table sets forth net revenue by geographic region for the fiscal years ended "
+               "September 30, 2022 and 2021 in millions of dollars except percentages")
+
+class TestDiversify(unittest.TestCase):
+    def test_minhash_separates_near_duplicates_from_distinct_text(self):
+        original = minhash_signature(BOILERPLATE + " U.S. 12,000 International 17,310")
+        repeated = minhash_signature(BOILERPLATE + " U.S. 12,000 International 17,311")
+        distinct = minhash_signature("Litigation provision increased due to the interchange multidistrict settlement")
+        self.assertEqual(minhash_signature(BOILERPLATE), minhash_signature(BOILERPLATE))
+        self.assertGreater(jaccard_estimate(original, repeated), 0.8)
+        self.assertLess(jaccard_estimate(original, distinct), 0.2)
+
+    def test_duplicates_dropped_and_mmr_prefers_distinct_content(self):
+        query = np.array([1.0, 0.0, 0.0])
+        vectors = [np.array([1.0, 0.1, 0.0]), np.array([1.0, 0.1, 0.0]), np.array([1.0, 0.12, 0.0]), np.array([0.8, 0.0, 0.6])]
+        signatures = [
+            minhash_signature(BOILERPLATE + " page 1"),
+            minhash_signature(BOILERPLATE + " page 1"),
+            minhash_signature("Net revenue grew on higher payments volume and cross-border travel"),
+            minhash_signature("Operating expenses rose on personnel and marketing"),
+        ]
+        # Ứng viên 1 trùng ứng viên 0; ứng viên 2 gần như cùng hướng với 0 nên MMR chọn ứng viên 3 trước
+        self.assertEqual(diversify(query, vectors, signatures, k=2, lambda_=0.5), [0, 3])
+        # Không có vector: giữ thứ tự hạng sau khi lọc trùng
+        self.assertEqual(diversify(query, [None] * 4, signatures, k=3), [0, 2, 3])
+
+    def test_per_document_cap_applied_after_deduplication(self):
+        # Một tài liệu (filter công ty/năm) có nhiều hơn k chunk gần trùng đứng đầu bảng xếp hạng
+        query = np.array([1.0, 0.0, 0.0])
+        k = 3
+        vectors = [np.array([1.0, 0.05 * i, 0.0]) for i in range(5)] + [
+            np.array([0.9, 0.0, 0.3]), np.array([0.8, 0.0, 0.5]), np.array([0.7, 0.6, 0.0])
+        ]
+        signatures = [minhash_signature(BOILERPLATE + " page 1")] * 5 + [
+            minhash_signature("Net revenue grew on higher payments volume and cross-border travel"),
+            minhash_signature("Operating expenses rose on personnel and marketing"),
+            minhash_signature("Litigation provision increased due to the interchange multidistrict settlement"),
+        ]
+        groups = ["Visa_2022.pdf"] * 8
+        selected = diversify(query, vectors, signatures, k, lambda_=0.7, groups=groups, max_per_group=2)
+        # Đủ k kết quả khác nhau dù chỉ có một tài liệu và 5 ứng viên đầu là một chunk lặp lại
+        self.assertEqual(len(selected), k)
+        self.assertEqual(sum(1 for i in selected if i < 5), 1)
+        self.assertEqual(diversify(query, [None] * 8, signatures, k, groups=groups, max_per_group=2), [0, 5, 6])
+
+    def test_per_document_cap_prefers_other_documents(self):
+        query = np.array([1.0, 0.0])
+        vectors = [np.array([1.0, 0.0]), np.array([0.99, 0.1]), np.array([0.98, 0.2]), np.array([0.5, 0.5])]
+        signatures = [minhash_signature(f"distinct chunk number {word} about revenue") for word in ("one", "two", "three", "four")]
+        groups = ["A.pdf", "A.pdf", "A.pdf", "B.pdf"]
+        selected = diversify(query, vectors, signatures, 3, lambda_=1.0, groups=groups, max_per_group=2)
+        self.assertEqual(selected, [0, 1, 3])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,44 @@
+import sys
+from pathlib import Path
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+import unittest
+import numpy as np
+from utils.diversify import cap_per_group
+from utils.doc_summary import DocumentSummaries
+
+def chunk_point(filename, chunk_id, vector):
+    return {"id": f"{filename}-{chunk_id}", "vector": np.array(vector, dtype=np.float32), "payload": {
+        "filename": filename, "company": "Visa Inc.", "symbol": "V", "year": 2022, "report_type": "annual_report",
+        "chunk_id": chunk_id, "page_extraction": {str(chunk_id + 1): "text_layer"}, "text": "...",
+    }}
+
+class TestDocumentSummaries(unittest.TestCase):
+    def test_document_and_section_vectors_are_normalized_means(self):
+        summaries = DocumentSummaries(section_chunks=2)
+        summaries.add([chunk_point("Visa_2022.pdf", 0, [1, 0]), chunk_point("Visa_2022.pdf", 1, [1, 0])])
+        summaries.add([chunk_point("Visa_2022.pdf", 2, [0, 3])])
+
+        points = summaries.pop("Visa_2022.pdf", "hash")
+        self.assertEqual([point["payload"]["level"] for point in points], ["document", "section", "section"])
+        np.testing.assert_allclose(points[0]["vector"], np.array([2, 3]) / np.sqrt(13), rtol=1e-6)
+        np.testing.assert_allclose(points[2]["vector"], [0, 1])
+        self.assertEqual(points[1]["payload"]["chunk_range"], [0, 1])
+        self.assertEqual(points[1]["payload"]["pages"], ["1", "2"])
+        self.assertEqual(points[0]["payload"]["company"], "Visa Inc.")
+        self.assertNotIn("text", points[0]["payload"])
+        # Cùng file hash thì cùng point ID: nạp lại ghi đè thay vì nhân bản
+        summaries.add([chunk_point("Visa_2022.pdf", 0, [1, 0])])
+        self.assertEqual(summaries.pop("Visa_2022.pdf", "hash")[0]["id"], points[0]["id"])
+        self.assertEqual(summaries.pop("missing.pdf", "hash"), [])
+
+    def test_cap_per_group_backfills_only_when_short(self):
+        groups = ["a.pdf", "a.pdf", "a.pdf", "b.pdf", "a.pdf", "c.pdf"]
+        self.assertEqual(cap_per_group(groups, 2, k=4), [0, 1, 3, 5])
+        self.assertEqual(cap_per_group(["a.pdf"] * 5, 2, k=4), [0, 1, 2, 3])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+import sys
+import tempfile
+from pathlib import Path
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+import multiprocessing
+import os
+import unittest
+import zlib
+import numpy as np
+from utils.embedding_cache import EmbeddingCache
+
+class FakeModel:
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts):
+        self.calls.append(texts)
+        if isinstance(texts, str):
+            return np.full(4, len(texts), dtype=np.float32)
+        return np.array([[len(text)] * 4 for text in texts], dtype=np.float32)
+
+def text_vectors(texts):
+    return np.array([[zlib.crc32(text.encode()) % 100_000] * 4 for text in texts], dtype=np.float32)
+
+def fill_cache(cache_dir, worker):
+    cache = EmbeddingCache("test-model", 4, cache_dir)
+    for start in range(0, 301, 7):
+        cache.encode([f"worker {worker} chunk {i}" for i in range(start, start + 7)], text_vectors)
+
+class TestEmbeddingCache(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.model = FakeModel()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_chunks_encoded_once_and_persisted(self):
+        cache = EmbeddingCache("test-model", 4, self.tmp_dir.name)
+        first = cache.encode(["alpha", "beta  gamma"], self.model.encode)
+        second = cache.encode(["beta gamma", "delta", "alpha"], self.model.encode)
+        self.assertEqual(self.model.calls, [["alpha", "beta  gamma"], ["delta"]])
+        np.testing.assert_array_equal(second[2], first[0])
+        self.assertEqual(cache.stats()["chunk_hits"], 2)
+
+        # Một instance khác (process khác) đọc lại từ đĩa
+        reopened = EmbeddingCache("test-model", 4, self.tmp_dir.name)
+        reopened.encode(["alpha", "delta"], self.model.encode)
+        self.assertEqual(len(self.model.calls), 2)
+        self.assertEqual(reopened.stats()["chunk_hit_rate"], 1.0)
+
+    def test_query_lru(self):
+        cache = EmbeddingCache("test-model", 4, self.tmp_dir.name, query_cache_size=2)
+        for query in ["q1", "q2", "q1", "q3", "q2"]:
+            cache.encode_query(query, self.model.encode)
+        stats = cache.stats()
+        self.assertEqual((stats["query_hits"], stats["query_misses"]), (1, 4))
+
+    @unittest.skipUnless(hasattr(os, "fork"), "cần fork để chạy nhiều process ghi")
+    def test_concurrent_writer_processes_keep_keys_aligned(self):
+        context = multiprocessing.get_context("fork")
+        processes = [context.Process(target=fill_cache, args=(self.tmp_dir.name, worker)) for worker in range(3)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+
+        cache = EmbeddingCache("test-model", 4, self.tmp_dir.name)
+        texts = [f"worker {worker} chunk {i}" for worker in range(3) for i in range(0, 301, 50)]
+        vectors = cache.encode(texts, self.model.encode)
+        self.assertEqual(self.model.calls, [])
+        # Mỗi key phải trả đúng vector của text đó (key và vector không lệch hàng giữa các process)
+        np.testing.assert_array_equal(vectors, text_vectors(texts))
+        self.assertEqual(cache.stats()["stored_vectors"], 3 * 301)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,62 @@
+import sys
+from pathlib import Path
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+import unittest
+from utils.financial_facts import detect_metric, extract_facts, facts_cover, is_value_lookup, prepare_rag_summary
+
+CONFIG = {"formatting": {"rag": {"empty_message": {"vi": "Không có tài liệu."}}}}
+
+class TestFinancialFacts(unittest.TestCase):
+    def test_extract_normalizes_metric_year_value_and_unit(self):
+        facts = extract_facts("Net revenue FY 2022: $29,310 while Net income FY2021 = 12.5B. Diluted earnings per share 6.13.")
+        self.assertEqual(facts, [
+            {"metric": "net_revenue", "fiscal_year": 2022, "value": 29310.0, "unit": None},
+            {"metric": "net_income", "fiscal_year": 2021, "value": 12.5, "unit": "B"},
+            {"metric": "diluted_eps", "fiscal_year": None, "value": 6.13, "unit": None},
+        ])
+
+    def test_summary_uses_payload_facts_and_falls_back_to_extraction(self):
+        documents = [
+            {"document": "ignored", "filename": "Visa_2022.pdf", "company": "Visa Inc.",
+             "facts": [{"metric": "net_revenue", "fiscal_year": 2022, "value": 29310.0, "unit": None}]},
+            {"document": "Net income FY 2022: $14,957", "filename": "Visa_2022.pdf", "company": "Visa Inc."},
+            {"document": "No metrics here.", "filename": "Visa_2022.pdf", "company": "Visa Inc."},
+        ]
+        summary = prepare_rag_summary(documents, CONFIG)
+        self.assertIn("FY 2022: Net revenue: 29310 from Visa_2022.pdf", summary)
+        self.assertIn("FY 2022: Net income: 14957 from Visa_2022.pdf", summary)
+        self.assertIn("No metrics here. from Visa_2022.pdf", summary)
+        self.assertEqual(prepare_rag_summary([], CONFIG), "Không có tài liệu.")
+
+    def test_detect_metric(self):
+        self.assertEqual(detect_metric("Apple net income 2023"), "net_income")
+        self.assertEqual(detect_metric("Microsoft revenue in fiscal 2022"), "net_revenue")
+        self.assertEqual(detect_metric("What is Visa's diluted EPS?"), "diluted_eps")
+        self.assertIsNone(detect_metric("Summarize Apple's risk factors"))
+
+    def test_value_lookup_excludes_qualitative_questions(self):
+        self.assertTrue(is_value_lookup("Apple net income 2023"))
+        self.assertTrue(is_value_lookup("How much revenue did Apple report in 2023?"))
+        self.assertFalse(is_value_lookup("Why did Apple's revenue decline in 2023?"))
+        self.assertFalse(is_value_lookup("Compare Apple and Microsoft net income"))
+        self.assertFalse(is_value_lookup("Summarize Apple's risk factors"))
+
+    def test_facts_cover_requested_years(self):
+        rows = [
+            {"company": "Apple Inc.", "fiscal_year": 2022},
+            {"company": "Apple Inc.", "fiscal_year": None},
+            {"company": "Visa Inc.", "fiscal_year": 2023},
+        ]
+        self.assertTrue(facts_cover(rows, ["Apple Inc."], (2022, 2022)))
+        self.assertFalse(facts_cover(rows, ["Apple Inc."], (2023, 2023)))
+        self.assertFalse(facts_cover(rows, ["Apple Inc."], (2022, 2023)))
+        self.assertFalse(facts_cover(rows, ["Apple Inc.", "Microsoft Corporation"], None))
+        self.assertTrue(facts_cover(rows, ["Apple Inc.", "Visa Inc."], None))
+        self.assertFalse(facts_cover([{"company": "Apple Inc.", "fiscal_year": None}], ["Apple Inc."], None))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,68 @@
+import sys
+import tempfile
+from pathlib import Path
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+import json
+import os
+import unittest
+import zipfile
+import numpy as np
+from tools.vector_backends import EmbeddedBackend
+from utils.index_snapshot import VECTORS_MEMBER, export_snapshot, import_snapshot, open_snapshot
+
+DIM = 8
+
+class TestIndexSnapshot(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.source = EmbeddedBackend("financial_docs", DIM, os.path.join(self.tmp_dir.name, "source"))
+        self.source.ensure_collection()
+        rng = np.random.default_rng(0)
+        self.vectors = rng.normal(size=(30, DIM)).astype(np.float32)
+        self.source.upsert([
+            {"id": f"id-{i}", "vector": self.vectors[i], "sparse": ([i], [1.0]), "payload": {
+                "text": f"chunk {i}", "filename": f"Visa_{2020 + i % 3}.pdf", "company": "Visa Inc.", "symbol": "V", "year": 2020 + i % 3,
+                "facts": [{"metric": "net_revenue", "fiscal_year": 2020 + i % 3, "value": 100.0 + i, "unit": None}] if i < 3 else [],
+            }}
+            for i in range(30)
+        ])
+        with open(self.source.manifest_path, "w") as file:
+            json.dump({"settings": {"model": "all-MiniLM-L6-v2"}, "files": {f"Visa_{year}.pdf": {"hash": str(year), "point_ids": []} for year in (2020, 2021, 2022)}}, file)
+        self.snapshot = os.path.join(self.tmp_dir.name, "snapshot.zip")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_round_trip_with_memory_mapped_vectors(self):
+        meta = export_snapshot(self.source, self.snapshot, batch_size=7)
+        self.assertEqual((meta["count"], meta["dim"], meta["model"]), (30, DIM, "all-MiniLM-L6-v2"))
+        with zipfile.ZipFile(self.snapshot) as archive:
+            self.assertEqual(archive.getinfo(VECTORS_MEMBER).compress_type, zipfile.ZIP_STORED)
+
+        _, vectors = open_snapshot(self.snapshot)
+        self.assertIsInstance(vectors, np.memmap)
+        stored = {hit.id: hit for hit in self.source.search(self.vectors[0], limit=30, with_vectors=True)}
+        np.testing.assert_allclose(vectors[0], stored["id-0"].vector)
+
+        target = EmbeddedBackend("financial_docs", DIM, os.path.join(self.tmp_dir.name, "target"))
+        result = import_snapshot(self.snapshot, target, expected_model="all-MiniLM-L6-v2", batch_size=8)
+        self.assertEqual(target.count(), 30)
+        self.assertEqual(len(result["facts"]), 3)
+        self.assertEqual(target.search(self.vectors[5], limit=1)[0].id, "id-5")
+        with open(target.manifest_path) as file:
+            self.assertEqual(set(json.load(file)["files"]), {"Visa_2020.pdf", "Visa_2021.pdf", "Visa_2022.pdf"})
+
+        # Sai model hoặc collection đã có dữ liệu thì không ghi đè
+        with self.assertRaises(ValueError):
+            import_snapshot(self.snapshot, target, expected_model="all-MiniLM-L6-v2@onnx_int8")
+        with self.assertRaises(ValueError):
+            import_snapshot(self.snapshot, target)
+        import_snapshot(self.snapshot, target, replace=True)
+        self.assertEqual(target.count(), 30)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,91 @@
+import sys
+import tempfile
+from pathlib import Path
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+import json
+import os
+import unittest
+from utils.ingest_jobs import IngestJobStore, copy_ingest_jobs, ingest_jobs_path, settings_key
+
+class TestIngestJobs(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = ingest_jobs_path(os.path.join(self.tmp_dir.name, "rag_manifest.json"))
+        self.settings = settings_key({"chunker": "token_v1"})
+        self.files = {f"{company}_2023.pdf": f"h-{company}" for company in ("AAPL", "MSFT", "NKE")}
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_workers_claim_disjoint_files(self):
+        first = IngestJobStore(self.path, worker_id="node-a:1")
+        second = IngestJobStore(self.path, worker_id="node-b:1")
+        first.sync(self.files, self.settings)
+        second.sync(self.files, self.settings)
+        claimed_first = first.claim(list(self.files), 2)
+        claimed_second = second.claim(list(self.files), 2)
+        self.assertEqual(claimed_first, ["AAPL_2023.pdf", "MSFT_2023.pdf"])
+        self.assertEqual(claimed_second, ["NKE_2023.pdf"])
+        self.assertEqual(second.claim(list(self.files), 2), [])
+        self.assertEqual(first.counts()["claimed"], 3)
+
+    def test_rerun_resumes_from_checkpoint(self):
+        crashed = IngestJobStore(self.path, worker_id="node-a:1", lease_s=0)
+        crashed.sync(self.files, self.settings)
+        crashed.claim(["AAPL_2023.pdf"], 1)
+        pages = [["Net revenue 2023", "text_layer"]]
+        crashed.checkpoint("AAPL_2023.pdf", "extracted", json.dumps(pages).encode("utf-8"))
+        crashed.checkpoint("AAPL_2023.pdf", "chunked", b'{"records": [], "facts": []}')
+
+        # Process bị kill: claim hết hạn, lần chạy sau tiếp tục từ chunk đã lưu, text các trang không còn cần
+        rerun = IngestJobStore(self.path, worker_id="node-a:2")
+        rerun.sync(self.files, self.settings)
+        self.assertEqual(rerun.claim(["AAPL_2023.pdf"], 1), ["AAPL_2023.pdf"])
+        self.assertEqual(rerun.stage("AAPL_2023.pdf"), "chunked")
+        self.assertIsNone(rerun.load("AAPL_2023.pdf", "extracted"))
+        self.assertEqual(rerun.load("AAPL_2023.pdf", "chunked"), b'{"records": [], "facts": []}')
+
+        rerun.complete("AAPL_2023.pdf")
+        self.assertEqual(rerun.stage("AAPL_2023.pdf"), "indexed")
+        self.assertIsNone(rerun.load("AAPL_2023.pdf", "chunked"))
+        self.assertEqual(rerun.claim(["AAPL_2023.pdf"], 1), [])
+
+        # Nội dung file đổi: bắt đầu lại từ đầu
+        rerun.sync({"AAPL_2023.pdf": "h-AAPL-v2"}, self.settings)
+        self.assertEqual(rerun.stage("AAPL_2023.pdf"), "pending")
+
+    def test_failed_file_stops_after_max_attempts(self):
+        store = IngestJobStore(self.path, worker_id="node-a:1", max_attempts=2)
+        store.sync(self.files, self.settings)
+        for _ in range(2):
+            self.assertEqual(store.claim(["NKE_2023.pdf"], 1), ["NKE_2023.pdf"])
+            store.fail("NKE_2023.pdf", "tesseract crashed")
+        self.assertEqual(store.claim(["NKE_2023.pdf"], 1), [])
+        self.assertEqual(store.exhausted(list(self.files)), {"NKE_2023.pdf": "tesseract crashed"})
+        self.assertEqual(store.reset_attempts(), 1)
+        self.assertEqual(store.claim(["NKE_2023.pdf"], 1), ["NKE_2023.pdf"])
+
+    def test_copy_follows_manifest_to_new_collection(self):
+        build = IngestJobStore(ingest_jobs_path(os.path.join(self.tmp_dir.name, "rag_manifest.financial_docs_v2.json")), worker_id="node-a:1")
+        build.sync(self.files, self.settings)
+        build.claim(["AAPL_2023.pdf"], 1)
+        build.checkpoint("AAPL_2023.pdf", "extracted", b"pages")
+        build.complete("MSFT_2023.pdf")
+        # Alias đang có job table của collection cũ, process khác vẫn mở nó
+        live = IngestJobStore(self.path)
+        live.sync({"OLD_2021.pdf": "h-old"}, self.settings)
+
+        self.assertTrue(copy_ingest_jobs(build.path, self.path))
+        self.assertEqual(live.stage("OLD_2021.pdf"), None)
+        self.assertEqual(live.stage("MSFT_2023.pdf"), "indexed")
+        self.assertEqual(live.load("AAPL_2023.pdf", "extracted"), b"pages")
+
+        self.assertFalse(copy_ingest_jobs(os.path.join(self.tmp_dir.name, "missing.jobs.sqlite"), self.path))
+        self.assertEqual(live.counts(), {"claimed": 0})
+
+if __name__ == "__main__":
+    unittest.main()
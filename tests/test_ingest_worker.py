@@ -0,0 +1,92 @@
+import sys
+import tempfile
+from pathlib import Path
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+import json
+import os
+import unittest
+from types import SimpleNamespace
+from tools.ingest_worker import DirectoryWatcher, IngestWorker, read_ingest_status
+
+class FakeRagTool:
+    def __init__(self, manifest_path):
+        self.backend = SimpleNamespace(manifest_path=manifest_path)
+        self.calls = []
+
+    def _load_documents(self, filenames=None, ocr_workers=None, ocr_nice=0, progress=None):
+        self.calls.append(list(filenames))
+        result = {"processed": [], "failed": [], "removed": [], "unchanged": []}
+        for filename in filenames:
+            if os.path.exists(os.path.join(self.directory, filename)):
+                progress(filename, "extracted")
+                progress(filename, "indexed")
+                result["processed"].append(filename)
+            else:
+                progress(filename, "removed")
+                result["removed"].append(filename)
+        return result
+
+def write(path, data):
+    with open(path, "wb") as file:
+        file.write(data)
+
+class TestIngestWorker(unittest.TestCase):
+    def test_watcher_waits_until_file_is_stable(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            path = os.path.join(tmp_dir, "AAPL_2023.pdf")
+            write(path, b"partial")
+            watcher = DirectoryWatcher(tmp_dir, debounce_s=30)
+            self.assertEqual(watcher.poll(now=0), {})
+            # Đang copy: kích thước đổi thì đếm lại từ đầu
+            write(path, b"partial + rest of the report")
+            self.assertEqual(watcher.poll(now=20), {})
+            self.assertEqual(watcher.poll(now=40), {})
+            ready = watcher.poll(now=50)
+            self.assertEqual(list(ready), ["AAPL_2023.pdf"])
+            watcher.mark_done("AAPL_2023.pdf", ready["AAPL_2023.pdf"])
+            self.assertEqual(watcher.poll(now=100), {})
+
+            os.remove(path)
+            watcher.poll(now=110)
+            self.assertEqual(watcher.poll(now=140), {"AAPL_2023.pdf": None})
+
+    def test_worker_ingests_bounded_batches_and_reports_status(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            data_dir = os.path.join(tmp_dir, "docs")
+            os.makedirs(data_dir)
+            for name in ("AAPL_2023.pdf", "MSFT_2023.pdf", "NKE_2023.pdf", "KO_2022.pdf"):
+                write(os.path.join(data_dir, name), name.encode())
+            # KO đã nạp và không đổi; IBM có trong manifest nhưng đã bị xóa khỏi thư mục
+            manifest_path = os.path.join(tmp_dir, "rag_manifest.json")
+            with open(manifest_path, "w") as file:
+                json.dump({"files": {
+                    "KO_2022.pdf": {"hash": "ko", "ingested_at": 2**40},
+                    "IBM_2021.pdf": {"hash": "ibm", "ingested_at": 0},
+                }}, file)
+            rag_tool = FakeRagTool(manifest_path)
+            rag_tool.directory = data_dir
+            status_path = os.path.join(tmp_dir, "ingest_status.json")
+            worker = IngestWorker(rag_tool, directory=data_dir, status_path=status_path, debounce_s=5, max_files_per_run=2)
+
+            self.assertEqual(worker.run_once(now=0), [])
+            self.assertEqual(read_ingest_status(status_path)["debouncing"], 4)
+            self.assertEqual(worker.run_once(now=10), ["AAPL_2023.pdf", "IBM_2021.pdf"])
+            self.assertEqual(read_ingest_status(status_path)["queue_depth"], 2)
+            self.assertEqual(worker.run_once(now=11), ["MSFT_2023.pdf", "NKE_2023.pdf"])
+            self.assertEqual(worker.run_once(now=20), [])
+
+            status = read_ingest_status(status_path)
+            self.assertEqual(status["state"], "idle")
+            self.assertEqual(status["queue_depth"], 0)
+            self.assertEqual(status["counters"]["indexed"], 3)
+            self.assertEqual(status["counters"]["removed"], 1)
+            self.assertEqual(status["files"]["NKE_2023.pdf"]["state"], "indexed")
+            self.assertEqual(status["files"]["IBM_2021.pdf"]["state"], "removed")
+            self.assertNotIn("KO_2022.pdf", status["files"])
+
+if __name__ == "__main__":
+    unittest.main()
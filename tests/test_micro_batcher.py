@@ -0,0 +1,53 @@
+import sys
+import threading
+from pathlib import Path
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+from utils.micro_batcher import MicroBatcher
+
+class TestMicroBatcher(unittest.TestCase):
+    def test_concurrent_calls_are_batched_and_results_routed(self):
+        batches = []
+        gate = threading.Event()
+
+        def process(items):
+            # Batch đầu chờ để các request còn lại dồn vào queue
+            gate.wait(1)
+            batches.append(list(items))
+            return [item * 10 for item in items]
+
+        batcher = MicroBatcher(process, max_batch_size=64, max_wait_ms=20)
+        try:
+            with ThreadPoolExecutor(max_workers=50) as pool:
+                futures = [pool.submit(batcher.submit, i) for i in range(50)]
+                gate.set()
+                results = [future.result(5) for future in futures]
+        finally:
+            batcher.close()
+
+        self.assertEqual(results, [i * 10 for i in range(50)])
+        self.assertEqual(sum(len(batch) for batch in batches), 50)
+        self.assertLess(len(batches), 10)
+        self.assertEqual(batcher.stats()["items"], 50)
+
+    def test_error_is_raised_in_every_caller(self):
+        def process(items):
+            raise ValueError("encode failed")
+
+        batcher = MicroBatcher(process, max_wait_ms=1)
+        try:
+            with self.assertRaises(ValueError):
+                batcher.submit("query")
+            # Batcher vẫn hoạt động sau một batch lỗi
+            with self.assertRaises(ValueError):
+                batcher.submit("query")
+        finally:
+            batcher.close()
+
+if __name__ == "__main__":
+    unittest.main()
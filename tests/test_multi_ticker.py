@@ -0,0 +1,39 @@
+import os
+import sys
+from pathlib import Path
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+import unittest
+from agents.text_to_sql_agent import load_metadata, select_template, build_multi_ticker_query, inline_params
+from flow.sql_flow import group_rows_by_symbol
+
+class TestMultiTicker(unittest.TestCase):
+    def test_per_symbol_templates_have_multi_form(self):
+        templates = load_metadata()["visualized_template"]
+        for template in templates:
+            if "{ticker}" in template["sql"]:
+                self.assertIn("sql_multi", template, template["name"])
+                self.assertIn("ANY(:tickers)", template["sql_multi"])
+
+    def test_build_multi_ticker_query(self):
+        templates = load_metadata()["visualized_template"]
+        template = select_template(templates, "rolling average of AAPL, MSFT and IBM")
+        sql_query, params = build_multi_ticker_query(template, ["aapl", "msft", "ibm"], {"start_date": "2024-01-01", "end_date": "2024-06-30"})
+        self.assertIn("PARTITION BY symbol", sql_query)
+        self.assertEqual(params["tickers"], ["AAPL", "MSFT", "IBM"])
+        inlined = inline_params(sql_query, params)
+        self.assertIn("ANY(ARRAY['AAPL','MSFT','IBM'])", inlined)
+        self.assertIn("BETWEEN '2024-01-01' AND '2024-06-30'", inlined)
+
+    def test_group_rows_by_symbol(self):
+        rows = [
+            {"symbol": "AAPL", "date": "2024-01-02", "close_price": 185.6},
+            {"symbol": "AAPL", "date": "2024-01-03", "close_price": 184.2},
+            {"symbol": "MSFT", "date": "2024-01-02", "close_price": 370.9},
+        ]
+        grouped = group_rows_by_symbol(rows)
+        self.assertEqual(list(grouped), ["AAPL", "MSFT"])
+        self.assertEqual(len(grouped["AAPL"]), 2)
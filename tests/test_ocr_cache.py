@@ -0,0 +1,59 @@
+import sys
+import tempfile
+from pathlib import Path
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+import os
+import unittest
+from utils.ocr_cache import OcrCache
+
+class TestOcrCache(unittest.TestCase):
+    def test_text_cached_by_image_content_and_language(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            first = os.path.join(tmp_dir, "page-1.png")
+            retry = os.path.join(tmp_dir, "page-1-retry.png")
+            for path in (first, retry):
+                with open(path, "wb") as file:
+                    file.write(b"\x89PNG same page pixels")
+
+            cache = OcrCache("eng", os.path.join(tmp_dir, "cache"))
+            key = cache.image_key(first)
+            self.assertIsNone(cache.get(key))
+            cache.put(key, "Net revenue FY 2022: $29,310")
+
+            # Lần retry rasterize lại cùng trang ra file khác: cùng key, không cần OCR lại
+            self.assertEqual(cache.get(cache.image_key(retry)), "Net revenue FY 2022: $29,310")
+            self.assertIsNone(OcrCache("vie", cache.cache_dir).get(OcrCache("vie", cache.cache_dir).image_key(first)))
+
+    def test_key_depends_on_engine_version_and_config(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            image = os.path.join(tmp_dir, "page-1.png")
+            with open(image, "wb") as file:
+                file.write(b"\x89PNG page pixels")
+            keys = {
+                OcrCache("eng", tmp_dir, engine_version="4.1.1").image_key(image),
+                OcrCache("eng", tmp_dir, engine_version="5.3.0").image_key(image),
+                OcrCache("eng", tmp_dir, engine_version="5.3.0", config="--psm 6").image_key(image),
+            }
+            self.assertEqual(len(keys), 3)
+
+    def test_prune_removes_least_recently_used_pages(self):
+        with tempfile.TemporaryDirectory() as tmp_dir:
+            cache = OcrCache("eng", tmp_dir, max_bytes=250)
+            for i, key in enumerate(["aa01", "bb02", "cc03"]):
+                cache.put(key, "x" * 100)
+                os.utime(cache._path(key), ns=(i * 10**9, i * 10**9))
+            # Đọc trúng cache làm trang cũ nhất thành trang mới dùng nhất
+            self.assertIsNotNone(cache.get("aa01"))
+
+            self.assertEqual(cache.prune(), 1)
+            self.assertIsNone(cache.get("bb02"))
+            self.assertIsNotNone(cache.get("aa01"))
+            self.assertIsNotNone(cache.get("cc03"))
+            self.assertEqual(OcrCache("eng", tmp_dir, max_bytes=0).prune(), 0)
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,73 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+import unittest
+import pandas as pd
+from utils.price_store import PriceStore, build_price_store
+
+class TestPriceStore(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        dates = pd.date_range("2024-01-01", periods=40, freq="D")
+        frames = []
+        for symbol, base in [("MSFT", 300.0), ("AAPL", 100.0)]:
+            frames.append(pd.DataFrame({
+                "symbol": symbol,
+                "date": dates,
+                "open_price": base,
+                "high_price": base + 1,
+                "low_price": base - 1,
+                "close_price": [base + i for i in range(len(dates))],
+                "volume": 1000,
+            }))
+        build_price_store(pd.concat(frames), self.tmp_dir.name)
+        self.store = PriceStore(self.tmp_dir.name)
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_series_slice_is_zero_copy(self):
+        series = self.store.series("aapl", "2024-01-05", "2024-01-10")
+        self.assertEqual(len(series["close_price"]), 6)
+        self.assertEqual(series["close_price"][0], 104.0)
+        self.assertFalse(series["close_price"].flags.owndata)
+
+    def test_rolling_average_matches_window(self):
+        rows = self.store.answer_template("daily_closing_price_with_rolling_avg", ["AAPL"], "2024-01-01", "2024-02-09")
+        self.assertEqual(len(rows), 40)
+        self.assertAlmostEqual(rows[0]["rolling_avg"], 100.0)
+        self.assertAlmostEqual(rows[39]["rolling_avg"], sum(100.0 + i for i in range(10, 40)) / 30)
+
+    def test_multi_ticker_returns_sorted_by_symbol(self):
+        rows = self.store.answer_template("daily_returns_boxplot", ["MSFT", "AAPL"], "2024-01-01", "2024-01-03")
+        self.assertEqual([r["symbol"] for r in rows], ["AAPL"] * 3 + ["MSFT"] * 3)
+        self.assertIsNone(rows[0]["daily_return"])
+        self.assertAlmostEqual(rows[1]["daily_return"], 0.01)
+
+    def test_unknown_symbol_falls_back(self):
+        self.assertIsNone(self.store.answer_template("time_series_volume", ["IBM"], "2024-01-01", "2024-01-31"))
+
+    def test_single_value_only_for_one_day(self):
+        rows = self.store.answer_template("single_value", ["AAPL"], "2024-01-05", "2024-01-05")
+        self.assertEqual(rows, [{"date": "2024-01-05", "close_price": 104.0}])
+        self.assertIsNone(self.store.answer_template("single_value", ["AAPL"], "2024-01-01", "2024-12-31"))
+
+    def test_unbuilt_store_falls_back(self):
+        with tempfile.TemporaryDirectory() as empty_dir:
+            store = PriceStore(empty_dir)
+            self.assertFalse(store.refresh())
+            self.assertIsNone(store.answer_template("time_series_volume", ["AAPL"], "2024-01-01", "2024-01-31"))
+
+    def test_refresh_picks_up_new_version(self):
+        build_price_store(pd.DataFrame({
+            "symbol": ["IBM"], "date": ["2024-01-02"], "open_price": [1.0], "high_price": [1.0],
+            "low_price": [1.0], "close_price": [1.0], "volume": [1],
+        }), self.tmp_dir.name)
+        self.assertTrue(self.store.refresh())
+        self.assertIsNotNone(self.store.series("IBM", "2024-01-01", "2024-01-31"))
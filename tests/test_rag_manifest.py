@@ -0,0 +1,61 @@
+import os
+import sys
+import tempfile
+from pathlib import Path
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+import unittest
+from utils.rag_manifest import RagManifest, file_sha256, point_id
+
+class TestRagManifest(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+        self.path = os.path.join(self.tmp_dir.name, "manifest.json")
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_point_id_is_stable(self):
+        self.assertEqual(point_id("abc", 3), point_id("abc", 3))
+        self.assertNotEqual(point_id("abc", 3), point_id("abc", 4))
+        self.assertNotEqual(point_id("abc", 3), point_id("abd", 3))
+
+    def test_file_hash_changes_with_content(self):
+        filepath = os.path.join(self.tmp_dir.name, "AAPL_2024.pdf")
+        with open(filepath, "wb") as file:
+            file.write(b"v1")
+        first = file_sha256(filepath)
+        with open(filepath, "wb") as file:
+            file.write(b"v2")
+        self.assertNotEqual(first, file_sha256(filepath))
+
+    def test_diff_and_persistence(self):
+        manifest = RagManifest(self.path)
+        manifest.record("AAPL_2024.pdf", "h1", [point_id("h1", 0)])
+        manifest.record("MSFT_2024.pdf", "h2", [point_id("h2", 0), point_id("h2", 1)])
+        manifest.save()
+
+        reloaded = RagManifest(self.path)
+        changed, removed, unchanged = reloaded.diff({"AAPL_2024.pdf": "h1", "MSFT_2024.pdf": "h3", "IBM_2024.pdf": "h4"})
+        self.assertEqual(sorted(changed), ["IBM_2024.pdf", "MSFT_2024.pdf"])
+        self.assertEqual(removed, [])
+        self.assertEqual(unchanged, ["AAPL_2024.pdf"])
+        self.assertEqual(len(reloaded.point_ids("MSFT_2024.pdf")), 2)
+
+        changed, removed, unchanged = reloaded.diff({"MSFT_2024.pdf": "h2"})
+        self.assertEqual((changed, removed, unchanged), ([], ["AAPL_2024.pdf"], ["MSFT_2024.pdf"]))
+
+    def test_shared_save_keeps_files_recorded_by_other_workers(self):
+        first = RagManifest(self.path, shared=True)
+        second = RagManifest(self.path, shared=True)
+        first.record("AAPL_2024.pdf", "h1", [point_id("h1", 0)])
+        first.save()
+        second.record("MSFT_2024.pdf", "h2", [point_id("h2", 0)])
+        second.save()
+        self.assertEqual(sorted(RagManifest(self.path).files), ["AAPL_2024.pdf", "MSFT_2024.pdf"])
+
+if __name__ == "__main__":
+    unittest.main()
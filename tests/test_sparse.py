@@ -0,0 +1,28 @@
+import sys
+from pathlib import Path
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+import unittest
+from utils import sparse
+
+class TestSparseEncoder(unittest.TestCase):
+    def test_phrases_and_numbers_are_terms(self):
+        terms = sparse.tokenize("Diluted earnings per share for FY 2023 were $6.13")
+        self.assertIn("diluted earnings", terms)
+        self.assertIn("fy 2023", terms)
+        self.assertIn("6.13", terms)
+        self.assertNotIn("for", terms)
+
+    def test_query_terms_overlap_document(self):
+        doc_indices, doc_values = sparse.encode_document("Payments volume grew 8% while payments volume in Europe fell.")
+        query_indices, _ = sparse.encode_query("payments volume")
+        self.assertEqual(doc_indices, sorted(doc_indices))
+        self.assertTrue(set(query_indices) <= set(doc_indices))
+        weights = dict(zip(doc_indices, doc_values))
+        self.assertGreater(weights[sparse.term_index("payments volume")], weights[sparse.term_index("europe")])
+
+if __name__ == "__main__":
+    unittest.main()
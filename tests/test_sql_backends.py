@@ -0,0 +1,114 @@
+import json
+import os
+import sys
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+import unittest
+from tools import sql_backends
+from tools.sql_backends import CancelWatchdog, DuckDBBackend, PostgresBackend, effective_timeout_ms
+
+class FakeResult:
+    def __init__(self, value):
+        self.value = value
+
+    def scalar(self):
+        return self.value
+
+class FakeConnection:
+    """Trả về payload EXPLAIN (FORMAT JSON) cố định và ghi lại câu lệnh đã chạy."""
+    def __init__(self, plan):
+        self.plan = plan
+        self.statements = []
+
+    def execute(self, statement, params=None):
+        self.statements.append(str(statement))
+        return FakeResult(json.dumps([{"Plan": self.plan}]))
+
+class TestCancelWatchdog(unittest.TestCase):
+    def test_deadline_fires_cancel(self):
+        cancelled = threading.Event()
+        with CancelWatchdog(cancelled.set, deadline=time.monotonic() + 0.05):
+            self.assertTrue(cancelled.wait(2))
+
+    def test_cancel_event_fires_cancel(self):
+        cancelled = threading.Event()
+        cancel_event = threading.Event()
+        with CancelWatchdog(cancelled.set, cancel_event=cancel_event):
+            time.sleep(0.15)
+            self.assertFalse(cancelled.is_set())
+            cancel_event.set()
+            self.assertTrue(cancelled.wait(2))
+
+    def test_finished_query_is_not_cancelled(self):
+        cancelled = threading.Event()
+        with CancelWatchdog(cancelled.set, deadline=time.monotonic() + 0.3):
+            pass
+        time.sleep(0.4)
+        self.assertFalse(cancelled.is_set())
+
+class TestEffectiveTimeout(unittest.TestCase):
+    def test_without_deadline_uses_statement_timeout(self):
+        self.assertEqual(effective_timeout_ms(), sql_backends.SQL_STATEMENT_TIMEOUT_MS)
+
+    def test_clamped_to_remaining_deadline(self):
+        timeout_ms = effective_timeout_ms(time.monotonic() + 0.5)
+        self.assertLessEqual(timeout_ms, 500)
+        self.assertGreater(timeout_ms, 400)
+
+    def test_expired_deadline_raises(self):
+        with self.assertRaises(TimeoutError):
+            effective_timeout_ms(time.monotonic() - 1)
+
+class TestPlanGuard(unittest.TestCase):
+    def setUp(self):
+        # Không cần engine: _check_plan chỉ dùng connection được truyền vào
+        self.backend = PostgresBackend.__new__(PostgresBackend)
+
+    def check(self, total_cost, plan_rows):
+        conn = FakeConnection({"Node Type": "Seq Scan", "Total Cost": total_cost, "Plan Rows": plan_rows})
+        self.backend._check_plan(conn, "SELECT * FROM stock_prices;", {})
+        return conn
+
+    def test_accepts_plan_within_limits(self):
+        conn = self.check(sql_backends.SQL_MAX_PLAN_COST, sql_backends.SQL_MAX_PLAN_ROWS)
+        self.assertEqual(conn.statements, ["EXPLAIN (FORMAT JSON) SELECT * FROM stock_prices"])
+
+    def test_rejects_plan_over_cost_limit(self):
+        with self.assertRaisesRegex(ValueError, "estimated cost"):
+            self.check(sql_backends.SQL_MAX_PLAN_COST + 1, 10)
+
+    def test_rejects_plan_over_row_limit(self):
+        with self.assertRaisesRegex(ValueError, "estimated rows"):
+            self.check(10.0, sql_backends.SQL_MAX_PLAN_ROWS + 1)
+
+class TestDuckDBOptionalViews(unittest.TestCase):
+    def test_facts_view_registered_once_file_appears(self):
+        with tempfile.TemporaryDirectory() as parquet_dir:
+            # Không cần duckdb: chỉ kiểm tra câu lệnh tạo view được gửi tới connection
+            backend = DuckDBBackend.__new__(DuckDBBackend)
+            backend.parquet_dir = parquet_dir
+            backend.conn = FakeConnection({})
+            backend.pending_tables = ["financial_facts"]
+            backend._views_lock = threading.Lock()
+
+            backend._register_pending_views()
+            self.assertEqual(backend.conn.statements, [])
+
+            # Ingest/worker nền ghi facts sau khi backend đã khởi động
+            with open(os.path.join(parquet_dir, "financial_facts.parquet"), "wb") as file:
+                file.write(b"PAR1")
+            backend._register_pending_views()
+            backend._register_pending_views()
+            self.assertEqual(len(backend.conn.statements), 1)
+            self.assertIn("CREATE OR REPLACE VIEW financial_facts", backend.conn.statements[0])
+            self.assertEqual(backend.pending_tables, [])
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,56 @@
+import sys
+from pathlib import Path
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+import unittest
+import yaml
+from utils.template_match import match_template
+
+class TestTemplateMatch(unittest.TestCase):
+    @classmethod
+    def setUpClass(cls):
+        with open(BASE_DIR / "config" / "visualized_template.yml", "r") as file:
+            cls.templates = yaml.safe_load(file)["visualized_template"]
+
+    def matched(self, query, tickers=None, date_range=None):
+        template = match_template(self.templates, query, tickers, date_range)
+        return template["name"] if template else None
+
+    def test_plain_series_queries_match(self):
+        self.assertEqual(self.matched("Show AAPL stock price in 2024"), "daily_closing_price_time_series")
+        self.assertEqual(self.matched("AAPL trading volume 2024"), "time_series_volume")
+        self.assertEqual(self.matched("AAPL daily returns histogram"), "daily_returns_histogram")
+
+    def test_aggregate_queries_defer_to_agent(self):
+        self.assertIsNone(self.matched("What was Apple's highest stock price in 2024?"))
+        self.assertIsNone(self.matched("What was the average trading volume of AAPL in 2024?"))
+        self.assertIsNone(self.matched("Which month had the best AAPL daily returns?"))
+
+    def test_multi_ticker_comparison_uses_sql_multi(self):
+        tickers = ["AAPL", "MSFT", "IBM"]
+        template = match_template(self.templates, "compare Apple, Microsoft and IBM closing prices", tickers)
+        self.assertIsNotNone(template)
+        self.assertIn("ANY(:tickers)", template["sql_multi"])
+        self.assertIsNone(self.matched("compare AAPL and MSFT max closing price", tickers))
+        # Một ticker: không có gì để so sánh bằng template, để sql_agent hiểu câu hỏi
+        self.assertIsNone(self.matched("compare AAPL closing price", ["AAPL"]))
+        self.assertEqual(template["name"], "daily_closing_price_time_series")
+
+    def test_single_value_only_for_one_day(self):
+        tickers = ["AAPL", "MSFT", "IBM"]
+        one_day = {"start_date": "2024-03-01", "end_date": "2024-03-01"}
+        year = {"start_date": "2024-01-01", "end_date": "2024-12-31"}
+        self.assertEqual(self.matched("AAPL and MSFT closing price on 2024-03-01", tickers, one_day), "single_value")
+        # Cả năm: date = '2024-01-01' (ngày nghỉ) trả về rỗng, phải dùng chuỗi giá trị của khoảng ngày
+        self.assertEqual(self.matched("Apple, Microsoft and IBM closing prices in 2024", tickers, year), "daily_closing_price_time_series")
+        self.assertEqual(self.matched("AAPL closing price", ["AAPL"]), "daily_closing_price_time_series")
+
+    def test_rolling_average_needs_matching_window(self):
+        self.assertEqual(self.matched("AAPL stock price with 30-day moving average"), "daily_closing_price_with_rolling_avg")
+        self.assertIsNone(self.matched("AAPL stock price with 7-day moving average"))
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,172 @@
+import sys
+import tempfile
+from pathlib import Path
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+import multiprocessing
+import os
+import unittest
+import numpy as np
+from utils.vector_index import EmbeddedVectorIndex, normalize_rows
+
+DIM = 16
+
+def make_points(n, seed=0):
+    rng = np.random.default_rng(seed)
+    vectors = rng.normal(size=(n, DIM)).astype(np.float32)
+    payloads = [{"text": f"chunk {i}", "company": ["Apple Inc.", "Microsoft Corporation"][i % 2], "year": 2020 + i % 4} for i in range(n)]
+    return [f"id-{i}" for i in range(n)], vectors, payloads
+
+def write_batches(index_dir, worker):
+    index = EmbeddedVectorIndex(index_dir, DIM)
+    ids, vectors, payloads = make_points(200, seed=worker)
+    for start in range(0, 200, 10):
+        index.upsert([f"w{worker}-{point_id}" for point_id in ids[start:start + 10]], vectors[start:start + 10], payloads[start:start + 10])
+
+class TestEmbeddedVectorIndex(unittest.TestCase):
+    def setUp(self):
+        self.tmp_dir = tempfile.TemporaryDirectory()
+
+    def tearDown(self):
+        self.tmp_dir.cleanup()
+
+    def test_exact_search_with_filters(self):
+        index = EmbeddedVectorIndex(self.tmp_dir.name, DIM)
+        ids, vectors, payloads = make_points(200)
+        index.upsert(ids, vectors, payloads)
+
+        hits = index.search(vectors[7], limit=3)
+        self.assertEqual(hits[0].id, "id-7")
+        self.assertAlmostEqual(hits[0].score, 1.0, places=5)
+
+        hits = index.search(vectors[7], companies=["Microsoft Corporation"], year_range=(2022, None), limit=10)
+        self.assertEqual(len(hits), 10)
+        for hit in hits:
+            self.assertEqual(hit.payload["company"], "Microsoft Corporation")
+            self.assertGreaterEqual(hit.payload["year"], 2022)
+        expected = np.flatnonzero([p["company"] == "Microsoft Corporation" and p["year"] >= 2022 for p in payloads])
+        scores = normalize_rows(vectors[expected]) @ normalize_rows(vectors[7])
+        self.assertEqual(hits[0].id, f"id-{expected[np.argmax(scores)]}")
+
+    def test_summary_levels_and_filename_filter(self):
+        index = EmbeddedVectorIndex(self.tmp_dir.name, DIM)
+        ids, vectors, payloads = make_points(40)
+        for i, payload in enumerate(payloads):
+            payload["filename"] = f"report_{i % 4}.pdf"
+        index.upsert(ids, vectors, payloads)
+        index.upsert(["doc-0"], vectors[:1], [{"level": "document", "filename": "report_0.pdf", "company": "Apple Inc.", "year": 2020}])
+
+        # Mặc định chỉ search chunk; point tóm tắt chỉ thấy khi yêu cầu level của nó
+        self.assertNotIn("doc-0", [hit.id for hit in index.search(vectors[0], limit=40)])
+        self.assertEqual([hit.id for hit in index.search(vectors[0], levels=("document", "section"), limit=5)], ["doc-0"])
+
+        hits = index.search(vectors[0], filenames=["report_1.pdf", "report_2.pdf"], limit=40)
+        self.assertEqual(len(hits), 20)
+        self.assertEqual({hit.payload["filename"] for hit in hits}, {"report_1.pdf", "report_2.pdf"})
+
+    def test_delete_and_overwrite_survive_reload(self):
+        index = EmbeddedVectorIndex(self.tmp_dir.name, DIM)
+        ids, vectors, payloads = make_points(20)
+        index.upsert(ids, vectors, payloads)
+        index.delete(["id-3"])
+        index.upsert(["id-5"], vectors[9:10], [{"text": "updated", "company": "Apple Inc.", "year": 2024}])
+
+        # Process khác (reader mới) thấy cùng trạng thái khi replay log
+        reader = EmbeddedVectorIndex(self.tmp_dir.name, DIM)
+        self.assertEqual(reader.count(), 19)
+        self.assertNotIn("id-3", [hit.id for hit in reader.search(vectors[3], limit=19)])
+        hits = reader.search(vectors[9], year_range=(2024, 2024), limit=1)
+        self.assertEqual((hits[0].id, hits[0].payload["text"]), ("id-5", "updated"))
+
+        index.build_index()
+        self.assertEqual(reader.count(), 19)
+        self.assertEqual(reader.search(vectors[9], year_range=(2024, 2024), limit=1)[0].id, "id-5")
+
+    def test_ivf_recall_and_tail_rows(self):
+        index = EmbeddedVectorIndex(self.tmp_dir.name, DIM, exact_max_rows=100, nprobe=16)
+        ids, vectors, payloads = make_points(2000)
+        index.upsert(ids, vectors, payloads)
+        stats = index.build_index()
+        self.assertGreater(stats["lists"], 0)
+
+        queries = vectors[:50] + np.random.default_rng(1).normal(0, 0.1, (50, DIM)).astype(np.float32)
+        recall = []
+        for query in queries:
+            approx = {hit.id for hit in index.search(query, limit=10)}
+            exact = {hit.id for hit in index.search(query, limit=10, exact=True)}
+            recall.append(len(approx & exact) / 10)
+        self.assertGreater(np.mean(recall), 0.8)
+
+        # Row ghi thêm sau build_index chưa thuộc list IVF nào vẫn tìm thấy được
+        index.upsert(["new"], vectors[:1] * -1, [{"text": "new", "company": "Apple Inc.", "year": 2021}])
+        self.assertEqual(index.search(vectors[0] * -1, limit=1)[0].id, "new")
+
+    def test_hybrid_search_fuses_sparse_matches(self):
+        index = EmbeddedVectorIndex(self.tmp_dir.name, DIM)
+        ids, vectors, payloads = make_points(50)
+        sparse_vectors = [[[1000 + i], [1.0]] for i in range(50)]
+        index.upsert(ids, vectors, payloads, sparse_vectors)
+
+        # Dense query gần id-0, sparse term chỉ có ở id-42: cả hai đều nằm trong top 2
+        hits = index.search(vectors[0], limit=2, sparse_query=([1042], [1.0]))
+        self.assertEqual({hit.id for hit in hits}, {"id-0", "id-42"})
+
+    def test_search_batch_matches_single_searches(self):
+        index = EmbeddedVectorIndex(self.tmp_dir.name, DIM)
+        ids, vectors, payloads = make_points(300)
+        index.upsert(ids, vectors, payloads)
+
+        requests = [
+            {"query_vector": vectors[0], "limit": 5},
+            {"query_vector": vectors[1], "companies": ["Apple Inc."], "limit": 3},
+            {"query_vector": vectors[2], "year_range": (2021, 2021), "limit": 4},
+        ]
+        batched = index.search_batch(requests)
+        for request, hits in zip(requests, batched):
+            single = index.search(request["query_vector"], companies=request.get("companies"), year_range=request.get("year_range"), limit=request["limit"])
+            self.assertEqual([hit.id for hit in hits], [hit.id for hit in single])
+
+    def test_upsert_after_interrupted_write(self):
+        index = EmbeddedVectorIndex(self.tmp_dir.name, DIM)
+        ids, vectors, payloads = make_points(30)
+        index.upsert(ids[:10], vectors[:10], payloads[:10])
+        # Writer crash sau khi ghi vector nhưng trước khi ghi log, rồi một dòng log dở dang
+        generation_dir = os.path.join(self.tmp_dir.name, index.generation)
+        with open(os.path.join(generation_dir, "vectors.f32"), "ab") as file:
+            file.write(np.ones((3, DIM), dtype=np.float32).tobytes() + b"\x01\x02")
+        with open(os.path.join(generation_dir, "ops.jsonl"), "a") as file:
+            file.write('{"op": "upsert", "id": "lost"')
+
+        resumed = EmbeddedVectorIndex(self.tmp_dir.name, DIM)
+        resumed.upsert(ids[10:], vectors[10:], payloads[10:])
+        resumed.delete(["id-0"])
+
+        reader = EmbeddedVectorIndex(self.tmp_dir.name, DIM)
+        self.assertEqual(reader.count(), 29)
+        for i in (10, 17, 29):
+            hits = reader.search(vectors[i], limit=1)
+            self.assertEqual(hits[0].id, f"id-{i}")
+            self.assertAlmostEqual(hits[0].score, 1.0, places=5)
+
+    @unittest.skipUnless(hasattr(os, "fork"), "cần fork để chạy nhiều writer process")
+    def test_concurrent_writer_processes(self):
+        context = multiprocessing.get_context("fork")
+        processes = [context.Process(target=write_batches, args=(self.tmp_dir.name, worker)) for worker in range(3)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+            self.assertEqual(process.exitcode, 0)
+
+        index = EmbeddedVectorIndex(self.tmp_dir.name, DIM)
+        self.assertEqual(index.count(), 600)
+        for worker in range(3):
+            ids, vectors, _ = make_points(200, seed=worker)
+            for i in (0, 57, 199):
+                self.assertEqual(index.search(vectors[i], limit=1)[0].id, f"w{worker}-{ids[i]}")
+
+if __name__ == "__main__":
+    unittest.main()
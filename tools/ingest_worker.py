@@ -0,0 +1,216 @@
+# tools/ingest_worker.py
+import json
+import os
+import subprocess
+import sys
+import threading
+import time
+from collections import deque
+from pathlib import Path
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+from config.env import (
+    RAG_DATA_DIR, INGEST_POLL_INTERVAL_S, INGEST_DEBOUNCE_S, INGEST_MAX_FILES_PER_RUN,
+    INGEST_WORKER_OCR_WORKERS, INGEST_WORKER_NICE, INGEST_STATUS_PATH
+)
+from utils.logging import setup_logging
+
+logger = setup_logging()
+
+# Số file gần nhất giữ trạng thái trong status
+MAX_TRACKED_FILES = 500
+
+
+class DirectoryWatcher:
+    """Poll thư mục và báo file mới/đổi/bị xóa khi (size, mtime) không đổi trong debounce_s giây.
+
+    Poll thay cho inotify để chạy giống nhau trên mọi hệ điều hành và trên volume mạng; debounce tránh
+    nạp file đang được copy dở.
+    """
+
+    def __init__(self, directory: str, debounce_s: float = INGEST_DEBOUNCE_S, suffix: str = ".pdf", known: dict = None):
+        self.directory = directory
+        self.debounce_s = debounce_s
+        self.suffix = suffix
+        # filename -> signature đã xử lý; file trong known nhưng không còn trên đĩa được báo là đã xóa
+        self.known = dict(known or {})
+        # filename -> (signature mới nhất, thời điểm signature đó xuất hiện)
+        self.pending = {}
+
+    def scan(self) -> dict:
+        """{filename: (size, mtime_ns)} của các file hiện có."""
+        signatures = {}
+        for entry in os.scandir(self.directory):
+            if entry.is_file() and entry.name.endswith(self.suffix):
+                stat = entry.stat()
+                signatures[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        return signatures
+
+    def poll(self, now: float = None) -> dict:
+        """Lấy ra các file đã ổn định: {filename: signature} (signature None nghĩa là file đã bị xóa)."""
+        now = time.monotonic() if now is None else now
+        current = self.scan()
+        for filename in set(current) | set(self.known) | set(self.pending):
+            signature = current.get(filename)
+            if filename in self.known and self.known[filename] == signature:
+                self.pending.pop(filename, None)
+            elif filename not in self.known and signature is None:
+                self.pending.pop(filename, None)
+            elif self.pending.get(filename, (False,))[0] != signature:
+                self.pending[filename] = (signature, now)
+        ready = {filename: signature for filename, (signature, since) in self.pending.items() if now - since >= self.debounce_s}
+        for filename in ready:
+            del self.pending[filename]
+        return ready
+
+    def mark_done(self, filename: str, signature) -> None:
+        """File đã xử lý (kể cả lỗi: chỉ thử lại khi file thay đổi)."""
+        if signature is None:
+            self.known.pop(filename, None)
+        else:
+            self.known[filename] = signature
+
+
+class IngestWorker:
+    """Nạp nền các file mới/đổi trong RAG_DATA_DIR qua pipeline của CustomRAGTool._load_documents.
+
+    Mỗi lượt nạp tối đa max_files_per_run file từ queue với ít process OCR; trạng thái (độ sâu queue,
+    tiến độ từng file) được ghi ra status_path để process phục vụ đọc ở /metrics.
+    """
+
+    def __init__(self, rag_tool, directory: str = RAG_DATA_DIR, status_path: str = INGEST_STATUS_PATH,
+                 poll_interval_s: float = INGEST_POLL_INTERVAL_S, debounce_s: float = INGEST_DEBOUNCE_S,
+                 max_files_per_run: int = INGEST_MAX_FILES_PER_RUN, ocr_workers: int = INGEST_WORKER_OCR_WORKERS,
+                 ocr_nice: int = INGEST_WORKER_NICE):
+        self.rag_tool = rag_tool
+        self.status_path = status_path
+        self.poll_interval_s = poll_interval_s
+        self.max_files_per_run = max_files_per_run
+        self.ocr_workers = ocr_workers
+        self.ocr_nice = ocr_nice
+        self.watcher = DirectoryWatcher(directory, debounce_s, known=self._known_from_manifest(directory))
+        self.queue = deque()
+        self.queued = {}
+        self.files = {}
+        self.counters = {"runs": 0, "indexed": 0, "failed": 0, "removed": 0, "unchanged": 0}
+        self.state = "idle"
+
+    def _known_from_manifest(self, directory: str) -> dict:
+        """File trong manifest không sửa sau lần nạp được coi là đã xử lý: khởi động không phải hash lại cả thư mục."""
+        try:
+            with open(self.rag_tool.backend.manifest_path) as file:
+                entries = json.load(file).get("files", {})
+        except (OSError, ValueError):
+            return {}
+        known = {}
+        for filename, entry in entries.items():
+            try:
+                stat = os.stat(os.path.join(directory, filename))
+            except FileNotFoundError:
+                # Giá trị khác mọi signature thật: watcher báo file này đã bị xóa
+                known[filename] = ("manifest",)
+                continue
+            if entry.get("hash") and stat.st_mtime <= entry.get("ingested_at", 0):
+                known[filename] = (stat.st_size, stat.st_mtime_ns)
+        return known
+
+    def _set_file(self, filename: str, state: str, **extra) -> None:
+        self.files[filename] = {"state": state, "updated_at": int(time.time()), **extra}
+        if len(self.files) > MAX_TRACKED_FILES:
+            for name in sorted(self.files, key=lambda name: self.files[name]["updated_at"])[:len(self.files) - MAX_TRACKED_FILES]:
+                del self.files[name]
+
+    def status(self) -> dict:
+        return {
+            "state": self.state,
+            "pid": os.getpid(),
+            "heartbeat": int(time.time()),
+            "queue_depth": len(self.queue),
+            "debouncing": len(self.watcher.pending),
+            "counters": dict(self.counters),
+            "files": dict(self.files),
+        }
+
+    def write_status(self) -> None:
+        os.makedirs(os.path.dirname(self.status_path) or ".", exist_ok=True)
+        tmp_path = f"{self.status_path}.tmp"
+        with open(tmp_path, "w") as file:
+            json.dump(self.status(), file)
+        os.replace(tmp_path, self.status_path)
+
+    def _progress(self, filename: str, state: str) -> None:
+        self._set_file(filename, state)
+        self.write_status()
+
+    def run_once(self, now: float = None) -> list:
+        """Một lượt: poll thư mục, đưa file đã ổn định vào queue và nạp tối đa max_files_per_run file.
+
+        Returns:
+            list: Các file đã xử lý trong lượt này.
+        """
+        for filename, signature in sorted(self.watcher.poll(now).items()):
+            if filename not in self.queued:
+                self.queue.append(filename)
+                self._set_file(filename, "queued")
+            self.queued[filename] = signature
+        batch = [self.queue.popleft() for _ in range(min(self.max_files_per_run, len(self.queue)))]
+        if not batch:
+            self.write_status()
+            return []
+
+        self.state = "ingesting"
+        for filename in batch:
+            self._set_file(filename, "processing")
+        self.write_status()
+        start = time.perf_counter()
+        try:
+            result = self.rag_tool._load_documents(filenames=batch, ocr_workers=self.ocr_workers, ocr_nice=self.ocr_nice, progress=self._progress)
+            for key in ("failed", "removed", "unchanged"):
+                self.counters[key] += len(result[key])
+            for filename in result["unchanged"]:
+                self._set_file(filename, "unchanged")
+            self.counters["indexed"] += len([name for name in result["processed"] if self.files.get(name, {}).get("state") == "indexed"])
+        except Exception as e:
+            logger.error(f"Background ingest of {batch} failed: {str(e)}")
+            self.counters["failed"] += len(batch)
+            for filename in batch:
+                self._set_file(filename, "failed", error=str(e))
+        finally:
+            for filename in batch:
+                self.watcher.mark_done(filename, self.queued.pop(filename))
+            self.counters["runs"] += 1
+            self.state = "idle"
+            self.write_status()
+        logger.info(f"Background ingest of {len(batch)} files took {time.perf_counter() - start:.1f}s, {len(self.queue)} files still queued")
+        return batch
+
+    def run(self, stop_event: threading.Event) -> None:
+        logger.info(f"Background ingest worker watching {self.watcher.directory} (poll {self.poll_interval_s}s, debounce {self.watcher.debounce_s}s)")
+        while not stop_event.is_set():
+            try:
+                processed = self.run_once()
+            except Exception as e:
+                logger.error(f"Background ingest worker error: {str(e)}")
+                processed = []
+            # Còn file trong queue thì nạp tiếp ngay, không chờ lượt poll kế tiếp
+            if not processed or not self.queue:
+                stop_event.wait(self.poll_interval_s)
+
+
+def read_ingest_status(status_path: str = INGEST_STATUS_PATH) -> dict:
+    """Trạng thái do worker ghi gần nhất, hoặc None nếu worker chưa chạy."""
+    try:
+        with open(status_path) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return None
+
+
+def start_ingest_process() -> subprocess.Popen:
+    """Chạy scripts/ingest_worker.py trong process riêng (GIL, thread embedding và niceness tách khỏi process phục vụ)."""
+    process = subprocess.Popen([sys.executable, str(BASE_DIR / "scripts" / "ingest_worker.py")], cwd=str(BASE_DIR))
+    logger.info(f"Started background ingest worker (pid {process.pid})")
+    return process
@@ -1,251 +1,664 @@
 # tools/rag_tool.py
+import json
 import os
+import queue
 import sys
+import threading
 from pathlib import Path
 from phi.tools import Toolkit
-from qdrant_client import QdrantClient
-from qdrant_client.http import models
-from sentence_transformers import SentenceTransformer
 import re
-from pdf2image import convert_from_path
-import pytesseract
-from config.env import QDRANT_HOST, QDRANT_PORT, RAG_DATA_DIR
+import numpy as np
+from config.env import (
+    RAG_DATA_DIR, OCR_WORKERS, EMBED_BATCH_SIZE, PIPELINE_QUEUE_BATCHES,
+    CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS, EMBEDDING_CACHE_ENABLED, QDRANT_COLLECTION_PROFILE, MICRO_BATCH_ENABLED,
+    FACTS_STORE_ENABLED, EMBEDDING_THREADS, OCR_DPI, OCR_GRAYSCALE, PDF_PAGE_BUDGET, RAG_MMR_ENABLED, RAG_MMR_CANDIDATES, RAG_MMR_LAMBDA, RAG_DUPLICATE_THRESHOLD,
+    RAG_TWO_STAGE_ENABLED, RAG_CANDIDATE_DOCUMENTS, RAG_SECTION_CHUNKS, RAG_MAX_CHUNKS_PER_DOCUMENT,
+    INGEST_JOBS_ENABLED, INGEST_JOB_CLAIM_FILES, INGEST_JOB_MAX_ATTEMPTS
+)
 from utils.logging import setup_logging
 from utils.validators import validate_rag_dir
-from utils.company_mapping import build_company_mapping, map_company_name, normalize_company_name
+from utils.company_mapping import build_company_mapping, canonical_company_name, load_companies, resolve_company_symbol
+from utils.pdf_extract import iter_documents, join_pages, page_extraction
+from utils.chunker import chunk_text, make_token_counter
+from utils.pipeline import PipelineStage, get_until_stopped, put_until_stopped
+from utils.embedding_cache import EmbeddingCache
+from utils.embedder import load_embedder
+from utils.micro_batcher import MicroBatcher
+from utils.financial_facts import (
+    detect_metric, extract_facts, fact_rows, facts_cover, format_facts, is_value_lookup, lookup_facts, save_file_facts
+)
+from utils.diversify import cap_per_group, diversify, minhash_signature
+from utils.doc_summary import DocumentSummaries
+from utils import sparse
+from utils.rag_manifest import RagManifest, file_sha256, point_id
+from utils.ingest_jobs import IngestJobStore, ingest_jobs_path, settings_key
+from tools.vector_backends import create_vector_backend
 
 BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.append(str(BASE_DIR))
 
 logger = setup_logging()
 
+# Đổi bất kỳ giá trị nào ở đây thì lần populate sau sẽ nạp lại toàn bộ tài liệu
+INGEST_SETTINGS = {
+    "model": "all-MiniLM-L6-v2",
+    "payload": "canonical_company_v1",
+    "chunker": "token_v1",
+    "facts": "financial_facts_v1",
+    "dedup": "minhash_v1",
+    "ocr_dpi": OCR_DPI,
+    "ocr_grayscale": OCR_GRAYSCALE,
+    "page_budget": PDF_PAGE_BUDGET,
+    "summaries": "mean_v1",
+    "section_chunks": RAG_SECTION_CHUNKS,
+    "chunk_max_tokens": CHUNK_MAX_TOKENS,
+    "chunk_overlap_tokens": CHUNK_OVERLAP_TOKENS,
+}
+
+SPARSE_ENCODER = "bm25_hash_v1"
+RAG_TOP_K = 5
+UPSERT_BATCH_SIZE = 100
+
+def extract_year(text: str, default: int = 2024, pattern: str = r"(?<!\d)(202[0-5])(?!\d)") -> int:
+    year_match = re.search(pattern, text)
+    return int(year_match.group(1)) if year_match else default
+
 class CustomRAGTool(Toolkit):
-    def __init__(self):
+    def __init__(self, collection_profile: str = QDRANT_COLLECTION_PROFILE, vector_backend=None, micro_batching: bool = MICRO_BATCH_ENABLED,
+                 embedding_threads: int = EMBEDDING_THREADS):
+        """vector_backend: QdrantBackend/EmbeddedBackend (tools/vector_backends.py); mặc định theo VECTOR_BACKEND.
+        micro_batching: gom query embedding và vector search của các lời gọi run() đồng thời thành batch.
+        embedding_threads: số thread của embedding runtime (ingest worker nền dùng ít thread để không tranh CPU với serving).
+        """
         super().__init__(name="rag_tool")
         try:
             validate_rag_dir(RAG_DATA_DIR)
-            self.client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
             self.collection_name = "financial_docs"
-            self.model = SentenceTransformer("all-MiniLM-L6-v2")
+            # SentenceTransformer (torch) hoặc ONNX Runtime theo EMBEDDING_RUNTIME, đã warm-up
+            self.model = load_embedder(INGEST_SETTINGS["model"], threads=embedding_threads, warmup_batch_size=EMBED_BATCH_SIZE)
+            self.backend = vector_backend or create_vector_backend(
+                collection_name=self.collection_name,
+                dim=self.model.get_sentence_embedding_dimension(),
+                profile=collection_profile
+            )
+            self.count_tokens = make_token_counter(getattr(self.model, "tokenizer", None))
+            self.companies = load_companies()
+            self.collection_ready = False
+            self.facts_enabled = FACTS_STORE_ENABLED
+            self.mmr_enabled = RAG_MMR_ENABLED
+            self.two_stage_enabled = RAG_TWO_STAGE_ENABLED
+            self.hybrid_enabled = False
+            self.embedding_cache = EmbeddingCache(self.model.fingerprint, self.model.get_sentence_embedding_dimension()) if EMBEDDING_CACHE_ENABLED else None
+            # Hai stage riêng: trong lúc một batch đang search, batch query kế tiếp đã được encode
+            self.query_batcher = MicroBatcher(self._encode_query_batch, name="rag-encode") if micro_batching else None
+            self.search_batcher = MicroBatcher(self.backend.search_batch, name="rag-search") if micro_batching else None
             self._create_collection()
-            logger.info("RAG tool initialized successfully")
+            logger.info(f"RAG tool initialized successfully with {self.backend.name} vector backend")
         except Exception as e:
             logger.error(f"Failed to initialize RAG tool: {str(e)}")
             raise
 
     def _create_collection(self):
         try:
-            collections = self.client.get_collections()
-            if self.collection_name not in [col.name for col in collections.collections]:
-                self.client.create_collection(
-                    collection_name=self.collection_name,
-                    vectors_config=models.VectorParams(
-                        size=384,
-                        distance=models.Distance.COSINE
-                    )
-                )
-                logger.info(f"Created Qdrant collection: {self.collection_name}")
+            self.backend.ensure_collection()
+            self.hybrid_enabled = self.backend.hybrid_enabled
+            # Trạng thái collection được cache, run() không gọi get_collections mỗi query
+            self.collection_ready = True
         except Exception as e:
-            logger.error(f"Failed to create Qdrant collection: {str(e)}")
+            logger.error(f"Failed to create {self.backend.name} collection: {str(e)}")
             raise
 
-    def _load_documents(self):
-        """Load and process PDF documents from RAG_DATA_DIR, extract text via OCR, create embeddings, and upsert into Qdrant."""
+    def _load_documents(self, filenames: list = None, ocr_workers: int = OCR_WORKERS, ocr_nice: int = 0, progress=None) -> dict:
+        """Load and process new or changed PDF documents from RAG_DATA_DIR, extract text from the text layer (OCR for scanned pages), create embeddings, and upsert into the vector backend.
+
+        Files are tracked in a manifest by content hash; point IDs are derived from (file hash, chunk index),
+        unchanged files are skipped and points of removed or changed files are deleted.
+        Extraction, embedding and upsert run as a streaming pipeline connected by bounded queues,
+        so memory stays flat regardless of corpus size and the stages overlap in time.
+
+        With INGEST_JOBS_ENABLED, every changed file goes through durable stages (extracted pages, chunks, embeddings,
+        indexed) checkpointed in a SQLite job table next to the manifest: a rerun after a crash resumes each file from
+        its last checkpoint, and concurrent workers claim INGEST_JOB_CLAIM_FILES files at a time from the same table.
+
+        Args:
+            filenames (list): Only check these files (e.g. from the background ingest worker); a listed file that no
+                longer exists is treated as removed. Default: every file in RAG_DATA_DIR.
+            ocr_workers (int): Extraction processes; ocr_nice raises their niceness.
+            progress: Optional callable(filename, state) with state "extracted", "indexed", "removed" or "failed".
+
+        Returns:
+            dict: {"processed", "failed", "removed", "unchanged"} filenames.
+        """
+        report = progress or (lambda filename, state: None)
+        result = {"processed": [], "failed": [], "removed": [], "unchanged": []}
         try:
             company_mapping = build_company_mapping()
             logger.info(f"Found {len(company_mapping)} companies in RAG_DATA_DIR: {list(company_mapping.values())}")
             logger.debug(f"Company mapping: {company_mapping}")
             
-            documents = []
-            doc_ids = []
-            doc_names = []
-            companies = []
-            chunk_id = 0
             processed_files = []
             failed_files = []
-            CHUNK_SIZE = 1000
-            BATCH_SIZE = 100
-            MAX_PAGES = 100
-
-            def clean_text(text):
-                text = re.sub(r'\s+', ' ', text)
-                text = re.sub(r'(?<=\w)- (?=\w)', '', text)
-                text = re.sub(r'[^\w\s.,!?&-]', '', text)
-                return text.strip()
-
-            def detect_table_lines(text):
-                lines = text.split('\n')
-                table_lines = []
-                for line in lines:
-                    if '|' in line or len(line.split()) > 3 and len(set(len(word) for word in line.split() if word)) < 3:
-                        table_lines.append(line.strip())
-                if table_lines:
-                    return '\n'.join(table_lines) + '\n'
-                return ''
-
-            def chunk_text(text, chunk_size=CHUNK_SIZE):
-                chunks = []
-                while len(text) > chunk_size:
-                    match = re.search(r'([.!?\n])\s', text[:chunk_size][::-1])
-                    if match:
-                        last_period_index = chunk_size - match.start() - 1
-                    else:
-                        space_index = text[:chunk_size].rfind(' ')
-                        last_period_index = space_index if space_index != -1 else chunk_size
-                    
-                    chunk = text[:last_period_index].strip()
-                    if len(chunk) >= 50:
-                        chunks.append(chunk)
-                    text = text[last_period_index+1:].lstrip()
-                
-                if len(text.strip()) >= 50:
-                    chunks.append(text.strip())
-                return chunks
-
-            logger.info(f"Files in RAG_DATA_DIR: {os.listdir(RAG_DATA_DIR)}")
-            for filename in os.listdir(RAG_DATA_DIR):
+
+            candidates = os.listdir(RAG_DATA_DIR) if filenames is None else [name for name in filenames if os.path.exists(os.path.join(RAG_DATA_DIR, name))]
+            logger.info(f"Files in RAG_DATA_DIR: {candidates}")
+            file_hashes = {}
+            for filename in candidates:
                 if not filename.endswith(".pdf"):
                     logger.debug(f"Skipping non-PDF file: {filename}")
                     continue
-                filepath = os.path.join(RAG_DATA_DIR, filename)
                 try:
-                    text = ""
-                    has_content = False
-                    logger.info(f"Processing {filename} with OCR")
-                    try:
-                        images = convert_from_path(filepath, first_page=1, last_page=MAX_PAGES)
-                        for i, image in enumerate(images):
-                            ocr_text = pytesseract.image_to_string(image, lang='eng')
-                            if ocr_text.strip():
-                                table_text = detect_table_lines(ocr_text)
-                                non_table_text = clean_text(re.sub(r'\n\s*\n', '\n', ocr_text))
-                                text += table_text + non_table_text + '\n'
-                                has_content = True
-                            logger.debug(f"OCR page {i+1}/{len(images)} of {filename}: {len(ocr_text)} characters, sample={ocr_text[:100]}")
-                    except Exception as e:
-                        logger.error(f"OCR failed for {filename}: {str(e)}, filepath={filepath}")
-                        failed_files.append(filename)
-                        continue
+                    file_hashes[filename] = file_sha256(os.path.join(RAG_DATA_DIR, filename))
+                except Exception as e:
+                    logger.error(f"Failed to hash {filename}: {str(e)}")
+                    failed_files.append(filename)
 
-                    if not has_content:
-                        logger.warning(f"No content extracted from {filename} via OCR.")
-                        failed_files.append(filename)
-                        continue
+            # Bật hybrid search lần đầu hoặc đổi embedding runtime (vector khác) thì nạp lại toàn bộ
+            settings = {**INGEST_SETTINGS, "model": self.model.fingerprint, "sparse": SPARSE_ENCODER if self.hybrid_enabled else None}
+            jobs = IngestJobStore(ingest_jobs_path(self.backend.manifest_path)) if INGEST_JOBS_ENABLED else None
+            manifest = RagManifest(path=self.backend.manifest_path, settings=settings, shared=jobs is not None)
+            # Collection bị xóa/tạo lại (clean_qdrant_collection) thì manifest không còn đúng
+            if manifest.files and self.backend.count() == 0:
+                logger.warning(f"{self.backend.name} collection is empty, ignoring existing RAG manifest")
+                manifest.clear()
+            changed, removed, unchanged = manifest.diff(file_hashes)
+            if filenames is not None:
+                # Chỉ kiểm tra một phần thư mục: file không được liệt kê không bị coi là đã xóa
+                removed = [name for name in filenames if name not in file_hashes and name in manifest.files]
+            result.update(removed=removed, unchanged=unchanged)
+            for filename in removed:
+                report(filename, "removed")
+            logger.info(f"RAG manifest: {len(changed)} new/changed, {len(removed)} removed, {len(unchanged)} unchanged files")
+            self._delete_files(manifest, removed)
 
-                    raw_company = filename.replace(".pdf", "").split("_")[0]
-                    company = map_company_name(raw_company, company_mapping)
-                    if not company:
-                        logger.error(f"Failed to map company for {filename}: raw_company={raw_company}, company_mapping={company_mapping}")
-                        failed_files.append(filename)
-                        continue
-                    year_match = re.search(r"\b(202[0-5])\b", text)
-                    year = int(year_match.group(1)) if year_match else 2024
-                    report_type = "annual_report" if "Annual" in filename.lower() else "financial_report"
-                    logger.debug(f"Processed {filename}: raw_company={raw_company}, company={company}, year={year}, report_type={report_type}, text_length={len(text)}")
-
-                    chunks = chunk_text(text, CHUNK_SIZE)
-                    logger.debug(f"Generated {len(chunks)} chunks for {filename}: sample={chunks[0][:100] if chunks else ''}")
-
-                    for chunk in chunks:
-                        documents.append(chunk)
-                        doc_ids.append(chunk_id)
-                        doc_names.append(filename)
-                        companies.append(company)
-                        chunk_id += 1
-                    processed_files.append(filename)
+            if not changed:
+                logger.info("RAG documents are up to date, nothing to ingest")
+                result["failed"] = failed_files
+                return result
 
-                except Exception as e:
-                    logger.error(f"Failed to process PDF {filename}: {str(e)}, filepath={filepath}")
-                    failed_files.append(filename)
-                    continue
+            stats = {"chunks": 0, "upserted": 0, "upsert_batches": 0}
+            if jobs is None:
+                rounds = [changed]
+            else:
+                jobs.sync({filename: file_hashes[filename] for filename in changed}, settings_key(settings))
+                attempted = set()
 
-            if not documents:
+                def claim_round():
+                    # Mỗi file thử tối đa một lần trong một lần chạy; file còn lại do worker khác giữ
+                    batch = jobs.claim([name for name in changed if name not in attempted], INGEST_JOB_CLAIM_FILES)
+                    attempted.update(batch)
+                    return batch
+
+                rounds = iter(claim_round, [])
+            try:
+                for batch in rounds:
+                    # Point cũ của file đổi nội dung chỉ bị xóa bởi worker đã claim file đó
+                    self._delete_files(manifest, batch)
+                    batch_processed, batch_failed = self._ingest_files(batch, file_hashes, manifest, company_mapping, stats, jobs, ocr_workers, ocr_nice, report)
+                    processed_files.extend(batch_processed)
+                    failed_files.extend(batch_failed)
+            finally:
+                if jobs is not None:
+                    jobs.release()
+
+            if jobs is not None:
+                exhausted = jobs.exhausted([name for name in changed if name not in attempted])
+                if exhausted:
+                    logger.warning(f"Skipped {len(exhausted)} files that failed {INGEST_JOB_MAX_ATTEMPTS} times, run populate_rag.py --retry-failed to retry them: {exhausted}")
+                    failed_files.extend(exhausted)
+                skipped = len(changed) - len(attempted) - len(exhausted)
+                if skipped:
+                    logger.info(f"{skipped} changed files are being ingested by other workers")
+
+            result.update(processed=processed_files, failed=failed_files)
+            for filename in failed_files:
+                report(filename, "failed")
+            if not processed_files:
                 logger.warning(f"No valid PDF documents found in RAG_DATA_DIR: {RAG_DATA_DIR}")
-                return
+                return result
 
             logger.info(f"Processed {len(processed_files)} files: {processed_files}")
             if failed_files:
                 logger.warning(f"Failed to process {len(failed_files)} files: {failed_files}")
+            logger.info(f"Loaded {stats['upserted']} document chunks into {self.backend.name} in {stats['upsert_batches']} batches")
+            if self.embedding_cache is not None:
+                logger.info(f"Embedding cache: {self.embedding_cache.stats()}")
+            return result
+
+        except Exception as e:
+            logger.error(f"Unexpected error in _load_documents: {str(e)}")
+            raise
+
+    def _delete_files(self, manifest, filenames: list) -> None:
+        """Xóa point của file đã bị xóa hoặc đã thay đổi nội dung và bỏ file khỏi manifest."""
+        stale_ids = [pid for filename in filenames for pid in manifest.point_ids(filename)]
+        if stale_ids:
+            for i in range(0, len(stale_ids), UPSERT_BATCH_SIZE):
+                self.backend.delete(stale_ids[i:i + UPSERT_BATCH_SIZE])
+            logger.info(f"Deleted {len(stale_ids)} stale points of {len(filenames)} files")
+        for filename in filenames:
+            manifest.remove(filename)
+        manifest.save()
+        # Facts của file đổi nội dung được ghi lại khi file đó upsert xong
+        self._save_facts(filenames, [])
+
+    def _ingest_files(self, filenames: list, file_hashes: dict, manifest, company_mapping: dict, stats: dict, jobs, ocr_workers: int, ocr_nice: int, report) -> tuple:
+        """Chạy pipeline nạp cho filenames; file có checkpoint trong job table bắt đầu từ stage đã lưu.
+
+        Returns:
+            tuple: (processed, failed) filenames.
+        """
+        processed_files = []
+        failed_files = []
 
+        def fail(filename, error):
+            failed_files.append(filename)
+            if jobs is not None:
+                jobs.fail(filename, str(error))
+
+        # extract (process pool) -> chunk (thread này) -> chunk_queue -> embed -> batch_queue -> upsert
+        chunk_queue = queue.Queue(maxsize=EMBED_BATCH_SIZE * PIPELINE_QUEUE_BATCHES)
+        batch_queue = queue.Queue(maxsize=PIPELINE_QUEUE_BATCHES)
+        stop_event = threading.Event()
+        stages = [
+            PipelineStage("embed", self._embed_stage, (chunk_queue, batch_queue, stop_event, jobs), stop_event),
+            PipelineStage("upsert", self._upsert_stage, (batch_queue, manifest, stats, UPSERT_BATCH_SIZE, stop_event, report, jobs), stop_event),
+        ]
+        for stage in stages:
+            stage.start()
+
+        def queue_file(filename, records, file_facts, vectors=None):
+            for record, vector in zip(records, vectors if vectors is not None else [None] * len(records)):
+                if vector is not None:
+                    record = {**record, "vector": vector}
+                put_until_stopped(chunk_queue, ("chunk", record), stop_event)
+            # Marker đi sau các chunk của file: upsert stage ghi manifest khi mọi point của file đã được upsert
+            put_until_stopped(chunk_queue, ("file", filename, file_hashes[filename], [record["id"] for record in records], file_facts), stop_event)
+            stats["chunks"] += len(records)
+            processed_files.append(filename)
+            report(filename, "extracted")
+
+        def chunk_pages(filename, pages):
+            filepath = os.path.join(RAG_DATA_DIR, filename)
             try:
-                embeddings = self.model.encode(documents, show_progress_bar=True)
+                text, page_spans = join_pages(pages)
+                if not text.strip():
+                    logger.warning(f"No content extracted from {filename}.")
+                    fail(filename, "no content extracted")
+                    return
+
+                raw_company = filename.replace(".pdf", "").split("_")[0]
+                company = canonical_company_name(raw_company, self.companies, company_mapping)
+                if not company:
+                    logger.error(f"Failed to map company for {filename}: raw_company={raw_company}, company_mapping={company_mapping}")
+                    fail(filename, f"unknown company {raw_company}")
+                    return
+                # Năm của tài liệu (ưu tiên năm trong tên file) để filter theo date_range của orchestrator
+                year = extract_year(filename, default=None) or extract_year(text)
+                report_type = "annual_report" if "Annual" in filename.lower() else "financial_report"
+                logger.debug(f"Processed {filename}: raw_company={raw_company}, company={company}, year={year}, report_type={report_type}, text_length={len(text)}")
+
+                chunks = chunk_text(text, count_tokens=self.count_tokens)
+                logger.debug(f"Generated {len(chunks)} chunks for {filename}: sample={chunks[0][0][:100] if chunks else ''}")
             except Exception as e:
-                logger.error(f"Failed to create embeddings: {str(e)}")
-                raise
-
-            points = [
-                models.PointStruct(
-                    id=doc_id,
-                    vector=embedding.tolist(),
-                    payload={
-                        "text": doc_text,
-                        "filename": doc_name,
-                        "company": company,
-                        "year": year,
-                        "report_type": report_type,
-                        "keywords": ["revenue", "profit", "financial", "annual"],
-                        "chunk_id": doc_id
+                logger.error(f"Failed to process PDF {filename}: {str(e)}, filepath={filepath}")
+                fail(filename, e)
+                return
+
+            records = []
+            file_facts = []
+            symbol = resolve_company_symbol(company, self.companies)
+            for chunk_index, (chunk, chunk_start, chunk_end) in enumerate(chunks):
+                doc_id = point_id(file_hashes[filename], chunk_index)
+                # Chỉ số tài chính trích xuất một lần ở đây: vào payload (summary lúc query) và bảng financial_facts
+                facts = extract_facts(chunk)
+                file_facts.extend(fact_rows(facts, company, symbol, filename, doc_id))
+                records.append({
+                    "id": doc_id,
+                    "text": chunk,
+                    "filename": filename,
+                    "company": company,
+                    "symbol": symbol,
+                    "year": year,
+                    "report_type": report_type,
+                    "chunk_id": chunk_index,
+                    "page_extraction": page_extraction(page_spans, chunk_start, chunk_end),
+                    "facts": facts,
+                    # Chữ ký MinHash để bỏ chunk gần trùng (boilerplate, bảng lặp giữa các trang) lúc query
+                    "minhash": minhash_signature(chunk),
+                })
+            if jobs is not None:
+                jobs.checkpoint(filename, "chunked", json.dumps({"records": records, "facts": file_facts}).encode("utf-8"))
+            queue_file(filename, records, file_facts)
+
+        try:
+            to_extract = []
+            for filename in filenames:
+                stage = jobs.stage(filename) if jobs is not None else None
+                if stage in ("chunked", "embedded"):
+                    checkpoint = json.loads(jobs.load(filename, "chunked"))
+                    vectors = None
+                    if stage == "embedded":
+                        data = jobs.load(filename, "embedded")
+                        vectors = np.frombuffer(data, dtype=np.float32).reshape(len(checkpoint["records"]), -1) if checkpoint["records"] else None
+                    logger.info(f"Resuming {filename} from {stage} checkpoint ({len(checkpoint['records'])} chunks)")
+                    queue_file(filename, checkpoint["records"], checkpoint["facts"], vectors)
+                elif stage == "extracted":
+                    logger.info(f"Resuming {filename} from extracted checkpoint")
+                    chunk_pages(filename, json.loads(jobs.load(filename, "extracted")))
+                else:
+                    to_extract.append(filename)
+                if stop_event.is_set():
+                    break
+
+            if to_extract and not stop_event.is_set():
+                pdf_paths = [os.path.join(RAG_DATA_DIR, filename) for filename in to_extract]
+                for filename, pages, error in iter_documents(pdf_paths, PDF_PAGE_BUDGET, ocr_workers, nice=ocr_nice):
+                    if stop_event.is_set():
+                        break
+                    if error is not None:
+                        fail(filename, error)
+                        continue
+                    if jobs is not None:
+                        jobs.checkpoint(filename, "extracted", json.dumps(pages).encode("utf-8"))
+                    chunk_pages(filename, pages)
+        finally:
+            put_until_stopped(chunk_queue, None, stop_event)
+            for stage in stages:
+                stage.join()
+
+        for stage in stages:
+            if stage.error is not None:
+                logger.error(f"RAG ingestion stage '{stage.stage_name}' failed: {str(stage.error)}")
+                raise stage.error
+        return processed_files, failed_files
+
+    def _save_facts(self, filenames: list, rows: list) -> None:
+        """Ghi facts vào financial_facts; lỗi (ví dụ chưa chạy init_db.py) chỉ tắt facts store, không dừng ingest."""
+        if not self.facts_enabled:
+            return
+        try:
+            save_file_facts(filenames, rows)
+        except Exception as e:
+            logger.warning(f"Financial facts store unavailable, skipping facts for the rest of this run: {str(e)}")
+            self.facts_enabled = False
+
+    def _encode_chunks(self, texts: list):
+        encode_fn = lambda batch: self.model.encode(batch, batch_size=EMBED_BATCH_SIZE)
+        if self.embedding_cache is None:
+            return encode_fn(texts)
+        return self.embedding_cache.encode(texts, encode_fn)
+
+    def _encode_query_batch(self, queries: list) -> list:
+        return list(self.model.encode(queries, batch_size=len(queries)))
+
+    def _encode_query(self, query: str):
+        # Query đã có trong LRU không phải chờ batch
+        encode_fn = self.query_batcher.submit if self.query_batcher is not None else self.model.encode
+        if self.embedding_cache is None:
+            return encode_fn(query)
+        return self.embedding_cache.encode_query(query, encode_fn)
+
+    def _sparse_vector(self, text: str):
+        """Sparse vector lexical (indices, values) khi backend hỗ trợ hybrid search."""
+        return sparse.encode_document(text) if self.hybrid_enabled else None
+
+    def _embed_stage(self, chunk_queue, batch_queue, stop_event, jobs=None):
+        """Gom chunk thành batch EMBED_BATCH_SIZE, encode và chuyển point sang upsert stage.
+
+        Chunk resume từ checkpoint đã có "vector" thì không encode lại; với job table, vector của mỗi file vừa encode
+        được lưu làm checkpoint "embedded" khi marker của file đi qua.
+        """
+        records = []
+        markers = []
+        file_vectors = {}
+
+        def flush():
+            if records:
+                missing = [record for record in records if "vector" not in record]
+                if missing:
+                    for record, embedding in zip(missing, self._encode_chunks([record["text"] for record in missing])):
+                        record["vector"] = embedding
+                        if jobs is not None:
+                            file_vectors.setdefault(record["filename"], []).append(embedding)
+                points = [
+                    {
+                        "id": record["id"],
+                        "vector": record["vector"],
+                        "sparse": self._sparse_vector(record["text"]),
+                        "payload": {
+                            "text": record["text"],
+                            "level": "chunk",
+                            "filename": record["filename"],
+                            "company": record["company"],
+                            "symbol": record["symbol"],
+                            "year": record["year"],
+                            "report_type": record["report_type"],
+                            "keywords": ["revenue", "profit", "financial", "annual"],
+                            "chunk_id": record["chunk_id"],
+                            "page_extraction": record["page_extraction"],
+                            "facts": record["facts"],
+                            "minhash": record["minhash"]
+                        }
                     }
-                )
-                for doc_id, embedding, doc_text, doc_name, year, company in zip(
-                    doc_ids, embeddings, documents, doc_names,
-                    [int(re.search(r"\b(202[0-5])\b", doc_text).group(1)) if re.search(r"\b(202[0-5])\b", doc_text) else 2024 for doc_text in documents],
-                    companies
-                )
-            ]
+                    for record in records
+                ]
+                put_until_stopped(batch_queue, ("points", points), stop_event)
+                records.clear()
+            # Marker chỉ được chuyển tiếp sau batch chứa chunk cuối của file
+            for marker in markers:
+                vectors = file_vectors.pop(marker[1], None)
+                if vectors:
+                    jobs.checkpoint(marker[1], "embedded", np.asarray(vectors, dtype=np.float32).tobytes())
+                put_until_stopped(batch_queue, marker, stop_event)
+            markers.clear()
 
-            for point in points[:5]:
-                logger.debug(f"Upserting point: id={point.id}, company={point.payload['company']}, filename={point.payload['filename']}")
+        try:
+            while True:
+                item = get_until_stopped(chunk_queue, stop_event)
+                if item is None:
+                    break
+                if item[0] == "file":
+                    markers.append(item)
+                    continue
+                records.append(item[1])
+                if len(records) >= EMBED_BATCH_SIZE:
+                    flush()
+            flush()
+        finally:
+            put_until_stopped(batch_queue, None, stop_event)
 
-            try:
-                for i in range(0, len(points), BATCH_SIZE):
-                    batch = points[i:i + BATCH_SIZE]
-                    self.client.upsert(
-                        collection_name=self.collection_name,
-                        points=batch
-                    )
-                    logger.info(f"Upserted batch {i//BATCH_SIZE + 1} with {len(batch)} points")
-                logger.info(f"Loaded {len(documents)} document chunks into Qdrant")
-            except Exception as e:
-                logger.error(f"Failed to upsert into Qdrant: {str(e)}")
-                raise
+    def _upsert_stage(self, batch_queue, manifest, stats, batch_size, stop_event, report=None, jobs=None):
+        """Upsert theo batch batch_size; file được ghi vào manifest (và đánh dấu indexed trong job table) sau khi mọi point của nó đã được upsert.
 
+        Khi file hoàn tất, vector tóm tắt tài liệu/section của nó được upsert và ghi vào manifest cùng các chunk.
+        """
+        points = []
+        summaries = DocumentSummaries()
+        # (số point đã nhận khi marker đến, marker): file hoàn tất khi số point đã upsert đạt tới vị trí đó
+        markers = []
+        received = 0
+        upserted = 0
+
+        def flush(count):
+            nonlocal upserted
+            batch = points[:count]
+            del points[:count]
+            if batch:
+                self.backend.upsert(batch)
+                upserted += len(batch)
+                stats["upserted"] += len(batch)
+                stats["upsert_batches"] += 1
+                logger.info(f"Upserted batch {stats['upsert_batches']} with {len(batch)} points")
+            done = [marker for position, marker in markers if position <= upserted]
+            if done:
+                self._save_facts([marker[1] for marker in done], [row for marker in done for row in marker[4]])
+                summary_points = {marker[1]: summaries.pop(marker[1], marker[2]) for marker in done}
+                if any(summary_points.values()):
+                    self.backend.upsert([point for file_points in summary_points.values() for point in file_points])
+                for _, filename, file_hash, point_ids, _ in done:
+                    manifest.record(filename, file_hash, point_ids + [point["id"] for point in summary_points[filename]])
+                manifest.save()
+                for marker in done:
+                    if jobs is not None:
+                        jobs.complete(marker[1])
+                    if report is not None:
+                        report(marker[1], "indexed")
+                markers[:] = [(position, marker) for position, marker in markers if position > upserted]
+
+        while True:
+            item = get_until_stopped(batch_queue, stop_event)
+            if item is None:
+                break
+            if item[0] == "file":
+                markers.append((received, item))
+                # File đã upsert hết (ví dụ file không có chunk nào) thì ghi nhận luôn
+                flush(0)
+                continue
+            points.extend(item[1])
+            summaries.add(item[1])
+            received += len(item[1])
+            while len(points) >= batch_size:
+                flush(batch_size)
+        flush(len(points))
+
+    def _company_filter(self, company: str = None, tickers: list = None):
+        """Danh sách tên công ty chuẩn (cùng hàm chuẩn hóa với lúc ingest) để filter trên payload company."""
+        names = []
+        for value in ([company] if company else []) or (tickers or []):
+            name = canonical_company_name(value, self.companies)
+            if name and name not in names:
+                names.append(name)
+        return names or None
+
+    @staticmethod
+    def _year_filter(date_range: dict = None):
+        """date_range {"start_date", "end_date"} của orchestrator -> khoảng năm (gte, lte) trên payload year."""
+        if not date_range:
+            return None
+        start_year = extract_year(str(date_range.get("start_date") or ""), default=None, pattern=r"\b(\d{4})")
+        end_year = extract_year(str(date_range.get("end_date") or ""), default=None, pattern=r"\b(\d{4})")
+        if start_year is None and end_year is None:
+            return None
+        return (start_year, end_year)
+
+    def _search(self, query: str, query_embedding: list, companies: list, year_range: tuple, limit: int, with_vectors: bool = False,
+                filenames: list = None, levels: tuple = None) -> list:
+        """Dense search, hoặc hybrid dense + sparse gộp bằng reciprocal rank fusion khi backend hỗ trợ."""
+        request = {
+            "query_vector": query_embedding,
+            # Point tóm tắt không có sparse vector: search tóm tắt chỉ dùng dense
+            "sparse_query": sparse.encode_query(query) if self.hybrid_enabled and not levels else None,
+            "companies": companies,
+            "year_range": year_range,
+            "limit": limit,
+            "with_vectors": with_vectors,
+            "filenames": filenames,
+            "levels": levels,
+        }
+        if self.search_batcher is not None:
+            return self.search_batcher.submit(request)
+        return self.backend.search(**request)
+
+    def _candidate_documents(self, query: str, query_embedding: list, companies: list, year_range: tuple) -> list:
+        """Tầng 1: filename của tối đa RAG_CANDIDATE_DOCUMENTS tài liệu gần query nhất theo vector tóm tắt tài liệu/section."""
+        hits = self._search(query, query_embedding, companies, year_range, limit=3 * RAG_CANDIDATE_DOCUMENTS, levels=("document", "section"))
+        filenames = []
+        for hit in hits:
+            if hit.payload["filename"] not in filenames:
+                filenames.append(hit.payload["filename"])
+        return filenames[:RAG_CANDIDATE_DOCUMENTS]
+
+    def _retrieve(self, query: str, query_embedding: list, companies: list, year_range: tuple, limit: int) -> list:
+        """Search chunk, giới hạn trong các tài liệu ứng viên khi bật retrieval hai tầng.
+
+        Corpus nạp trước khi có vector tóm tắt không có tài liệu ứng viên nào: search trên toàn bộ chunk như trước.
+        """
+        filenames = self._candidate_documents(query, query_embedding, companies, year_range) if self.two_stage_enabled else []
+        if filenames:
+            logger.debug(f"Two-stage retrieval: {len(filenames)} candidate documents {filenames}")
+        return self._search(query, query_embedding, companies, year_range, limit=limit, with_vectors=self.mmr_enabled, filenames=filenames or None)
+
+    def _diversify(self, query_embedding: list, hits: list, k: int) -> list:
+        """k hit từ các ứng viên đã xếp hạng: bỏ chunk gần trùng theo MinHash rồi chọn bằng maximal marginal relevance,
+        tối đa RAG_MAX_CHUNKS_PER_DOCUMENT chunk mỗi file (trừ khi không còn ứng viên nào khác)."""
+        # Point nạp trước khi có chữ ký trong payload: tính tại chỗ từ text
+        signatures = [hit.payload.get("minhash") or minhash_signature(hit.payload["text"]) for hit in hits]
+        vectors = [getattr(hit, "vector", None) for hit in hits]
+        filenames = [hit.payload["filename"] for hit in hits]
+        selected = diversify(query_embedding, vectors, signatures, k, RAG_MMR_LAMBDA, RAG_DUPLICATE_THRESHOLD, filenames, RAG_MAX_CHUNKS_PER_DOCUMENT)
+        logger.debug(f"Diversified {len(hits)} candidates to {len(selected)} documents")
+        return [hits[i] for i in selected]
+
+    def batching_stats(self) -> dict:
+        if self.query_batcher is None:
+            return {}
+        return {"encode": self.query_batcher.stats(), "search": self.search_batcher.stats()}
+
+    def lookup_facts(self, query: str, sql_backend, company: str = None, tickers: list = None, date_range: dict = None) -> tuple:
+        """Tra bảng financial_facts khi query hỏi một chỉ số cụ thể (ví dụ "Apple net income 2023").
+
+        Returns:
+            tuple: (documents cùng dạng run() kèm "facts", complete) - complete chỉ khi query hỏi đúng giá trị chỉ số
+                (không hỏi nguyên nhân, so sánh...) và mọi công ty được hỏi đều có facts cho năm được hỏi.
+        """
+        metric = detect_metric(query)
+        companies = self._company_filter(company, tickers)
+        if not metric or not companies:
+            return [], False
+        year_range = self._year_filter(date_range)
+        if year_range is None:
+            year = extract_year(query, default=None)
+            year_range = (year, year) if year else None
+        try:
+            rows = lookup_facts(sql_backend, companies, metric, year_range)
         except Exception as e:
-            logger.error(f"Unexpected error in _load_documents: {str(e)}")
-            raise
+            logger.warning(f"Financial facts lookup failed, falling back to vector search: {str(e)}")
+            return [], False
+        documents = {}
+        for row in rows:
+            document = documents.setdefault((row["company"], row["filename"]), {"filename": row["filename"], "company": row["company"], "facts": []})
+            document["facts"].append({"metric": row["metric"], "fiscal_year": row["fiscal_year"], "value": row["value"], "unit": row["unit"]})
+        for document in documents.values():
+            document["document"] = format_facts(document["facts"])
+        complete = is_value_lookup(query) and facts_cover(rows, companies, year_range)
+        logger.info(f"Financial facts lookup: metric={metric}, companies={companies}, years={year_range}, {len(rows)} facts, complete={complete}")
+        return list(documents.values()), complete
 
-    def run(self, query: str, company: str = None, tickers: list = None) -> list:
-        """Retrieve top 5 closest documents from Qdrant based on query embedding, filtered by company if provided."""
+    def run(self, query: str, company: str = None, tickers: list = None, date_range: dict = None) -> list:
+        """Retrieve top 5 documents from the vector backend based on query embedding, filtered by company and year range if provided.
+
+        With MMR enabled, RAG_MMR_CANDIDATES candidates are fetched with their vectors, near-duplicate chunks are dropped
+        by MinHash similarity and the final 5 are picked by maximal marginal relevance.
+        """
         try:
-            logger.info(f"Executing RAG query: {query}, company: {company}, tickers: {tickers}")
-            query_embedding = self.model.encode(query).tolist()
+            logger.info(f"Executing RAG query: {query}, company: {company}, tickers: {tickers}, date_range: {date_range}")
+            query_embedding = self._encode_query(query).tolist()
 
-            # Kiểm tra xem Qdrant có tài liệu không
-            collections = self.client.get_collections()
-            if not any(col.name == self.collection_name for col in collections.collections):
-                logger.error(f"Qdrant collection {self.collection_name} does not exist")
+            # Collection chưa có lúc khởi động thì kiểm tra lại (có thể vừa được populate)
+            if not self.collection_ready:
+                self.collection_ready = self.backend.exists()
+            if not self.collection_ready:
+                logger.error(f"{self.backend.name} collection {self.collection_name} does not exist")
                 return [{"error": "No documents loaded in Qdrant. Please upload financial reports to ./data/rag_documents and reload."}]
 
-            # Tạo bộ lọc theo company nếu có
-            filter_conditions = []
-            if company:
-                company_variants = [company, f"{company} Inc.", f"{company} Corporation", f"{company} Co.", f"The {company}"]
-                company_conditions = [
-                    models.FieldCondition(
-                        key="company",
-                        match=models.MatchText(text=variant)
-                    )
-                    for variant in company_variants
-                ]
-                filter_conditions.append(models.Filter(should=company_conditions))
+            # Bộ lọc exact match trên các field đã có payload index
+            companies = self._company_filter(company, tickers)
+            year_range = self._year_filter(date_range)
 
-            # Tìm kiếm với bộ lọc (nếu có), lấy top 5 tài liệu
-            search_result = self.client.search(
-                collection_name=self.collection_name,
-                query_vector=query_embedding,
-                query_filter=models.Filter(must=filter_conditions) if filter_conditions else None,
-                limit=5  # Lấy 5 tài liệu gần nhất
-            )
+            # Tìm kiếm với bộ lọc (nếu có), lấy top 5 tài liệu (hoặc nhiều ứng viên hơn để giới hạn theo tài liệu và đa dạng hóa)
+            limit = max(RAG_MMR_CANDIDATES if self.mmr_enabled else RAG_MAX_CHUNKS_PER_DOCUMENT * RAG_TOP_K, RAG_TOP_K)
+            search_result = self._retrieve(query, query_embedding, companies, year_range, limit)
+            if not search_result and year_range is not None:
+                # Báo cáo năm N thường phát hành năm N+1: bỏ filter năm trước khi kết luận không có tài liệu
+                logger.info(f"No documents for year filter {date_range}, retrying without it")
+                search_result = self._retrieve(query, query_embedding, companies, None, limit)
+            # Một báo cáo không chiếm hết kết quả: tối đa RAG_MAX_CHUNKS_PER_DOCUMENT chunk mỗi file.
+            # Với MMR, giới hạn áp dụng trong lúc chọn trên toàn bộ ứng viên (lọc trùng trước, không cắt pool trước)
+            if self.mmr_enabled and search_result:
+                search_result = self._diversify(query_embedding, search_result, RAG_TOP_K)
+            else:
+                search_result = [search_result[i] for i in cap_per_group([hit.payload["filename"] for hit in search_result], RAG_MAX_CHUNKS_PER_DOCUMENT, RAG_TOP_K)]
+            search_result = search_result[:RAG_TOP_K]
 
             if not search_result:
                 logger.warning(f"No documents found for query: {query}")
@@ -256,7 +669,8 @@ class CustomRAGTool(Toolkit):
                 {
                     "document": hit.payload["text"],
                     "filename": hit.payload["filename"],
-                    "company": hit.payload["company"]
+                    "company": hit.payload["company"],
+                    "facts": hit.payload.get("facts")
                 }
                 for hit in search_result
             ]
@@ -265,4 +679,4 @@ class CustomRAGTool(Toolkit):
 
         except Exception as e:
             logger.error(f"Error executing RAG query: {str(e)}")
-            return [{"error": f"Error retrieving documents: {str(e)}"}]
\ No newline at end of file
+            return [{"error": f"Error retrieving documents: {str(e)}"}]
@@ -0,0 +1,193 @@
+# tools/sql_backends.py
+import os
+import sys
+from pathlib import Path
+import json
+import re
+import threading
+import time
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+import pandas as pd
+from sqlalchemy import text
+from config.env import (
+    SQL_BACKEND, PARQUET_DIR, DUCKDB_THREADS, SQL_STATEMENT_TIMEOUT_MS,
+    SQL_EXPLAIN_GUARD, SQL_MAX_PLAN_COST, SQL_MAX_PLAN_ROWS
+)
+from utils.db import get_engine, pool_checkout
+from utils.logging import setup_logging
+
+logger = setup_logging()
+
+CANCEL_POLL_INTERVAL_S = 0.1
+PARQUET_TABLES = ["companies", "stock_prices"]
+# Chỉ có sau khi populate_rag.py đã nạp tài liệu
+OPTIONAL_PARQUET_TABLES = ["financial_facts"]
+
+
+class CancelWatchdog:
+    """Context manager hủy query phía backend khi hết deadline hoặc client ngắt kết nối."""
+    def __init__(self, cancel_fn, deadline: float = None, cancel_event: threading.Event = None):
+        self.cancel_fn = cancel_fn
+        self.deadline = deadline
+        self.cancel_event = cancel_event
+        self.done = threading.Event()
+        self.thread = None
+
+    def __enter__(self):
+        if self.deadline is None and self.cancel_event is None:
+            return self
+        self.thread = threading.Thread(target=self._watch, daemon=True)
+        self.thread.start()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.done.set()
+        if self.thread:
+            self.thread.join()
+        return False
+
+    def _watch(self):
+        while not self.done.wait(CANCEL_POLL_INTERVAL_S):
+            cancelled = self.cancel_event is not None and self.cancel_event.is_set()
+            expired = self.deadline is not None and time.monotonic() >= self.deadline
+            if cancelled or expired:
+                reason = "client disconnected" if cancelled else "request deadline exceeded"
+                try:
+                    self.cancel_fn()
+                    logger.warning(f"Cancelled running query: {reason}")
+                except Exception as e:
+                    logger.error(f"Failed to cancel running query: {str(e)}")
+                return
+
+
+def effective_timeout_ms(deadline: float = None) -> int:
+    """statement_timeout không được vượt quá thời gian còn lại của request."""
+    timeout_ms = SQL_STATEMENT_TIMEOUT_MS
+    if deadline is not None:
+        remaining_ms = int((deadline - time.monotonic()) * 1000)
+        if remaining_ms <= 0:
+            raise TimeoutError("Request deadline exceeded before query execution")
+        timeout_ms = min(timeout_ms, remaining_ms) if timeout_ms > 0 else remaining_ms
+    return max(timeout_ms, 0)
+
+
+def is_read_only(query: str) -> bool:
+    return re.match(r'^\s*(SELECT|WITH)\b', query, re.IGNORECASE) is not None
+
+
+class PostgresBackend:
+    """Thực thi SQL trên PostgreSQL với statement_timeout, EXPLAIN guard và cancellation."""
+    name = "postgres"
+
+    def __init__(self):
+        self.engine = get_engine("serving")
+        # Câu đọc đi sang read replica nếu có DATABASE_REPLICA_URL, ngược lại dùng chính engine serving
+        self.read_engine = get_engine("serving", read_only=True)
+
+    def query(self, query: str, params: dict = None, deadline: float = None, cancel_event: threading.Event = None) -> pd.DataFrame:
+        timeout_ms = effective_timeout_ms(deadline)
+        engine = self.read_engine if is_read_only(query) else self.engine
+        with pool_checkout(engine) as conn:
+            # SET LOCAL chỉ có hiệu lực trong transaction hiện tại, connection trả về pool sạch
+            conn.execute(text(f"SET LOCAL statement_timeout = {timeout_ms}"))
+            if SQL_EXPLAIN_GUARD:
+                self._check_plan(conn, query, params)
+            # psycopg2 gửi cancel request qua kết nối riêng, không chiếm connection trong pool
+            cancel_fn = conn.connection.driver_connection.cancel
+            with CancelWatchdog(cancel_fn, deadline, cancel_event):
+                return pd.read_sql_query(text(query), conn, params=params)
+
+    def _check_plan(self, conn, query: str, params: dict = None) -> None:
+        """Chạy EXPLAIN và từ chối các plan vượt ngưỡng cost hoặc số dòng ước tính."""
+        explain_sql = f"EXPLAIN (FORMAT JSON) {query.strip().rstrip(';')}"
+        plan_json = conn.execute(text(explain_sql), params or {}).scalar()
+        if isinstance(plan_json, str):
+            plan_json = json.loads(plan_json)
+        plan = plan_json[0]["Plan"]
+        total_cost = float(plan.get("Total Cost", 0))
+        plan_rows = int(plan.get("Plan Rows", 0))
+        logger.info(f"EXPLAIN estimate: total_cost={total_cost}, plan_rows={plan_rows}")
+        if total_cost > SQL_MAX_PLAN_COST:
+            raise ValueError(f"Query rejected: estimated cost {total_cost:.0f} exceeds limit {SQL_MAX_PLAN_COST:.0f}")
+        if plan_rows > SQL_MAX_PLAN_ROWS:
+            raise ValueError(f"Query rejected: estimated rows {plan_rows} exceeds limit {SQL_MAX_PLAN_ROWS}")
+
+
+class DuckDBBackend:
+    """Thực thi SQL in-process trên DuckDB, các bảng là view trên file Parquet trong PARQUET_DIR."""
+    name = "duckdb"
+
+    def __init__(self, parquet_dir: str = PARQUET_DIR):
+        import duckdb
+
+        self.parquet_dir = parquet_dir
+        self.conn = duckdb.connect(database=":memory:")
+        if DUCKDB_THREADS > 0:
+            self.conn.execute(f"SET threads = {DUCKDB_THREADS}")
+        for table in PARQUET_TABLES:
+            parquet_file = os.path.join(parquet_dir, f"{table}.parquet")
+            if not os.path.exists(parquet_file):
+                raise FileNotFoundError(f"Parquet file not found: {parquet_file}. Run the CSV loaders with SQL_BACKEND=duckdb first.")
+            self.conn.execute(f"CREATE OR REPLACE VIEW {table} AS SELECT * FROM read_parquet('{parquet_file}')")
+        # Bảng tùy chọn chưa có file lúc khởi động (facts do ingest/worker nền ghi sau) được đăng ký ở query đầu tiên sau khi file xuất hiện
+        self.pending_tables = list(OPTIONAL_PARQUET_TABLES)
+        self._views_lock = threading.Lock()
+        self._register_pending_views()
+        # Tương thích cú pháp PostgreSQL dùng trong visualized_template.yml
+        self.conn.execute("CREATE OR REPLACE MACRO to_char(d, fmt) AS strftime(d, replace(replace(fmt, 'YYYY', '%Y'), 'MM', '%m'))")
+
+    def _register_pending_views(self) -> None:
+        """Tạo view cho các bảng tùy chọn vừa có file Parquet; view đọc file lúc query nên các lần ghi sau được thấy ngay."""
+        if not self.pending_tables:
+            return
+        with self._views_lock:
+            for table in list(self.pending_tables):
+                parquet_file = os.path.join(self.parquet_dir, f"{table}.parquet")
+                if os.path.exists(parquet_file):
+                    self.conn.execute(f"CREATE OR REPLACE VIEW {table} AS SELECT * FROM read_parquet('{parquet_file}')")
+                    self.pending_tables.remove(table)
+                    logger.info(f"Registered DuckDB view {table} on {parquet_file}")
+
+    @staticmethod
+    def translate(query: str) -> str:
+        """Chuyển bind params kiểu SQLAlchemy (:name) sang DuckDB ($name), ANY(list) sang IN (UNNEST)."""
+        query = re.sub(r'(?<![:\w]):(\w+)', r'$\1', query)
+        return re.sub(r'=\s*ANY\(\s*\$(\w+)\s*\)', r'IN (SELECT UNNEST($\1))', query)
+
+    def query(self, query: str, params: dict = None, deadline: float = None, cancel_event: threading.Event = None) -> pd.DataFrame:
+        timeout_ms = effective_timeout_ms(deadline)
+        if timeout_ms > 0:
+            timeout_deadline = time.monotonic() + timeout_ms / 1000
+            deadline = min(deadline, timeout_deadline) if deadline is not None else timeout_deadline
+        self._register_pending_views()
+        # Mỗi query dùng cursor riêng: cùng database nhưng an toàn khi gọi từ nhiều thread
+        cursor = self.conn.cursor()
+        try:
+            with CancelWatchdog(cursor.interrupt, deadline, cancel_event):
+                return cursor.execute(self.translate(query), params or {}).df()
+        finally:
+            cursor.close()
+
+
+def create_sql_backend(name: str = SQL_BACKEND):
+    """Tạo SQL backend theo cấu hình SQL_BACKEND (postgres | duckdb)."""
+    if name == "postgres":
+        return PostgresBackend()
+    if name == "duckdb":
+        return DuckDBBackend()
+    raise ValueError(f"Unsupported SQL_BACKEND: {name}")
+
+
+def write_parquet_table(df: pd.DataFrame, table: str, parquet_dir: str = PARQUET_DIR) -> str:
+    """Ghi DataFrame ra Parquet (ghi file tạm rồi os.replace để reader không thấy file dở dang)."""
+    os.makedirs(parquet_dir, exist_ok=True)
+    parquet_file = os.path.join(parquet_dir, f"{table}.parquet")
+    tmp_file = parquet_file + ".tmp"
+    df.to_parquet(tmp_file, index=False)
+    os.replace(tmp_file, parquet_file)
+    logger.info(f"Wrote {len(df)} records to {parquet_file}")
+    return parquet_file
@@ -3,6 +3,7 @@ import os
 import sys
 from pathlib import Path
 import json
+import threading
 from datetime import date, datetime  # Thêm import để xử lý date
 
 # Thêm thư mục gốc dự án vào sys.path
@@ -10,22 +11,26 @@ BASE_DIR = Path(__file__).resolve().parent.parent
 sys.path.append(str(BASE_DIR))
 
 from phi.tools import Toolkit
-from sqlalchemy import create_engine, text
-from config.env import DATABASE_URL
 import pandas as pd
+from tools.sql_backends import create_sql_backend
 from utils.logging import setup_logging
-from utils.validators import validate_database_url
 
 logger = setup_logging()
 
+def frame_to_records(result: pd.DataFrame) -> list:
+    """Chuyển DataFrame kết quả thành list records, cột kiểu date thành chuỗi YYYY-MM-DD."""
+    for column in result.columns:
+        if pd.api.types.is_datetime64_any_dtype(result[column]) or isinstance(result[column].iloc[0] if not result.empty else None, (date, datetime)):
+            result[column] = result[column].apply(lambda x: x.strftime('%Y-%m-%d') if pd.notnull(x) else None)
+    return result.to_dict(orient='records') if not result.empty else []
+
 class CustomSQLTool(Toolkit):
-    def __init__(self):
+    def __init__(self, backend=None):
         super().__init__(name="sql_tool")
         try:
-            validate_database_url(DATABASE_URL)
-            self.engine = create_engine(DATABASE_URL)
+            self.backend = backend or create_sql_backend()
             self.register(self.run)
-            logger.info("SQL tool initialized successfully")
+            logger.info(f"SQL tool initialized successfully with {self.backend.name} backend")
         except Exception as e:
             logger.error(f"Failed to initialize SQL tool: {str(e)}")
             raise
@@ -36,28 +41,37 @@ class CustomSQLTool(Toolkit):
         Args:
             query (str): The SQL query to execute.
 
+        Returns:
+            str: JSON string with status, message, and data (result as JSON records).
+        """
+        return self.execute(query)
+
+    def execute(self, query: str, params: dict = None, deadline: float = None, cancel_event: threading.Event = None) -> str:
+        """Run a SQL query with statement_timeout, EXPLAIN cost guard and cancellation.
+
+        Args:
+            query (str): The SQL query to execute.
+            params (dict): Bind parameters for the query (e.g. {"tickers": ["AAPL", "MSFT"]}).
+            deadline (float): time.monotonic() value after which the query is cancelled.
+            cancel_event (threading.Event): Set by the caller (e.g. client disconnect) to cancel the query.
+
         Returns:
             str: JSON string with status, message, and data (result as JSON records).
         """
         try:
-            with self.engine.connect() as conn:
-                result = pd.read_sql_query(text(query), conn)
-                # Chuyển đổi cột kiểu date thành chuỗi định dạng YYYY-MM-DD
-                for column in result.columns:
-                    if result[column].dtype == 'datetime64[ns]' or isinstance(result[column].iloc[0] if not result.empty else None, (date, datetime)):
-                        result[column] = result[column].apply(lambda x: x.strftime('%Y-%m-%d') if pd.notnull(x) else None)
-                result_json = result.to_dict(orient='records') if not result.empty else []
-                return json.dumps({
-                    "status": "success",
-                    "message": "Query executed successfully",
-                    "data": {
-                        "result": result_json
-                    }
-                }, ensure_ascii=False)
+            result = self.backend.query(query, params=params, deadline=deadline, cancel_event=cancel_event)
+            result_json = frame_to_records(result)
+            return json.dumps({
+                "status": "success",
+                "message": "Query executed successfully",
+                "data": {
+                    "result": result_json
+                }
+            }, ensure_ascii=False)
         except Exception as e:
             logger.error(f"Error executing query: {str(e)}")
             return json.dumps({
                 "status": "error",
                 "message": f"Error executing query: {str(e)}",
                 "data": {}
-            }, ensure_ascii=False)
\ No newline at end of file
+            }, ensure_ascii=False)
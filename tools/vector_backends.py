@@ -0,0 +1,319 @@
+# tools/vector_backends.py
+import os
+import sys
+from pathlib import Path
+
+import numpy as np
+
+# Thêm thư mục gốc dự án vào sys.path
+BASE_DIR = Path(__file__).resolve().parent.parent
+sys.path.append(str(BASE_DIR))
+
+from config.env import (
+    VECTOR_BACKEND, QDRANT_HOST, QDRANT_PORT, QDRANT_COLLECTION_PROFILE, RAG_MANIFEST_PATH,
+    EMBEDDED_INDEX_DIR, HYBRID_SEARCH_ENABLED, HYBRID_PREFETCH_LIMIT
+)
+from utils.logging import setup_logging
+from utils.rag_manifest import collection_manifest_path
+from utils.vector_index import EmbeddedVectorIndex, POINT_LEVELS
+
+logger = setup_logging()
+
+# Point truyền vào upsert(): {"id", "vector" (np.ndarray), "sparse" ((indices, values) hoặc None), "payload"}
+# Filter của search(): companies (list tên công ty chuẩn, khớp một trong các tên), year_range ((gte, lte), có thể None một đầu)
+# filenames: chỉ các point thuộc những file này; levels: các POINT_LEVELS được search (mặc định chỉ chunk)
+# with_vectors=True: mỗi hit có thêm .vector (dense vector của point) cho bước MMR phía client
+
+
+class QdrantBackend:
+    """Collection trên Qdrant server: profile lưu trữ, payload index và hybrid search phía server.
+
+    Mặc định collection_name là alias (utils/qdrant_schema.py): query/upsert đi qua alias nên reindex
+    (scripts/reindex_rag.py) đổi collection phía sau mà không làm gián đoạn RAG. alias=False dùng cho
+    collection có phiên bản đang được build, với manifest riêng của collection đó.
+    """
+    name = "qdrant"
+
+    def __init__(self, collection_name: str, profile: str = QDRANT_COLLECTION_PROFILE, alias: bool = True):
+        from qdrant_client import QdrantClient
+        from utils.qdrant_schema import search_params
+
+        self.client = QdrantClient(host=QDRANT_HOST, port=QDRANT_PORT)
+        self.collection_name = collection_name
+        self.alias = alias
+        # Profile chỉ áp dụng khi tạo collection mới; tham số search (hnsw_ef, rescore) luôn theo profile này
+        self.profile = profile
+        self.search_params = search_params(profile)
+        self.hybrid_enabled = False
+        self.manifest_path = RAG_MANIFEST_PATH if alias else collection_manifest_path(collection_name)
+
+    def physical_collection(self):
+        """Collection thật đang phục vụ (đích của alias), None nếu chưa có."""
+        from utils.qdrant_schema import resolve_collection
+
+        return resolve_collection(self.client, self.collection_name)
+
+    def exists(self) -> bool:
+        return self.physical_collection() is not None
+
+    def _create(self, migrate: bool = False) -> str:
+        from utils.qdrant_schema import create_financial_collection, resolve_collection, switch_alias, versioned_collection_name
+
+        if not self.alias:
+            create_financial_collection(self.client, self.collection_name, self.profile)
+            return self.collection_name
+        # Kiểm tra trước khi tạo: không để lại collection có phiên bản rỗng khi alias chưa chuyển được
+        if not migrate and resolve_collection(self.client, self.collection_name) == self.collection_name:
+            raise RuntimeError(
+                f"{self.collection_name} is a plain collection: replacing it with an alias deletes it (no rollback). Rerun with --migrate to confirm"
+            )
+        collection_name = versioned_collection_name(self.collection_name)
+        create_financial_collection(self.client, collection_name, self.profile)
+        try:
+            switch_alias(self.client, self.collection_name, collection_name, migrate=migrate)
+        except Exception:
+            if resolve_collection(self.client, self.collection_name) != collection_name:
+                self.client.delete_collection(collection_name=collection_name)
+                logger.info(f"Deleted {collection_name} after failing to point {self.collection_name} to it")
+            raise
+        return collection_name
+
+    def ensure_collection(self) -> None:
+        from utils.qdrant_schema import ensure_payload_indexes, has_sparse_vectors
+
+        collection_name = self.physical_collection()
+        if collection_name is None:
+            collection_name = self._create()
+        else:
+            ensure_payload_indexes(self.client, collection_name)
+        self.hybrid_enabled = HYBRID_SEARCH_ENABLED and has_sparse_vectors(self.client, collection_name)
+        if HYBRID_SEARCH_ENABLED and not self.hybrid_enabled:
+            logger.warning(f"Collection {collection_name} has no sparse vectors, using dense-only search. Rebuild it with scripts/reindex_rag.py to enable hybrid search.")
+
+    def count(self) -> int:
+        return self.client.count(collection_name=self.collection_name).count
+
+    def delete(self, ids: list) -> None:
+        from qdrant_client.http import models
+
+        self.client.delete(collection_name=self.collection_name, points_selector=models.PointIdsList(points=ids))
+
+    def upsert(self, points: list) -> None:
+        from qdrant_client.http import models
+        from utils.qdrant_schema import SPARSE_VECTOR_NAME
+
+        structs = []
+        for point in points:
+            # Dense vector (unnamed) kèm sparse vector lexical khi collection hỗ trợ hybrid search
+            vector = point["vector"].tolist()
+            if self.hybrid_enabled and point.get("sparse") is not None:
+                indices, values = point["sparse"]
+                vector = {"": vector, SPARSE_VECTOR_NAME: models.SparseVector(indices=indices, values=values)}
+            structs.append(models.PointStruct(id=point["id"], vector=vector, payload=point["payload"]))
+        self.client.upsert(collection_name=self.collection_name, points=structs)
+
+    def clear(self, migrate: bool = False) -> None:
+        """Xóa và tạo lại collection trống (cùng profile); với alias, collection trống mới được tạo và alias chuyển sang trước khi xóa collection cũ.
+
+        migrate: cho phép xóa collection thường tên trùng alias (tạo trước khi dùng alias) để tạo alias.
+        """
+        old_collection = self.physical_collection()
+        if not self.alias and old_collection is not None:
+            self.client.delete_collection(collection_name=old_collection)
+        self._create(migrate)
+        if self.alias and old_collection not in (None, self.collection_name):
+            self.client.delete_collection(collection_name=old_collection)
+        self.ensure_collection()
+
+    def scroll(self, batch_size: int = 1000):
+        """Duyệt toàn bộ point (kèm vector và payload) theo batch, mỗi batch là list point cùng dạng upsert()."""
+        from qdrant_client.http import models
+        from utils.qdrant_schema import SPARSE_VECTOR_NAME
+
+        offset = None
+        while True:
+            records, offset = self.client.scroll(
+                collection_name=self.collection_name, limit=batch_size, offset=offset, with_payload=True, with_vectors=True
+            )
+            batch = []
+            for record in records:
+                vector, sparse_vector = record.vector, None
+                if isinstance(vector, dict):
+                    sparse_vector = vector.get(SPARSE_VECTOR_NAME)
+                    vector = vector.get("")
+                if isinstance(sparse_vector, models.SparseVector):
+                    sparse_vector = (sparse_vector.indices, sparse_vector.values)
+                batch.append({"id": record.id, "vector": vector, "sparse": sparse_vector, "payload": record.payload})
+            if batch:
+                yield batch
+            if offset is None:
+                break
+
+    def upload(self, batches, parallel: int = 4) -> None:
+        """Bulk upload (upload_points: batch song song, không chờ từng batch) cho các batch point cùng dạng upsert()."""
+        from qdrant_client.http import models
+        from utils.qdrant_schema import SPARSE_VECTOR_NAME
+
+        def structs():
+            for points in batches:
+                for point in points:
+                    vector = np.asarray(point["vector"], dtype=np.float32).tolist()
+                    if self.hybrid_enabled and point.get("sparse") is not None:
+                        indices, values = point["sparse"]
+                        vector = {"": vector, SPARSE_VECTOR_NAME: models.SparseVector(indices=list(indices), values=list(values))}
+                    yield models.PointStruct(id=point["id"], vector=vector, payload=point["payload"])
+
+        self.client.upload_points(collection_name=self.collection_name, points=structs(), batch_size=256, parallel=parallel, wait=True)
+
+    def build_index(self) -> dict:
+        # Qdrant tự build HNSW khi upsert
+        return {}
+
+    @staticmethod
+    def _filter(companies: list = None, year_range: tuple = None, filenames: list = None, levels: tuple = None):
+        """MatchValue/MatchAny trên company, filename, level và Range trên year, đều là field có payload index."""
+        from qdrant_client.http import models
+
+        def match(values):
+            return models.MatchValue(value=values[0]) if len(values) == 1 else models.MatchAny(any=list(values))
+
+        conditions = []
+        if companies:
+            conditions.append(models.FieldCondition(key="company", match=match(companies)))
+        if filenames:
+            conditions.append(models.FieldCondition(key="filename", match=match(filenames)))
+        if year_range is not None:
+            conditions.append(models.FieldCondition(key="year", range=models.Range(gte=year_range[0], lte=year_range[1])))
+        levels = levels or ("chunk",)
+        excluded = [level for level in POINT_LEVELS if level not in levels]
+        # Chunk nạp trước khi có payload level không có field này: loại các level khác thay vì yêu cầu level=chunk
+        must_not = [models.FieldCondition(key="level", match=match(excluded))] if "chunk" in levels and excluded else []
+        if "chunk" not in levels:
+            conditions.append(models.FieldCondition(key="level", match=match(list(levels))))
+        return models.Filter(must=conditions, must_not=must_not) if conditions or must_not else None
+
+    def _query_request(self, query_vector: list, sparse_query: tuple = None, companies: list = None, year_range: tuple = None, limit: int = 5,
+                       with_vectors: bool = False, filenames: list = None, levels: tuple = None):
+        """Dense search, hoặc hybrid dense + sparse gộp bằng reciprocal rank fusion.
+
+        Hai nhánh hybrid là prefetch của cùng một request nên Qdrant chạy song song phía server.
+        """
+        from qdrant_client.http import models
+        from utils.qdrant_schema import SPARSE_VECTOR_NAME
+
+        query_filter = self._filter(companies, year_range, filenames, levels)
+        if not self.hybrid_enabled or sparse_query is None:
+            return models.QueryRequest(query=query_vector, filter=query_filter, params=self.search_params, limit=limit, with_payload=True, with_vector=with_vectors)
+        indices, values = sparse_query
+        prefetch_limit = max(HYBRID_PREFETCH_LIMIT, limit)
+        prefetch = [models.Prefetch(query=query_vector, filter=query_filter, params=self.search_params, limit=prefetch_limit)]
+        if indices:
+            prefetch.append(models.Prefetch(
+                query=models.SparseVector(indices=indices, values=values),
+                using=SPARSE_VECTOR_NAME,
+                filter=query_filter,
+                limit=prefetch_limit
+            ))
+        return models.QueryRequest(
+            prefetch=prefetch,
+            query=models.FusionQuery(fusion=models.Fusion.RRF),
+            filter=query_filter,
+            limit=limit,
+            with_payload=True,
+            with_vector=with_vectors
+        )
+
+    def search(self, query_vector: list, sparse_query: tuple = None, companies: list = None, year_range: tuple = None, limit: int = 5,
+               with_vectors: bool = False, filenames: list = None, levels: tuple = None) -> list:
+        return self.search_batch([{
+            "query_vector": query_vector, "sparse_query": sparse_query, "companies": companies, "year_range": year_range,
+            "limit": limit, "with_vectors": with_vectors, "filenames": filenames, "levels": levels
+        }])[0]
+
+    def search_batch(self, requests: list) -> list:
+        """Nhiều search (dict cùng tham số với search()) trong một round trip query_batch_points."""
+        responses = self.client.query_batch_points(
+            collection_name=self.collection_name,
+            requests=[self._query_request(**request) for request in requests]
+        )
+        for response in responses:
+            for point in response.points:
+                # Collection có sparse vector trả về dict theo tên: giữ dense vector (tên rỗng)
+                if isinstance(point.vector, dict):
+                    point.vector = point.vector.get("")
+        return [response.points for response in responses]
+
+
+class EmbeddedBackend:
+    """Index trong process (utils/vector_index.py) lưu ở EMBEDDED_INDEX_DIR/<collection>, không cần Qdrant server."""
+    name = "embedded"
+
+    def __init__(self, collection_name: str, dim: int, index_dir: str = EMBEDDED_INDEX_DIR):
+        self.collection_name = collection_name
+        collection_dir = os.path.join(index_dir, collection_name)
+        self.index = EmbeddedVectorIndex(collection_dir, dim)
+        # Manifest riêng: trạng thái nạp của embedded index độc lập với collection trên Qdrant
+        self.manifest_path = os.path.join(collection_dir, "manifest.json")
+        self.hybrid_enabled = False
+
+    def exists(self) -> bool:
+        return True
+
+    def ensure_collection(self) -> None:
+        # Sparse vector luôn được lưu cùng point nên hybrid chỉ phụ thuộc cấu hình
+        self.hybrid_enabled = HYBRID_SEARCH_ENABLED
+
+    def count(self) -> int:
+        return self.index.count()
+
+    def delete(self, ids: list) -> None:
+        self.index.delete(ids)
+
+    def upsert(self, points: list) -> None:
+        self.index.upsert(
+            [point["id"] for point in points],
+            [point["vector"] for point in points],
+            [point["payload"] for point in points],
+            [list(point["sparse"]) if self.hybrid_enabled and point.get("sparse") is not None else None for point in points]
+        )
+
+    def clear(self, migrate: bool = False) -> None:
+        self.index.clear()
+
+    def scroll(self, batch_size: int = 10_000):
+        for batch in self.index.iter_points(batch_size):
+            yield [{"id": point_id, "vector": vector, "sparse": sparse_vector, "payload": payload} for point_id, vector, payload, sparse_vector in batch]
+
+    def upload(self, batches, parallel: int = 1) -> None:
+        # Index ghi nối thêm tuần tự: mỗi batch là một lần append vectors.f32 + ops.jsonl
+        for points in batches:
+            self.upsert(points)
+
+    def build_index(self) -> dict:
+        return self.index.build_index()
+
+    def search(self, query_vector: list, sparse_query: tuple = None, companies: list = None, year_range: tuple = None, limit: int = 5,
+               with_vectors: bool = False, filenames: list = None, levels: tuple = None) -> list:
+        return self.search_batch([{
+            "query_vector": query_vector, "sparse_query": sparse_query, "companies": companies, "year_range": year_range,
+            "limit": limit, "with_vectors": with_vectors, "filenames": filenames, "levels": levels
+        }])[0]
+
+    def search_batch(self, requests: list) -> list:
+        return self.index.search_batch([
+            {
+                **request,
+                "sparse_query": request.get("sparse_query") if self.hybrid_enabled else None,
+                "prefetch_limit": max(HYBRID_PREFETCH_LIMIT, request.get("limit", 5))
+            }
+            for request in requests
+        ])
+
+
+def create_vector_backend(name: str = VECTOR_BACKEND, collection_name: str = "financial_docs", dim: int = 384, profile: str = QDRANT_COLLECTION_PROFILE):
+    """Tạo vector backend theo cấu hình VECTOR_BACKEND (qdrant | embedded)."""
+    if name == "qdrant":
+        return QdrantBackend(collection_name, profile)
+    if name == "embedded":
+        return EmbeddedBackend(collection_name, dim)
+    raise ValueError(f"Unsupported VECTOR_BACKEND: {name}")
@@ -272,34 +272,60 @@ def create_dashboard(data, visualization, timestamp, vis_list):
                 st.markdown("<p style='text-align: center; color: #888;'>Cannot format date column.</p>", unsafe_allow_html=True)
                 return
 
-            df = df.sort_values(x_col)
+            df = df.sort_values(["symbol", x_col] if "symbol" in df.columns else x_col)
 
             if st.session_state.get("show_debug", False):
                 st.write(f"Debug: Rendering line chart with x_col={x_col}, y_col={y_col}, additional_lines={additional_lines}")
             fig = go.Figure()
-            fig.add_trace(
-                go.Scatter(
-                    x=df[x_col],
-                    y=df[y_col],
-                    mode="lines+markers",
-                    name=y_col.replace('_', ' ').title(),
-                    line=dict(color='rgb(0, 123, 255)'),
-                    marker=dict(size=8)
-                )
-            )
-            colors = ['rgb(255, 99, 71)', 'rgb(75, 192, 192)', 'rgb(255, 205, 86)']
-            for idx, line_col in enumerate(additional_lines):
-                if line_col in df.columns:
+            if "symbol" in df.columns and df["symbol"].nunique() > 1:
+                # Dữ liệu multi-ticker: mỗi symbol một đường riêng
+                colors = ['rgb(0, 123, 255)', 'rgb(255, 99, 71)', 'rgb(75, 192, 192)', 'rgb(255, 205, 86)', 'rgb(153, 102, 255)']
+                for idx, (symbol, group) in enumerate(df.groupby("symbol", sort=False)):
+                    color = colors[idx % len(colors)]
                     fig.add_trace(
                         go.Scatter(
-                            x=df[x_col],
-                            y=df[line_col],
+                            x=group[x_col],
+                            y=group[y_col],
                             mode="lines",
-                            name=line_col.replace('_', ' ').title(),
-                            line=dict(color=colors[idx % len(colors)]),
-                            marker=dict(size=8)
+                            name=f"{symbol} {y_col.replace('_', ' ').title()}",
+                            line=dict(color=color)
                         )
                     )
+                    for line_col in additional_lines:
+                        if line_col in group.columns:
+                            fig.add_trace(
+                                go.Scatter(
+                                    x=group[x_col],
+                                    y=group[line_col],
+                                    mode="lines",
+                                    name=f"{symbol} {line_col.replace('_', ' ').title()}",
+                                    line=dict(color=color, dash="dash")
+                                )
+                            )
+            else:
+                fig.add_trace(
+                    go.Scatter(
+                        x=df[x_col],
+                        y=df[y_col],
+                        mode="lines+markers",
+                        name=y_col.replace('_', ' ').title(),
+                        line=dict(color='rgb(0, 123, 255)'),
+                        marker=dict(size=8)
+                    )
+                )
+                colors = ['rgb(255, 99, 71)', 'rgb(75, 192, 192)', 'rgb(255, 205, 86)']
+                for idx, line_col in enumerate(additional_lines):
+                    if line_col in df.columns:
+                        fig.add_trace(
+                            go.Scatter(
+                                x=df[x_col],
+                                y=df[line_col],
+                                mode="lines",
+                                name=line_col.replace('_', ' ').title(),
+                                line=dict(color=colors[idx % len(colors)]),
+                                marker=dict(size=8)
+                            )
+                        )
             fig.update_layout(
                 title=f"Line Chart of {y_col.replace('_', ' ').title()} over {x_col.replace('_', ' ').title()}",
                 xaxis_title=x_col.replace('_', ' ').title(),
@@ -0,0 +1,152 @@
+# utils/chunker.py
+import math
+import re
+
+from config.env import CHUNK_MAX_TOKENS, CHUNK_OVERLAP_TOKENS
+
+MIN_CHUNK_CHARS = 50
+LINE_RE = re.compile(r'[^\n]+')
+# Ranh giới câu: .!? theo sau là khoảng trắng; "3.5" hay "U.S." giữa câu không bị cắt
+SENTENCE_END_RE = re.compile(r'[.!?]+\s+')
+WORD_RE = re.compile(r'\S+')
+
+
+def is_table_line(line: str) -> bool:
+    """Dòng thuộc bảng: có '|' hoặc nhiều cột có độ dài từ gần như đều nhau (số liệu)."""
+    if '|' in line:
+        return True
+    words = line.split()
+    if len(words) <= 3:
+        return False
+    lengths = set()
+    for word in words:
+        lengths.add(len(word))
+        if len(lengths) >= 3:
+            return False
+    return True
+
+
+def make_token_counter(tokenizer=None):
+    """Hàm đếm token cho một list đoạn text.
+
+    Dùng tokenizer của embedding model (SentenceTransformer.tokenizer) nếu có; ngược lại ước lượng theo
+    số từ (WordPiece thường tách ~1.3 token mỗi từ).
+    """
+    if tokenizer is not None:
+        def count_tokens(texts: list) -> list:
+            if not texts:
+                return []
+            return [len(ids) for ids in tokenizer(texts, add_special_tokens=False)["input_ids"]]
+        return count_tokens
+
+    def approx_count_tokens(texts: list) -> list:
+        return [math.ceil(len(text.split()) * 1.3) for text in texts]
+    return approx_count_tokens
+
+
+def split_segments(text: str) -> list:
+    """Tách text thành các đoạn không được cắt ngang: một block bảng liên tiếp hoặc một câu.
+
+    Returns:
+        list: [(start, end, is_table)] theo offset trong text, đi qua text đúng một lần.
+    """
+    segments = []
+    table_start = table_end = None
+    for line in LINE_RE.finditer(text):
+        if is_table_line(line.group()):
+            if table_start is None:
+                table_start = line.start()
+            table_end = line.end()
+            continue
+        if table_start is not None:
+            segments.append((table_start, table_end, True))
+            table_start = None
+        line_text = line.group()
+        sentence_start = len(line_text) - len(line_text.lstrip())
+        for boundary in SENTENCE_END_RE.finditer(line_text):
+            # Câu gồm cả dấu kết thúc, không gồm khoảng trắng phía sau
+            sentence_end = boundary.start() + len(boundary.group().rstrip())
+            if sentence_end > sentence_start:
+                segments.append((line.start() + sentence_start, line.start() + sentence_end, False))
+            sentence_start = boundary.end()
+        sentence_end = len(line_text.rstrip())
+        if sentence_end > sentence_start:
+            segments.append((line.start() + sentence_start, line.start() + sentence_end, False))
+    if table_start is not None:
+        segments.append((table_start, table_end, True))
+    return segments
+
+
+def _split_oversized(text: str, start: int, end: int, is_table: bool, max_tokens: int, count_tokens) -> list:
+    """Đoạn dài hơn max_tokens: bảng cắt theo dòng, câu cắt theo từ."""
+    pattern = LINE_RE if is_table else WORD_RE
+    pieces = [(start + m.start(), start + m.end()) for m in pattern.finditer(text[start:end])]
+    counts = count_tokens([text[s:e] for s, e in pieces])
+    parts = []
+    part_start, part_end, part_tokens = None, None, 0
+    for (s, e), tokens in zip(pieces, counts):
+        if part_start is not None and part_tokens + tokens > max_tokens:
+            parts.append((part_start, part_end, is_table, part_tokens))
+            part_start, part_tokens = None, 0
+        if part_start is None:
+            part_start = s
+        part_end = e
+        part_tokens += tokens
+    if part_start is not None:
+        parts.append((part_start, part_end, is_table, part_tokens))
+    return parts
+
+
+def chunk_text(text: str, max_tokens: int = CHUNK_MAX_TOKENS, overlap_tokens: int = CHUNK_OVERLAP_TOKENS, count_tokens=None) -> list:
+    """Chia text thành các chunk tối đa max_tokens token, cắt ở ranh giới câu và giữ nguyên block bảng.
+
+    Các câu cuối của chunk trước (tổng không quá overlap_tokens) được lặp lại ở đầu chunk sau.
+
+    Args:
+        text (str): Text của cả tài liệu.
+        max_tokens (int): Số token tối đa mỗi chunk theo tokenizer của embedding model.
+        overlap_tokens (int): Số token tối đa lặp lại giữa hai chunk liên tiếp.
+        count_tokens (callable): Hàm từ make_token_counter; mặc định là bộ ước lượng.
+
+    Returns:
+        list: [(chunk, start, end)] với chunk == text[start:end].
+    """
+    count_tokens = count_tokens or make_token_counter()
+    raw_segments = split_segments(text)
+    counts = count_tokens([text[start:end] for start, end, _ in raw_segments])
+    segments = []
+    for (start, end, is_table), tokens in zip(raw_segments, counts):
+        if tokens > max_tokens:
+            segments.extend(_split_oversized(text, start, end, is_table, max_tokens, count_tokens))
+        else:
+            segments.append((start, end, is_table, tokens))
+
+    chunks = []
+    current = []
+    current_tokens = 0
+
+    def emit():
+        start, end = segments[current[0]][0], segments[current[-1]][1]
+        if end - start >= MIN_CHUNK_CHARS:
+            chunks.append((text[start:end], start, end))
+
+    for index, (_, _, _, tokens) in enumerate(segments):
+        if current and current_tokens + tokens > max_tokens:
+            emit()
+            # Overlap: lấy lại các câu cuối (không lấy bảng) vừa với overlap_tokens
+            overlap = []
+            overlap_total = 0
+            for previous in reversed(current):
+                _, _, previous_is_table, previous_tokens = segments[previous]
+                if previous_is_table or overlap_total + previous_tokens > overlap_tokens:
+                    break
+                overlap.insert(0, previous)
+                overlap_total += previous_tokens
+            if overlap_total + tokens > max_tokens:
+                overlap, overlap_total = [], 0
+            current, current_tokens = overlap, overlap_total
+        current.append(index)
+        current_tokens += tokens
+    if current:
+        emit()
+    return chunks
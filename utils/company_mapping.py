@@ -1,7 +1,7 @@
 import os
 import re
 from pathlib import Path
-from config.env import RAG_DATA_DIR
+from config.env import RAG_DATA_DIR, SQL_BACKEND, PARQUET_DIR
 from utils.logging import setup_logging
 
 logger = setup_logging()
@@ -49,6 +49,56 @@ def map_company_name(query_company: str, mapping: dict) -> str:
     logger.warning(f"No mapping found for company: {query_company}")
     return query_company
 
+def load_companies() -> dict:
+    """Đọc {symbol: name} từ bảng companies (PostgreSQL hoặc Parquet theo SQL_BACKEND). Lỗi thì trả về {}."""
+    try:
+        import pandas as pd
+        if SQL_BACKEND == "duckdb":
+            df = pd.read_parquet(os.path.join(PARQUET_DIR, "companies.parquet"), columns=["symbol", "name"])
+        else:
+            from sqlalchemy import text
+            from utils.db import get_engine
+            with get_engine("serving").connect() as conn:
+                df = pd.read_sql_query(text("SELECT symbol, name FROM companies"), conn)
+        return {str(row.symbol).upper(): row.name for row in df.itertuples() if row.name}
+    except Exception as e:
+        logger.warning(f"Could not load companies table, falling back to RAG_DATA_DIR mapping: {str(e)}")
+        return {}
+
+def _company_key(name: str) -> str:
+    key = re.sub(r"[^a-z0-9 ]", " ", normalize_company_name(name) or "")
+    key = re.sub(r"\b(the|co|company|group|holdings|plc)\b", " ", key)
+    return " ".join(key.split())
+
+def resolve_company_symbol(query_company: str, companies: dict) -> str:
+    """Tìm symbol trong bảng companies cho ticker hoặc tên công ty (ví dụ 'AAPL', 'apple', 'Apple Inc.')."""
+    if not query_company or not companies:
+        return None
+    if query_company.strip().upper() in companies:
+        return query_company.strip().upper()
+    query_key = _company_key(query_company)
+    if len(query_key) < 3:
+        return None
+    keys = {symbol: _company_key(name) for symbol, name in companies.items()}
+    for symbol, key in keys.items():
+        if key == query_key:
+            return symbol
+    for symbol, key in keys.items():
+        if re.search(rf"\b{re.escape(query_key)}\b", key) or (key and re.search(rf"\b{re.escape(key)}\b", query_key)):
+            return symbol
+    return None
+
+def canonical_company_name(query_company: str, companies: dict, mapping: dict = None) -> str:
+    """Tên công ty chuẩn dùng cho payload 'company' và filter MatchValue.
+
+    Ưu tiên tên trong bảng companies; không có thì dùng ánh xạ từ RAG_DATA_DIR như trước.
+    Ingest và query cùng gọi hàm này nên filter luôn khớp chính xác với payload.
+    """
+    symbol = resolve_company_symbol(query_company, companies)
+    if symbol:
+        return companies[symbol]
+    return map_company_name(query_company, mapping if mapping is not None else build_company_mapping())
+
 def check_mapping_integrity(qdrant_client, collection_name: str) -> bool:
     """Kiểm tra tính toàn vẹn: so sánh mapping với metadata Qdrant."""
     mapping = build_company_mapping()
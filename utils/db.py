@@ -0,0 +1,128 @@
+# utils/db.py
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+from sqlalchemy import create_engine
+from config.env import (
+    DATABASE_URL, DATABASE_REPLICA_URL, SQL_POOL_SIZE, SQL_MAX_OVERFLOW, SQL_POOL_TIMEOUT_S,
+    SQL_CONNECT_TIMEOUT_S, SQL_STATEMENT_TIMEOUT_MS, INGEST_POOL_SIZE, INGEST_STATEMENT_TIMEOUT_MS
+)
+from utils.logging import setup_logging
+from utils.validators import validate_database_url
+
+logger = setup_logging()
+
+# Cấu hình pool theo profile. serving: pool giới hạn, pre-ping, timeout ngắn.
+# ingest: ít connection, timeout dài, executemany theo batch cho upsert hàng loạt.
+ENGINE_PROFILES = {
+    "serving": {
+        "pool_size": SQL_POOL_SIZE,
+        "max_overflow": SQL_MAX_OVERFLOW,
+        "pool_timeout": SQL_POOL_TIMEOUT_S,
+        "pool_pre_ping": True,
+        "pool_recycle": 1800,
+        "connect_args": {
+            "connect_timeout": SQL_CONNECT_TIMEOUT_S,
+            "application_name": "finance_agent_serving",
+            "options": f"-c statement_timeout={SQL_STATEMENT_TIMEOUT_MS}",
+        },
+    },
+    "ingest": {
+        "pool_size": INGEST_POOL_SIZE,
+        "max_overflow": 0,
+        "pool_timeout": 300,
+        "pool_pre_ping": True,
+        "executemany_mode": "values_plus_batch",
+        "connect_args": {
+            "connect_timeout": 30,
+            "application_name": "finance_agent_ingest",
+            "options": f"-c statement_timeout={INGEST_STATEMENT_TIMEOUT_MS}",
+        },
+    },
+}
+SLOW_CHECKOUT_MS = 100
+WAIT_SAMPLES = 1000
+
+_engines = {}
+_engines_lock = threading.Lock()
+_pool_waits = {}
+_pool_waits_lock = threading.Lock()
+
+
+def get_engine(profile: str = "serving", read_only: bool = False):
+    """Engine dùng chung theo profile. read_only=True dùng DATABASE_REPLICA_URL nếu được cấu hình.
+
+    Args:
+        profile (str): "serving" hoặc "ingest".
+        read_only (bool): Định tuyến sang read replica (chỉ áp dụng khi có DATABASE_REPLICA_URL).
+
+    Returns:
+        Engine: SQLAlchemy engine đã được cache cho (profile, url).
+    """
+    if profile not in ENGINE_PROFILES:
+        raise ValueError(f"Unknown engine profile: {profile}")
+    use_replica = read_only and bool(DATABASE_REPLICA_URL)
+    url = DATABASE_REPLICA_URL if use_replica else DATABASE_URL
+    key = f"{profile}_replica" if use_replica else profile
+    with _engines_lock:
+        if key not in _engines:
+            validate_database_url(url)
+            _engines[key] = create_engine(url, **ENGINE_PROFILES[profile])
+            logger.info(f"Created '{key}' engine with pool_size={ENGINE_PROFILES[profile]['pool_size']}")
+        return _engines[key]
+
+
+def engine_key(engine) -> str:
+    for key, cached in _engines.items():
+        if cached is engine:
+            return key
+    return str(engine.url.host)
+
+
+@contextmanager
+def pool_checkout(engine):
+    """engine.connect() có đo thời gian chờ lấy connection từ pool."""
+    start = time.perf_counter()
+    conn = engine.connect()
+    wait_ms = (time.perf_counter() - start) * 1000
+    record_pool_wait(engine_key(engine), wait_ms)
+    try:
+        yield conn
+    finally:
+        conn.close()
+
+
+def record_pool_wait(key: str, wait_ms: float) -> None:
+    with _pool_waits_lock:
+        stats = _pool_waits.setdefault(key, {"checkouts": 0, "total_wait_ms": 0.0, "max_wait_ms": 0.0, "samples": deque(maxlen=WAIT_SAMPLES)})
+        stats["checkouts"] += 1
+        stats["total_wait_ms"] += wait_ms
+        stats["max_wait_ms"] = max(stats["max_wait_ms"], wait_ms)
+        stats["samples"].append(wait_ms)
+    if wait_ms > SLOW_CHECKOUT_MS:
+        logger.warning(f"Slow pool checkout on '{key}' engine: waited {wait_ms:.1f} ms")
+
+
+def get_pool_metrics() -> dict:
+    """Thời gian chờ checkout và trạng thái pool của từng engine."""
+    metrics = {}
+    with _pool_waits_lock:
+        for key, stats in _pool_waits.items():
+            samples = sorted(stats["samples"])
+            metrics[key] = {
+                "checkouts": stats["checkouts"],
+                "avg_wait_ms": round(stats["total_wait_ms"] / stats["checkouts"], 3),
+                "p95_wait_ms": round(samples[int(0.95 * (len(samples) - 1))], 3) if samples else 0.0,
+                "max_wait_ms": round(stats["max_wait_ms"], 3),
+            }
+    for key, engine in list(_engines.items()):
+        pool = engine.pool
+        metrics.setdefault(key, {"checkouts": 0, "avg_wait_ms": 0.0, "p95_wait_ms": 0.0, "max_wait_ms": 0.0})
+        metrics[key].update({
+            "pool_size": pool.size(),
+            "checked_out": pool.checkedout(),
+            "overflow": pool.overflow(),
+        })
+    return metrics
@@ -0,0 +1,110 @@
+# utils/diversify.py
+import zlib
+
+import numpy as np
+
+from utils.sparse import TOKEN_RE
+
+# MinHash trên shingle 5 từ: chunk OCR lặp lại boilerplate/bảng giữa các trang có Jaccard cao dù vector hơi khác
+MINHASH_PERMUTATIONS = 64
+SHINGLE_WORDS = 5
+MINHASH_PRIME = (1 << 31) - 1
+_rng = np.random.default_rng(20240601)
+_MINHASH_A = _rng.integers(1, MINHASH_PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64)
+_MINHASH_B = _rng.integers(0, MINHASH_PRIME, MINHASH_PERMUTATIONS, dtype=np.uint64)
+
+
+def minhash_signature(text: str) -> list:
+    """Chữ ký MinHash (MINHASH_PERMUTATIONS số nguyên) của text; text không có từ nào thì trả về []."""
+    words = TOKEN_RE.findall(text.lower())
+    if not words:
+        return []
+    shingles = {" ".join(words[i:i + SHINGLE_WORDS]) for i in range(max(1, len(words) - SHINGLE_WORDS + 1))}
+    # crc32 ổn định giữa các process, chữ ký tính lúc ingest dùng lại được lúc query
+    hashes = np.fromiter((zlib.crc32(shingle.encode("utf-8")) % MINHASH_PRIME for shingle in shingles), dtype=np.uint64, count=len(shingles))
+    permuted = (_MINHASH_A[:, None] * hashes[None, :] + _MINHASH_B[:, None]) % MINHASH_PRIME
+    return permuted.min(axis=1).tolist()
+
+
+def jaccard_estimate(a: list, b: list) -> float:
+    if not a or not b or len(a) != len(b):
+        return 0.0
+    return float(np.mean(np.asarray(a) == np.asarray(b)))
+
+
+def drop_near_duplicates(signatures: list, threshold: float) -> list:
+    """Vị trí các ứng viên được giữ (theo thứ tự hạng): bỏ ứng viên có Jaccard >= threshold với một ứng viên hạng cao hơn đã giữ."""
+    kept = []
+    for i, signature in enumerate(signatures):
+        if all(jaccard_estimate(signature, signatures[j]) < threshold for j in kept):
+            kept.append(i)
+    return kept
+
+
+def cap_per_group(groups: list, max_per_group: int, k: int) -> list:
+    """Vị trí các ứng viên (theo thứ tự hạng) với tối đa max_per_group ứng viên mỗi nhóm.
+
+    Ứng viên vượt giới hạn chỉ được thêm lại (theo hạng) khi không đủ k ứng viên, ví dụ khi filter chỉ khớp một tài liệu.
+    """
+    counts = {}
+    kept, overflow = [], []
+    for i, group in enumerate(groups):
+        counts[group] = counts.get(group, 0) + 1
+        (kept if counts[group] <= max_per_group else overflow).append(i)
+    return sorted(kept + overflow[:max(0, k - len(kept))])
+
+
+def mmr_select(query_vector, vectors, k: int, lambda_: float = 0.7, groups: list = None, max_per_group: int = 0) -> list:
+    """Maximal marginal relevance: lần lượt chọn ứng viên tối đa lambda * sim(query) - (1 - lambda) * max sim(đã chọn).
+
+    Có groups thì mỗi nhóm được chọn tối đa max_per_group ứng viên; ứng viên của nhóm đã đủ chỉ được chọn khi
+    không còn ứng viên nào khác (giống cap_per_group).
+
+    Returns:
+        list: Vị trí (trong vectors) của tối đa k ứng viên theo thứ tự được chọn.
+    """
+    vectors = np.asarray(vectors, dtype=np.float32)
+    if not len(vectors):
+        return []
+    vectors = vectors / np.maximum(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12)
+    query = np.asarray(query_vector, dtype=np.float32)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+    relevance = vectors @ query
+    similarity = vectors @ vectors.T
+    selected = []
+    counts = {}
+    # Độ tương đồng lớn nhất của mỗi ứng viên với tập đã chọn
+    redundancy = np.full(len(vectors), -np.inf, dtype=np.float32)
+    available = np.ones(len(vectors), dtype=bool)
+    for _ in range(min(k, len(vectors))):
+        eligible = available
+        if groups is not None and max_per_group > 0:
+            under_cap = available & np.array([counts.get(group, 0) < max_per_group for group in groups])
+            if under_cap.any():
+                eligible = under_cap
+        scores = lambda_ * relevance - (1 - lambda_) * (redundancy if selected else 0.0)
+        scores[~eligible] = -np.inf
+        best = int(np.argmax(scores))
+        selected.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+        if groups is not None:
+            counts[groups[best]] = counts.get(groups[best], 0) + 1
+    return selected
+
+
+def diversify(query_vector, vectors: list, signatures: list, k: int, lambda_: float = 0.7, duplicate_threshold: float = 0.8,
+              groups: list = None, max_per_group: int = 0) -> list:
+    """Vị trí của k ứng viên (đã xếp hạng) sau khi bỏ chunk gần trùng và chọn theo MMR.
+
+    Lọc trùng và MMR chạy trên toàn bộ ứng viên; giới hạn max_per_group ứng viên mỗi nhóm (groups, ví dụ filename)
+    được áp dụng trong lúc chọn nên không bỏ sót ứng viên dùng được trước khi lọc trùng.
+    Ứng viên thiếu vector (backend không trả về) thì giữ thứ tự hạng sau bước lọc trùng.
+    """
+    kept = drop_near_duplicates(signatures, duplicate_threshold)
+    kept_groups = [groups[i] for i in kept] if groups is not None else None
+    if any(vectors[i] is None for i in kept):
+        if kept_groups is not None and max_per_group > 0:
+            return [kept[i] for i in cap_per_group(kept_groups, max_per_group, k)][:k]
+        return kept[:k]
+    return [kept[i] for i in mmr_select(query_vector, [vectors[i] for i in kept], k, lambda_, kept_groups, max_per_group)]
@@ -0,0 +1,69 @@
+# utils/doc_summary.py
+import numpy as np
+
+from config.env import RAG_SECTION_CHUNKS
+from utils.rag_manifest import point_id
+
+# Payload chung của một file, chép sang point tóm tắt để filter company/năm như chunk
+SUMMARY_PAYLOAD_FIELDS = ("filename", "company", "symbol", "year", "report_type")
+
+
+class DocumentSummaries:
+    """Cộng dồn vector chunk của các file đang upsert để tạo vector tóm tắt theo tài liệu và theo section.
+
+    Vector tóm tắt là trung bình (chuẩn hóa) của các vector chunk; section là một cửa sổ section_chunks chunk
+    liên tiếp (chunker không nhận diện tiêu đề). Chỉ giữ tổng vector nên bộ nhớ không phụ thuộc số chunk.
+    """
+
+    def __init__(self, section_chunks: int = RAG_SECTION_CHUNKS):
+        self.section_chunks = section_chunks
+        self.files = {}
+
+    def add(self, points: list) -> None:
+        for point in points:
+            payload = point["payload"]
+            entry = self.files.setdefault(payload["filename"], {
+                "payload": {field: payload.get(field) for field in SUMMARY_PAYLOAD_FIELDS},
+                "sections": {},
+            })
+            section = payload["chunk_id"] // self.section_chunks
+            vector = np.asarray(point["vector"], dtype=np.float32)
+            if section in entry["sections"]:
+                total, first_chunk, last_chunk, pages = entry["sections"][section]
+                entry["sections"][section] = (total + vector, min(first_chunk, payload["chunk_id"]), max(last_chunk, payload["chunk_id"]),
+                                              pages | set(payload.get("page_extraction") or {}))
+            else:
+                entry["sections"][section] = (vector.copy(), payload["chunk_id"], payload["chunk_id"], set(payload.get("page_extraction") or {}))
+
+    def pop(self, filename: str, file_hash: str) -> list:
+        """Point tóm tắt (cùng dạng point của vector backend) của một file đã upsert xong; file không có chunk thì []."""
+        entry = self.files.pop(filename, None)
+        if entry is None:
+            return []
+        points = []
+        document_total = None
+        for section, (total, first_chunk, last_chunk, pages) in sorted(entry["sections"].items()):
+            document_total = total if document_total is None else document_total + total
+            points.append({
+                "id": point_id(file_hash, f"section:{section}"),
+                "vector": _normalize(total),
+                "sparse": None,
+                "payload": {
+                    **entry["payload"],
+                    "level": "section",
+                    "section": section,
+                    "chunk_range": [first_chunk, last_chunk],
+                    "pages": sorted(pages, key=int),
+                },
+            })
+        points.insert(0, {
+            "id": point_id(file_hash, "document"),
+            "vector": _normalize(document_total),
+            "sparse": None,
+            "payload": {**entry["payload"], "level": "document", "sections": len(entry["sections"])},
+        })
+        return points
+
+
+def _normalize(vector: np.ndarray) -> np.ndarray:
+    return vector / max(float(np.linalg.norm(vector)), 1e-12)
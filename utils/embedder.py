@@ -0,0 +1,190 @@
+# utils/embedder.py
+import json
+import os
+import re
+import time
+
+import numpy as np
+from config.env import EMBEDDING_RUNTIME, EMBEDDING_THREADS, EMBEDDING_ONNX_DIR, EMBEDDING_WARMUP
+from utils.logging import setup_logging
+
+logger = setup_logging()
+
+RUNTIMES = ("torch", "onnx", "onnx_int8")
+ONNX_FILE = "model.onnx"
+ONNX_INT8_FILE = "model_int8.onnx"
+EMBEDDER_CONFIG_FILE = "embedder.json"
+ONNX_OPSET = 14
+# Warm-up cả dạng một query ngắn lẫn một batch chunk dài để mọi kernel/allocator được khởi tạo trước request đầu tiên
+WARMUP_QUERY = "What was Apple's total revenue in fiscal 2024?"
+WARMUP_CHUNK = "Total net sales increased 2% compared to 2023, driven by higher Services revenue. " * 12
+
+
+def embedding_fingerprint(model_name: str, runtime: str) -> str:
+    """Tên dùng cho cache embedding và manifest: vector của runtime int8 khác (chút ít) với PyTorch nên không dùng chung."""
+    return model_name if runtime == "torch" else f"{model_name}@{runtime}"
+
+
+class TorchEmbedder:
+    """SentenceTransformer PyTorch (đường chạy mặc định)."""
+
+    def __init__(self, model_name: str, threads: int = EMBEDDING_THREADS):
+        import torch
+        from sentence_transformers import SentenceTransformer
+
+        if threads > 0:
+            torch.set_num_threads(threads)
+        self.model_name = model_name
+        self.runtime = "torch"
+        self.fingerprint = embedding_fingerprint(model_name, self.runtime)
+        self.model = SentenceTransformer(model_name)
+        self.tokenizer = self.model.tokenizer
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.model.get_sentence_embedding_dimension()
+
+    def encode(self, texts, batch_size: int = 32) -> np.ndarray:
+        return self.model.encode(texts, batch_size=batch_size, convert_to_numpy=True)
+
+
+def export_onnx(model_name: str, model_dir: str, quantized: bool) -> str:
+    """Export transformer của SentenceTransformer sang ONNX (một lần), tùy chọn quantize dynamic int8 cho weight.
+
+    Pooling và normalize của model được ghi vào embedder.json và chạy bằng NumPy lúc encode.
+
+    Returns:
+        str: Đường dẫn file .onnx cần nạp.
+    """
+    fp32_path = os.path.join(model_dir, ONNX_FILE)
+    int8_path = os.path.join(model_dir, ONNX_INT8_FILE)
+    if not os.path.exists(fp32_path):
+        import torch
+        from sentence_transformers import SentenceTransformer
+        from sentence_transformers.models import Normalize, Pooling
+
+        logger.info(f"Exporting {model_name} to ONNX in {model_dir}")
+        model = SentenceTransformer(model_name, device="cpu")
+        pooling = next((module for module in model if isinstance(module, Pooling)), None)
+        if pooling is None or not (pooling.pooling_mode_mean_tokens or pooling.pooling_mode_cls_token):
+            raise ValueError(f"Unsupported pooling for ONNX export of {model_name}, use EMBEDDING_RUNTIME=torch")
+        os.makedirs(model_dir, exist_ok=True)
+        transformer = model[0].auto_model.eval()
+        sample = model.tokenizer(["warm up"], return_tensors="pt")
+        input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+        tmp_path = fp32_path + ".tmp"
+        with torch.no_grad():
+            torch.onnx.export(
+                transformer,
+                ({name: sample[name] for name in input_names},),
+                tmp_path,
+                input_names=input_names,
+                output_names=["token_embeddings"],
+                dynamic_axes={**{name: {0: "batch", 1: "sequence"} for name in input_names}, "token_embeddings": {0: "batch", 1: "sequence"}},
+                opset_version=ONNX_OPSET
+            )
+        model.tokenizer.save_pretrained(model_dir)
+        with open(os.path.join(model_dir, EMBEDDER_CONFIG_FILE), "w") as file:
+            json.dump({
+                "model": model_name,
+                "dim": model.get_sentence_embedding_dimension(),
+                "max_seq_length": model.max_seq_length,
+                "pooling": "mean" if pooling.pooling_mode_mean_tokens else "cls",
+                "normalize": any(isinstance(module, Normalize) for module in model),
+            }, file)
+        # File .onnx chỉ xuất hiện khi tokenizer và embedder.json đã được ghi
+        os.replace(tmp_path, fp32_path)
+    if not quantized:
+        return fp32_path
+    if not os.path.exists(int8_path):
+        from onnxruntime.quantization import QuantType, quantize_dynamic
+
+        logger.info(f"Quantizing {fp32_path} to int8")
+        tmp_path = os.path.join(model_dir, "model_int8.tmp.onnx")
+        quantize_dynamic(fp32_path, tmp_path, weight_type=QuantType.QInt8)
+        os.replace(tmp_path, int8_path)
+    return int8_path
+
+
+class OnnxEmbedder:
+    """Transformer chạy trên ONNX Runtime (CPU), fp32 hoặc weight int8; pooling + normalize bằng NumPy."""
+
+    def __init__(self, model_name: str, quantized: bool = True, threads: int = EMBEDDING_THREADS, onnx_dir: str = EMBEDDING_ONNX_DIR):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.runtime = "onnx_int8" if quantized else "onnx"
+        self.fingerprint = embedding_fingerprint(model_name, self.runtime)
+        model_dir = os.path.join(onnx_dir, re.sub(r'[^\w.-]', '_', model_name))
+        model_path = export_onnx(model_name, model_dir, quantized)
+        with open(os.path.join(model_dir, EMBEDDER_CONFIG_FILE)) as file:
+            config = json.load(file)
+        self.dim = config["dim"]
+        self.max_seq_length = config["max_seq_length"]
+        self.pooling = config["pooling"]
+        self.normalize = config["normalize"]
+        self.tokenizer = AutoTokenizer.from_pretrained(model_dir)
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads > 0:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(model_path, options, providers=["CPUExecutionProvider"])
+        self.input_names = [model_input.name for model_input in self.session.get_inputs()]
+
+    def get_sentence_embedding_dimension(self) -> int:
+        return self.dim
+
+    def _encode_batch(self, texts: list) -> np.ndarray:
+        encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_seq_length, return_tensors="np")
+        token_embeddings = self.session.run(None, {name: encoded[name].astype(np.int64) for name in self.input_names})[0]
+        if self.pooling == "cls":
+            embeddings = token_embeddings[:, 0]
+        else:
+            mask = encoded["attention_mask"][..., None].astype(np.float32)
+            embeddings = (token_embeddings * mask).sum(axis=1) / np.maximum(mask.sum(axis=1), 1e-9)
+        if self.normalize:
+            embeddings = embeddings / np.maximum(np.linalg.norm(embeddings, axis=1, keepdims=True), 1e-12)
+        return embeddings.astype(np.float32)
+
+    def encode(self, texts, batch_size: int = 32) -> np.ndarray:
+        """Cùng giao diện với SentenceTransformer.encode: string -> (dim,), list -> (n, dim)."""
+        single = isinstance(texts, str)
+        texts = [texts] if single else list(texts)
+        embeddings = np.zeros((len(texts), self.dim), dtype=np.float32)
+        # Sắp theo độ dài để mỗi batch ít padding, ghi lại đúng thứ tự ban đầu
+        order = np.argsort([-len(text) for text in texts], kind="stable")
+        for start in range(0, len(texts), batch_size):
+            batch = order[start:start + batch_size]
+            embeddings[batch] = self._encode_batch([texts[i] for i in batch])
+        return embeddings[0] if single else embeddings
+
+
+def warm_up(embedder, batch_size: int = 32) -> float:
+    """Encode một query và một batch chunk để trả chi phí khởi tạo lười lúc startup thay vì ở request đầu tiên."""
+    start = time.perf_counter()
+    embedder.encode(WARMUP_QUERY)
+    embedder.encode([WARMUP_CHUNK] * batch_size, batch_size=batch_size)
+    return (time.perf_counter() - start) * 1000
+
+
+def load_embedder(model_name: str, runtime: str = EMBEDDING_RUNTIME, threads: int = EMBEDDING_THREADS, warmup: bool = EMBEDDING_WARMUP, warmup_batch_size: int = 32):
+    """Tạo embedder theo EMBEDDING_RUNTIME (torch | onnx | onnx_int8) và warm-up nếu bật.
+
+    Runtime ONNX tự export (và quantize) model ở lần chạy đầu vào EMBEDDING_ONNX_DIR; cần onnxruntime,
+    và torch/sentence-transformers cho bước export.
+    """
+    if runtime not in RUNTIMES:
+        raise ValueError(f"Unsupported EMBEDDING_RUNTIME: {runtime}. Available: {list(RUNTIMES)}")
+    start = time.perf_counter()
+    if runtime == "torch":
+        embedder = TorchEmbedder(model_name, threads)
+    else:
+        embedder = OnnxEmbedder(model_name, quantized=runtime == "onnx_int8", threads=threads)
+    load_ms = (time.perf_counter() - start) * 1000
+    if warmup:
+        logger.info(f"Embedding model {embedder.fingerprint} loaded in {load_ms:.0f} ms, warm-up {warm_up(embedder, warmup_batch_size):.0f} ms")
+    else:
+        logger.info(f"Embedding model {embedder.fingerprint} loaded in {load_ms:.0f} ms")
+    return embedder
@@ -0,0 +1,166 @@
+# utils/embedding_cache.py
+import hashlib
+import os
+import re
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: không khóa được giữa các process, chỉ chạy một process ghi
+    fcntl = None
+
+import numpy as np
+from config.env import EMBEDDING_CACHE_DIR, QUERY_CACHE_SIZE
+from utils.logging import setup_logging
+
+logger = setup_logging()
+
+KEY_BYTES = 16
+ENTRIES_FILE = "entries.bin"
+LOCK_FILE = "LOCK"
+# Định dạng cũ (key và vector ở hai file riêng), bị xóa khi mở cache
+LEGACY_FILES = ("vectors.f32", "keys.bin")
+
+
+def normalize_text(text: str) -> str:
+    return " ".join(text.split())
+
+
+class EmbeddingCache:
+    """Cache embedding theo (model, hash của text đã chuẩn hóa).
+
+    Trên đĩa: entries.bin gồm các record kích thước cố định (key 16 byte + vector float32), chỉ ghi nối thêm
+    và đọc qua memmap. Key và vector nằm trong cùng một record nên không thể lệch nhau; mỗi batch được ghi
+    bằng một lần write dưới flock trên LOCK, nên nhiều process nạp cùng lúc không ghi xen kẽ. Reader bỏ qua
+    record cuối dở dang. Query dùng thêm một LRU trong bộ nhớ.
+    """
+
+    def __init__(self, model_name: str, dim: int, cache_dir: str = EMBEDDING_CACHE_DIR, query_cache_size: int = QUERY_CACHE_SIZE):
+        self.model_name = model_name
+        self.dim = dim
+        self.store_dir = os.path.join(cache_dir, re.sub(r'[^\w.-]', '_', model_name))
+        os.makedirs(self.store_dir, exist_ok=True)
+        for name in LEGACY_FILES:
+            if os.path.exists(os.path.join(self.store_dir, name)):
+                os.remove(os.path.join(self.store_dir, name))
+        self.entries_path = os.path.join(self.store_dir, ENTRIES_FILE)
+        self.record_dtype = np.dtype([("key", f"V{KEY_BYTES}"), ("vector", np.float32, (dim,))])
+        self.query_cache_size = query_cache_size
+        self.query_cache = OrderedDict()
+        self.index = {}
+        self.entries = None
+        self.rows = 0
+        self.counters = {"chunk_hits": 0, "chunk_misses": 0, "query_hits": 0, "query_misses": 0}
+        self._lock = threading.Lock()
+        with self._lock:
+            self._reload()
+
+    def key(self, text: str) -> bytes:
+        return hashlib.sha256(f"{self.model_name}\0{normalize_text(text)}".encode("utf-8")).digest()[:KEY_BYTES]
+
+    def _reload(self) -> None:
+        """Đọc các record mới được ghi thêm (bởi process này hoặc process khác) và map lại entries.bin."""
+        if not os.path.exists(self.entries_path):
+            return
+        # Bỏ record cuối dở dang nếu process khác đang ghi giữa chừng
+        rows = os.path.getsize(self.entries_path) // self.record_dtype.itemsize
+        if rows <= self.rows:
+            return
+        self.entries = np.memmap(self.entries_path, dtype=self.record_dtype, mode="r", shape=(rows,))
+        for row, key in enumerate(self.entries["key"][self.rows:rows], start=self.rows):
+            self.index.setdefault(key.tobytes(), row)
+        self.rows = rows
+
+    def _lookup(self, keys: list) -> list:
+        rows = [self.index.get(key) for key in keys]
+        if any(row is None for row in rows):
+            self._reload()
+            rows = [self.index.get(key) for key in keys]
+        return [np.array(self.entries["vector"][row]) if row is not None else None for row in rows]
+
+    @contextmanager
+    def _file_lock(self):
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.store_dir, LOCK_FILE), "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _append(self, keys: list, vectors: np.ndarray) -> None:
+        with self._file_lock():
+            # Process khác có thể vừa ghi cùng text: chỉ ghi key chưa có
+            self._reload()
+            new = {}
+            for key, vector in zip(keys, vectors):
+                if key not in self.index:
+                    new.setdefault(key, vector)
+            if not new:
+                return
+            records = np.empty(len(new), dtype=self.record_dtype)
+            records["key"] = [np.void(key) for key in new]
+            records["vector"] = np.asarray(list(new.values()), dtype=np.float32)
+            with open(self.entries_path, "ab") as file:
+                file.write(records.tobytes())
+            self._reload()
+
+    def encode(self, texts: list, encode_fn) -> np.ndarray:
+        """Embedding cho một batch chunk: lấy từ cache, chỉ encode (một lần gọi) các text chưa có.
+
+        Args:
+            texts (list): Các đoạn text.
+            encode_fn (callable): Hàm encode list text -> mảng (n, dim), ví dụ model.encode.
+
+        Returns:
+            np.ndarray: Mảng float32 (len(texts), dim) theo đúng thứ tự texts.
+        """
+        keys = [self.key(text) for text in texts]
+        with self._lock:
+            cached = self._lookup(keys)
+        missing = [i for i, vector in enumerate(cached) if vector is None]
+        if missing:
+            encoded = np.asarray(encode_fn([texts[i] for i in missing]), dtype=np.float32)
+            for i, vector in zip(missing, encoded):
+                cached[i] = vector
+            with self._lock:
+                self._append([keys[i] for i in missing], encoded)
+        with self._lock:
+            self.counters["chunk_hits"] += len(texts) - len(missing)
+            self.counters["chunk_misses"] += len(missing)
+        return np.stack(cached) if cached else np.zeros((0, self.dim), dtype=np.float32)
+
+    def encode_query(self, query: str, encode_fn) -> np.ndarray:
+        """Embedding cho một query qua LRU trong bộ nhớ; encode_fn nhận một string."""
+        key = self.key(query)
+        with self._lock:
+            vector = self.query_cache.get(key)
+            if vector is not None:
+                self.query_cache.move_to_end(key)
+                self.counters["query_hits"] += 1
+                return vector
+        vector = np.asarray(encode_fn(query), dtype=np.float32)
+        with self._lock:
+            self.counters["query_misses"] += 1
+            self.query_cache[key] = vector
+            self.query_cache.move_to_end(key)
+            while len(self.query_cache) > self.query_cache_size:
+                self.query_cache.popitem(last=False)
+        return vector
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+            stored = len(self.index)
+        chunk_total = counters["chunk_hits"] + counters["chunk_misses"]
+        query_total = counters["query_hits"] + counters["query_misses"]
+        return {
+            **counters,
+            "chunk_hit_rate": round(counters["chunk_hits"] / chunk_total, 4) if chunk_total else 0.0,
+            "query_hit_rate": round(counters["query_hits"] / query_total, 4) if query_total else 0.0,
+            "stored_vectors": stored,
+        }
@@ -0,0 +1,231 @@
+# utils/financial_facts.py
+import os
+import re
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: không khóa được giữa các process, chỉ chạy một process ghi
+    fcntl = None
+
+from config.env import SQL_BACKEND, PARQUET_DIR
+from utils.logging import setup_logging
+
+logger = setup_logging()
+
+FACTS_TABLE = "financial_facts"
+FACT_COLUMNS = ["company", "symbol", "metric", "fiscal_year", "value", "unit", "filename", "point_id"]
+
+# Chỉ số tài chính kèm năm (ví dụ: "Net revenue FY 2022: $29,310"), trích xuất một lần lúc ingest
+FINANCIAL_METRICS_PATTERN = re.compile(r'(Net revenue|Net income|Operating expenses|Diluted.*earnings per share|Total volume|Payments volume|Transactions processed)\s*(FY\s*\d{4})?\s*[:=]?\s*\$?([\d,.]+[TBM]?|\d+\.\d+[TBM]?)', re.IGNORECASE)
+METRIC_LABELS = {
+    "net_revenue": "Net revenue",
+    "net_income": "Net income",
+    "operating_expenses": "Operating expenses",
+    "diluted_eps": "Diluted earnings per share",
+    "total_volume": "Total volume",
+    "payments_volume": "Payments volume",
+    "transactions_processed": "Transactions processed",
+}
+# Nhận diện chỉ số trong câu hỏi người dùng (nhiều cách gọi hơn so với lúc trích xuất)
+METRIC_QUERY_PATTERNS = [
+    ("diluted_eps", re.compile(r"\b(diluted\b.*\bearnings per share|diluted eps|eps)\b", re.IGNORECASE)),
+    ("net_revenue", re.compile(r"\b(net revenues?|revenues?|net sales|doanh thu)\b", re.IGNORECASE)),
+    ("net_income", re.compile(r"\b(net income|net profit|net earnings|lợi nhuận ròng)\b", re.IGNORECASE)),
+    ("operating_expenses", re.compile(r"\b(operating expenses|opex|chi phí hoạt động)\b", re.IGNORECASE)),
+    ("payments_volume", re.compile(r"\bpayments? volume\b", re.IGNORECASE)),
+    ("total_volume", re.compile(r"\btotal volume\b", re.IGNORECASE)),
+    ("transactions_processed", re.compile(r"\btransactions processed\b", re.IGNORECASE)),
+]
+
+# Câu hỏi cần giải thích/phân tích (không chỉ hỏi một con số): facts chỉ bổ sung cho kết quả vector search
+QUALITATIVE_QUERY_PATTERN = re.compile(
+    r"\b(why|how(?! much| many)|explain|reasons?|drivers?|drove|caused?|because|impact|affect(ed)?|trends?|declined?|decrease[sd]?"
+    r"|increase[sd]?|grow(th)?|compare[sd]?|comparison|versus|vs|outlook|guidance|risks?|discuss|describe|summari[sz]e|analy[sz]e"
+    r"|breakdown|segments?|factors?|tại sao|vì sao|giải thích|so sánh|phân tích)\b",
+    re.IGNORECASE
+)
+
+
+def metric_key(label: str) -> str:
+    label = label.lower()
+    if label.startswith("diluted"):
+        return "diluted_eps"
+    return re.sub(r"\s+", "_", label.strip())
+
+
+def parse_value(raw: str) -> tuple:
+    """"29,310" -> (29310.0, None), "1.2B" -> (1.2, "B"). Không phải số thì trả về (None, None)."""
+    unit = raw[-1].upper() if raw and raw[-1] in "TBMtbm" else None
+    number = (raw[:-1] if unit else raw).replace(",", "").rstrip(".")
+    try:
+        return float(number), unit
+    except ValueError:
+        return None, None
+
+
+def extract_facts(text: str) -> list:
+    """Các chỉ số tài chính trong một chunk: [{"metric", "fiscal_year", "value", "unit"}] (fiscal_year None nếu không ghi FY)."""
+    facts = []
+    for label, year, raw_value in FINANCIAL_METRICS_PATTERN.findall(text):
+        value, unit = parse_value(raw_value)
+        if value is None:
+            continue
+        year_match = re.search(r"\d{4}", year)
+        facts.append({
+            "metric": metric_key(label),
+            "fiscal_year": int(year_match.group()) if year_match else None,
+            "value": value,
+            "unit": unit,
+        })
+    return facts
+
+
+def format_value(fact: dict) -> str:
+    value = fact["value"]
+    text = str(int(value)) if float(value).is_integer() else f"{value:g}"
+    return text + (fact.get("unit") or "")
+
+
+def format_facts(facts: list) -> str:
+    """"FY 2022: Net revenue: 29310, Net income: 1200; Unknown Year: ..." theo thứ tự xuất hiện."""
+    by_year = {}
+    for fact in facts:
+        year = f"FY {fact['fiscal_year']}" if fact.get("fiscal_year") else "Unknown Year"
+        by_year.setdefault(year, []).append(f"{METRIC_LABELS.get(fact['metric'], fact['metric'])}: {format_value(fact)}")
+    return "; ".join(f"{year}: {', '.join(entries)}" for year, entries in by_year.items())
+
+
+def prepare_rag_summary(rag_documents: list, config: dict) -> str:
+    """Tóm tắt tài liệu RAG theo công ty từ facts đã trích xuất lúc ingest (payload "facts").
+
+    Point nạp trước khi có facts store không có "facts" trong payload: trích xuất tại chỗ như trước.
+    """
+    if not rag_documents or not all(isinstance(doc, dict) and 'document' in doc and 'filename' in doc and 'company' in doc for doc in rag_documents):
+        return config['formatting']['rag']['empty_message']['vi']
+
+    rag_by_company = {}
+    for doc in rag_documents:
+        facts = doc.get("facts")
+        if facts is None:
+            facts = extract_facts(doc['document'])
+        summary = format_facts(facts)
+        # Nếu không tìm thấy chỉ số, lấy tối đa 1000 ký tự
+        if not summary:
+            content = doc['document']
+            summary = content[:1000] + ("..." if len(content) > 1000 else "")
+        rag_by_company.setdefault(doc['company'], []).append(f"{doc['company']}: {summary} from {doc['filename']}")
+
+    return "\n".join(f"{company}: " + "; ".join(entries) for company, entries in rag_by_company.items())
+
+
+def detect_metric(query: str) -> str:
+    """Chỉ số tài chính được hỏi trong query (key của METRIC_LABELS) hoặc None."""
+    for metric, pattern in METRIC_QUERY_PATTERNS:
+        if pattern.search(query):
+            return metric
+    return None
+
+
+def is_value_lookup(query: str) -> bool:
+    """Query chỉ hỏi giá trị của một chỉ số ("Apple net income 2023"), không hỏi nguyên nhân/so sánh/diễn biến."""
+    return detect_metric(query) is not None and not QUALITATIVE_QUERY_PATTERN.search(query)
+
+
+def facts_cover(rows: list, companies: list, year_range: tuple = None) -> bool:
+    """Mọi công ty đều có facts cho năm được hỏi (mọi năm trong year_range đủ hai đầu), hoặc cho ít nhất một năm nếu không hỏi năm cụ thể.
+
+    Facts không ghi FY không được tính: không biết chúng thuộc năm nào.
+    """
+    wanted = None
+    if year_range is not None and None not in year_range and year_range[0] <= year_range[1]:
+        wanted = set(range(year_range[0], year_range[1] + 1))
+    for company in companies:
+        years = {row["fiscal_year"] for row in rows if row["company"] == company and row["fiscal_year"] is not None}
+        if not (wanted <= years if wanted is not None else years):
+            return False
+    return True
+
+
+def fact_rows(facts: list, company: str, symbol: str, filename: str, point_id: str) -> list:
+    return [{"company": company, "symbol": symbol, "filename": filename, "point_id": point_id, **fact} for fact in facts]
+
+
+@contextmanager
+def _file_lock(path: str):
+    """Khóa độc quyền giữa các process (nhiều worker ingest) quanh read-modify-write của một file."""
+    if fcntl is None:
+        yield
+        return
+    os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+    with open(path + ".lock", "w") as lock_file:
+        fcntl.flock(lock_file, fcntl.LOCK_EX)
+        try:
+            yield
+        finally:
+            fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+
+def save_file_facts(filenames: list, rows: list) -> None:
+    """Thay toàn bộ facts của các file trong filenames bằng rows (file bị xóa: rows rỗng).
+
+    Ghi vào bảng financial_facts (PostgreSQL) hoặc financial_facts.parquet (DuckDB) theo SQL_BACKEND; với DuckDB,
+    đọc-sửa-ghi file parquet được khóa để các worker ingest chạy song song không ghi đè facts của nhau.
+    """
+    if not filenames and not rows:
+        return
+    import pandas as pd
+
+    if SQL_BACKEND == "duckdb":
+        from tools.sql_backends import write_parquet_table
+
+        parquet_file = os.path.join(PARQUET_DIR, f"{FACTS_TABLE}.parquet")
+        with _file_lock(parquet_file):
+            df = pd.read_parquet(parquet_file) if os.path.exists(parquet_file) else pd.DataFrame(columns=FACT_COLUMNS)
+            df = df[~df["filename"].isin(filenames)]
+            if rows:
+                df = pd.concat([df, pd.DataFrame(rows, columns=FACT_COLUMNS)], ignore_index=True)
+            df["fiscal_year"] = df["fiscal_year"].astype("Int64")
+            write_parquet_table(df, FACTS_TABLE, PARQUET_DIR)
+        return
+
+    from sqlalchemy import text
+    from utils.db import get_engine
+
+    with get_engine("ingest").begin() as conn:
+        if filenames:
+            conn.execute(text(f"DELETE FROM {FACTS_TABLE} WHERE filename = ANY(:filenames)"), {"filenames": list(filenames)})
+        if rows:
+            conn.execute(
+                text(f"INSERT INTO {FACTS_TABLE} ({', '.join(FACT_COLUMNS)}) VALUES ({', '.join(':' + column for column in FACT_COLUMNS)})"),
+                rows
+            )
+
+
+def lookup_facts(sql_backend, companies: list, metric: str, year_range: tuple = None, limit: int = 20) -> list:
+    """Tra facts theo (company, metric, fiscal_year) qua index idx_financial_facts_lookup.
+
+    Args:
+        sql_backend: PostgresBackend/DuckDBBackend (tools/sql_backends.py).
+        companies (list): Tên công ty chuẩn (cùng giá trị với payload company).
+        metric (str): Key trong METRIC_LABELS.
+        year_range (tuple): (gte, lte), một đầu có thể None.
+
+    Returns:
+        list: Các dict cột FACT_COLUMNS, năm mới nhất trước.
+    """
+    conditions = ["company = ANY(:companies)", "metric = :metric"]
+    params = {"companies": list(companies), "metric": metric}
+    if year_range is not None:
+        if year_range[0] is not None:
+            conditions.append("fiscal_year >= :start_year")
+            params["start_year"] = year_range[0]
+        if year_range[1] is not None:
+            conditions.append("fiscal_year <= :end_year")
+            params["end_year"] = year_range[1]
+    query = (
+        f"SELECT DISTINCT company, symbol, metric, fiscal_year, value, unit, filename FROM {FACTS_TABLE} "
+        f"WHERE {' AND '.join(conditions)} ORDER BY fiscal_year DESC NULLS LAST LIMIT {int(limit)}"
+    )
+    df = sql_backend.query(query, params=params)
+    return df.astype(object).where(df.notna(), None).to_dict(orient="records")
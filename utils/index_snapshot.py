@@ -0,0 +1,187 @@
+# utils/index_snapshot.py
+import hashlib
+import io
+import json
+import os
+import struct
+import tempfile
+import time
+import zipfile
+
+import numpy as np
+
+from utils.financial_facts import fact_rows
+from utils.logging import setup_logging
+from utils.rag_manifest import RagManifest
+
+logger = setup_logging()
+
+# Snapshot là một file zip:
+#   vectors.f32   float32 (count, dim) theo thứ tự row, lưu không nén (ZIP_STORED) để memmap thẳng từ file zip
+#   points.jsonl  {"id", "payload", "sparse"} mỗi dòng một row, cùng thứ tự với vectors.f32 (nén deflate)
+#   snapshot.json phiên bản định dạng, model fingerprint, settings + danh sách file nguồn (hash, point_ids) của manifest, sha256 từng member
+SNAPSHOT_FORMAT = "financial-rag-snapshot"
+SNAPSHOT_VERSION = 1
+META_MEMBER = "snapshot.json"
+VECTORS_MEMBER = "vectors.f32"
+POINTS_MEMBER = "points.jsonl"
+HASH_BLOCK_BYTES = 1 << 20
+# Local file header của zip: 30 byte cố định, độ dài tên ở offset 26, độ dài extra field ở offset 28
+ZIP_LOCAL_HEADER = struct.Struct("<4s2B4HL2L2H")
+
+
+def export_snapshot(backend, output_path: str, batch_size: int = 10_000) -> dict:
+    """Ghi toàn bộ point của backend (kèm manifest nạp tài liệu của nó) ra một snapshot.
+
+    Args:
+        backend: QdrantBackend/EmbeddedBackend (tools/vector_backends.py).
+        output_path (str): File .zip đích; ghi qua file tạm + os.replace.
+
+    Returns:
+        dict: Nội dung snapshot.json.
+    """
+    if not os.path.exists(backend.manifest_path):
+        raise ValueError(f"No RAG manifest at {backend.manifest_path}, run scripts/populate_rag.py before exporting")
+    with open(backend.manifest_path) as file:
+        rag_manifest = json.load(file)
+
+    output_dir = os.path.dirname(os.path.abspath(output_path))
+    os.makedirs(output_dir, exist_ok=True)
+    tmp_path = f"{output_path}.tmp"
+    count, dim = 0, None
+    vectors_hash = hashlib.sha256()
+    # zipfile chỉ ghi được một member mỗi lúc: vector stream thẳng vào zip, payload qua file tạm
+    with tempfile.NamedTemporaryFile("w+b", dir=output_dir, suffix=".points.jsonl") as points_file:
+        with zipfile.ZipFile(tmp_path, "w", allowZip64=True) as archive:
+            with archive.open(zipfile.ZipInfo(VECTORS_MEMBER), "w", force_zip64=True) as vectors_member:
+                for points in backend.scroll(batch_size):
+                    vectors = np.ascontiguousarray(np.stack([np.asarray(point["vector"], dtype=np.float32) for point in points]))
+                    dim = dim or vectors.shape[1]
+                    if vectors.shape[1] != dim:
+                        raise ValueError(f"Inconsistent vector dimension in {backend.collection_name}: {vectors.shape[1]} != {dim}")
+                    data = vectors.tobytes()
+                    vectors_member.write(data)
+                    vectors_hash.update(data)
+                    points_file.write("".join(
+                        json.dumps({"id": point["id"], "payload": point["payload"], "sparse": _sparse_list(point.get("sparse"))}, ensure_ascii=False) + "\n"
+                        for point in points
+                    ).encode("utf-8"))
+                    count += len(points)
+            points_file.flush()
+            archive.write(points_file.name, POINTS_MEMBER, compress_type=zipfile.ZIP_DEFLATED)
+            meta = {
+                "format": SNAPSHOT_FORMAT,
+                "version": SNAPSHOT_VERSION,
+                "created_at": int(time.time()),
+                "backend": backend.name,
+                "collection": backend.collection_name,
+                "count": count,
+                "dim": dim,
+                "dtype": "float32",
+                "model": rag_manifest.get("settings", {}).get("model"),
+                "settings": rag_manifest.get("settings", {}),
+                "files": rag_manifest.get("files", {}),
+                "checksums": {VECTORS_MEMBER: vectors_hash.hexdigest(), POINTS_MEMBER: _file_sha256(points_file.name)},
+            }
+            archive.writestr(META_MEMBER, json.dumps(meta, ensure_ascii=False), compress_type=zipfile.ZIP_DEFLATED)
+    os.replace(tmp_path, output_path)
+    logger.info(f"Exported {count} points ({len(meta['files'])} files, model {meta['model']}) from {backend.name} to {output_path}")
+    return meta
+
+
+def open_snapshot(path: str) -> tuple:
+    """(snapshot.json, vectors) với vectors là np.memmap (count, dim) đọc thẳng từ member không nén trong file zip."""
+    with zipfile.ZipFile(path) as archive:
+        meta = json.loads(archive.read(META_MEMBER))
+        if meta.get("format") != SNAPSHOT_FORMAT:
+            raise ValueError(f"{path} is not a RAG index snapshot")
+        if meta.get("version") != SNAPSHOT_VERSION:
+            raise ValueError(f"Unsupported snapshot version {meta.get('version')} (expected {SNAPSHOT_VERSION})")
+        info = archive.getinfo(VECTORS_MEMBER)
+        if info.compress_type != zipfile.ZIP_STORED:
+            raise ValueError(f"{VECTORS_MEMBER} in {path} is compressed and cannot be memory-mapped")
+    if not meta["count"]:
+        return meta, np.zeros((0, meta["dim"] or 0), dtype=np.float32)
+    with open(path, "rb") as file:
+        file.seek(info.header_offset)
+        header = ZIP_LOCAL_HEADER.unpack(file.read(ZIP_LOCAL_HEADER.size))
+    offset = info.header_offset + ZIP_LOCAL_HEADER.size + header[-2] + header[-1]
+    vectors = np.memmap(path, dtype=np.float32, mode="r", offset=offset, shape=(meta["count"], meta["dim"]))
+    return meta, vectors
+
+
+def verify_snapshot(path: str, meta: dict) -> None:
+    """So sha256 của vectors.f32 và points.jsonl với snapshot.json (file hỏng hoặc copy dở dang)."""
+    with zipfile.ZipFile(path) as archive:
+        for member, expected in meta["checksums"].items():
+            digest = hashlib.sha256()
+            with archive.open(member) as file:
+                for block in iter(lambda: file.read(HASH_BLOCK_BYTES), b""):
+                    digest.update(block)
+            if digest.hexdigest() != expected:
+                raise ValueError(f"Checksum mismatch for {member} in {path}")
+
+
+def import_snapshot(path: str, backend, expected_model: str = None, replace: bool = False, batch_size: int = 10_000, migrate: bool = False) -> dict:
+    """Bulk upload snapshot vào backend rồi ghi manifest nạp tài liệu tương ứng.
+
+    Sau khi import, populate_rag.py chỉ nạp các file khác với lúc export.
+
+    Args:
+        expected_model (str): Model fingerprint của node này; khác với snapshot thì vector không dùng được cho query.
+        replace (bool): Xóa collection đích nếu đã có dữ liệu (mặc định báo lỗi).
+        migrate (bool): Khi replace, cho phép xóa collection Qdrant thường tên trùng alias để tạo alias.
+
+    Returns:
+        dict: {"meta": snapshot.json, "points": số point, "facts": các row financial_facts dựng lại từ payload}.
+    """
+    meta, vectors = open_snapshot(path)
+    if expected_model is not None and meta["model"] != expected_model:
+        raise ValueError(f"Snapshot was built with embedding model {meta['model']}, this node uses {expected_model}")
+    verify_snapshot(path, meta)
+
+    backend.ensure_collection()
+    if backend.count():
+        if not replace:
+            raise ValueError(f"{backend.name} collection {backend.collection_name} is not empty, pass --replace to overwrite it")
+        backend.clear(migrate=migrate)
+        backend.ensure_collection()
+
+    facts = []
+
+    def batches():
+        with zipfile.ZipFile(path) as archive, archive.open(POINTS_MEMBER) as file:
+            batch = []
+            for row, line in enumerate(io.TextIOWrapper(file, encoding="utf-8")):
+                point = json.loads(line)
+                payload = point["payload"]
+                if payload.get("facts"):
+                    facts.extend(fact_rows(payload["facts"], payload.get("company"), payload.get("symbol"), payload.get("filename"), point["id"]))
+                batch.append({"id": point["id"], "vector": vectors[row], "sparse": point.get("sparse"), "payload": payload})
+                if len(batch) >= batch_size:
+                    yield batch
+                    batch = []
+            if batch:
+                yield batch
+
+    backend.upload(batches())
+    manifest = RagManifest(path=backend.manifest_path, settings=meta["settings"])
+    manifest.files = meta["files"]
+    manifest.save()
+    logger.info(f"Imported {meta['count']} points ({len(meta['files'])} files) into {backend.name} collection {backend.collection_name}")
+    return {"meta": meta, "points": meta["count"], "facts": facts}
+
+
+def _sparse_list(sparse_vector):
+    if sparse_vector is None:
+        return None
+    indices, values = sparse_vector
+    return [list(indices), list(values)]
+
+
+def _file_sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_BYTES), b""):
+            digest.update(block)
+    return digest.hexdigest()
@@ -0,0 +1,218 @@
+# utils/ingest_jobs.py
+import hashlib
+import json
+import os
+import socket
+import sqlite3
+import time
+from contextlib import contextmanager
+
+from config.env import INGEST_JOB_LEASE_S, INGEST_JOB_MAX_ATTEMPTS
+from utils.logging import setup_logging
+
+logger = setup_logging()
+
+# stage: pending | extracted | chunked | embedded | indexed; checkpoint của stage được lưu trong ingest_checkpoints tới khi file indexed
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS ingest_jobs (
+    filename TEXT PRIMARY KEY,
+    file_hash TEXT NOT NULL,
+    settings_key TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    worker TEXT,
+    lease_until REAL,
+    attempts INTEGER NOT NULL DEFAULT 0,
+    error TEXT,
+    updated_at REAL NOT NULL
+);
+CREATE TABLE IF NOT EXISTS ingest_checkpoints (
+    filename TEXT NOT NULL,
+    stage TEXT NOT NULL,
+    data BLOB NOT NULL,
+    PRIMARY KEY (filename, stage)
+);
+"""
+
+
+def ingest_jobs_path(manifest_path: str) -> str:
+    """Job table đi cùng manifest: mỗi collection (kể cả collection đang reindex) có job table riêng."""
+    return f"{os.path.splitext(manifest_path)[0]}.jobs.sqlite"
+
+
+def copy_ingest_jobs(source_path: str, target_path: str) -> bool:
+    """Thay job table target_path bằng bản sao của source_path (reindex chuyển alias sang collection mới).
+
+    Chép qua backup API của SQLite: an toàn với WAL và với process khác đang mở target. source_path chưa có thì
+    target_path bị làm rỗng, vì lịch sử của collection cũ không đúng với collection mới. Trả về True nếu đã chép.
+    """
+    if not os.path.exists(source_path):
+        if os.path.exists(target_path):
+            target = sqlite3.connect(target_path, timeout=30)
+            try:
+                with target:
+                    target.execute("DELETE FROM ingest_checkpoints")
+                    target.execute("DELETE FROM ingest_jobs")
+            finally:
+                target.close()
+        return False
+    source = sqlite3.connect(source_path, timeout=30)
+    target = sqlite3.connect(target_path, timeout=30)
+    try:
+        source.backup(target)
+    finally:
+        target.close()
+        source.close()
+    return True
+
+
+def settings_key(settings: dict) -> str:
+    """Khóa của ingest settings; checkpoint tạo với settings khác (chunker, model...) không dùng lại được."""
+    return hashlib.sha256(json.dumps(settings, sort_keys=True).encode("utf-8")).hexdigest()[:16]
+
+
+def default_worker_id() -> str:
+    return f"{socket.gethostname()}:{os.getpid()}"
+
+
+def _worker_alive(worker: str) -> bool:
+    """Worker trên host khác coi như còn sống tới khi lease hết hạn; trên host này kiểm tra pid."""
+    host, _, pid = worker.rpartition(":")
+    if host != socket.gethostname() or not pid.isdigit():
+        return True
+    try:
+        os.kill(int(pid), 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+class IngestJobStore:
+    """Job table SQLite cho việc nạp tài liệu RAG: stage và checkpoint của từng file, claim giữa nhiều worker.
+
+    Mỗi file đi qua pending -> extracted (text các trang) -> chunked (chunk + payload) -> embedded (vector) -> indexed;
+    checkpoint của stage mới nhất được giữ lại nên lần chạy sau (sau crash, OOM, lỗi Qdrant) tiếp tục từ đó.
+    Worker claim file bằng một transaction BEGIN IMMEDIATE; claim hết hạn sau lease_s giây hoặc ngay khi
+    process giữ claim trên cùng host đã chết. Mỗi lần claim tính một lần thử (kể cả khi process bị kill).
+    """
+
+    def __init__(self, path: str, worker_id: str = None, lease_s: float = INGEST_JOB_LEASE_S, max_attempts: int = INGEST_JOB_MAX_ATTEMPTS):
+        self.path = path
+        self.worker_id = worker_id or default_worker_id()
+        self.lease_s = lease_s
+        self.max_attempts = max_attempts
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with self._connect() as conn:
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.executescript(SCHEMA)
+
+    @contextmanager
+    def _connect(self):
+        # Mỗi thao tác một connection: an toàn giữa các thread của pipeline và giữa các process
+        conn = sqlite3.connect(self.path, timeout=30, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    @contextmanager
+    def _transaction(self):
+        with self._connect() as conn:
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                yield conn
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+            conn.execute("COMMIT")
+
+    def sync(self, file_hashes: dict, settings: str) -> None:
+        """Đăng ký các file cần nạp {filename: hash}; file đổi nội dung/settings hoặc cần nạp lại sau khi đã indexed thì bắt đầu lại từ pending."""
+        now = time.time()
+        with self._transaction() as conn:
+            for filename, file_hash in file_hashes.items():
+                row = conn.execute("SELECT file_hash, settings_key, stage FROM ingest_jobs WHERE filename = ?", (filename,)).fetchone()
+                if row is not None and row[:2] == (file_hash, settings) and row[2] != "indexed":
+                    continue
+                conn.execute("DELETE FROM ingest_checkpoints WHERE filename = ?", (filename,))
+                conn.execute(
+                    "INSERT OR REPLACE INTO ingest_jobs (filename, file_hash, settings_key, stage, worker, lease_until, attempts, error, updated_at) "
+                    "VALUES (?, ?, ?, 'pending', NULL, NULL, 0, NULL, ?)",
+                    (filename, file_hash, settings, now),
+                )
+
+    def claim(self, filenames: list, limit: int) -> list:
+        """Nhận tối đa limit file trong filenames (theo thứ tự) chưa indexed, chưa có worker khác giữ và chưa hết số lần thử."""
+        now = time.time()
+        wanted = set(filenames)
+        with self._transaction() as conn:
+            rows = conn.execute(
+                "SELECT filename, worker, lease_until FROM ingest_jobs WHERE stage != 'indexed' AND attempts < ?", (self.max_attempts,)
+            ).fetchall()
+            available = {
+                filename for filename, worker, lease_until in rows
+                if filename in wanted and (worker is None or lease_until < now or not _worker_alive(worker))
+            }
+            claimed = [filename for filename in filenames if filename in available][:limit]
+            conn.executemany(
+                "UPDATE ingest_jobs SET worker = ?, lease_until = ?, attempts = attempts + 1, error = NULL, updated_at = ? WHERE filename = ?",
+                [(self.worker_id, now + self.lease_s, now, filename) for filename in claimed],
+            )
+        return claimed
+
+    def stage(self, filename: str) -> str:
+        with self._connect() as conn:
+            row = conn.execute("SELECT stage FROM ingest_jobs WHERE filename = ?", (filename,)).fetchone()
+        return row[0] if row else None
+
+    def checkpoint(self, filename: str, stage: str, data: bytes) -> None:
+        """Lưu kết quả của stage và gia hạn claim."""
+        now = time.time()
+        with self._transaction() as conn:
+            conn.execute("INSERT OR REPLACE INTO ingest_checkpoints (filename, stage, data) VALUES (?, ?, ?)", (filename, stage, sqlite3.Binary(data)))
+            # Checkpoint của stage trước không còn cần khi resume
+            conn.execute("DELETE FROM ingest_checkpoints WHERE filename = ? AND stage != ? AND stage != 'chunked'", (filename, stage))
+            conn.execute("UPDATE ingest_jobs SET stage = ?, lease_until = ?, updated_at = ? WHERE filename = ?", (stage, now + self.lease_s, now, filename))
+
+    def load(self, filename: str, stage: str) -> bytes:
+        with self._connect() as conn:
+            row = conn.execute("SELECT data FROM ingest_checkpoints WHERE filename = ? AND stage = ?", (filename, stage)).fetchone()
+        return bytes(row[0]) if row else None
+
+    def complete(self, filename: str) -> None:
+        """File đã upsert và ghi manifest: bỏ checkpoint, nhả claim."""
+        with self._transaction() as conn:
+            conn.execute("DELETE FROM ingest_checkpoints WHERE filename = ?", (filename,))
+            conn.execute("UPDATE ingest_jobs SET stage = 'indexed', worker = NULL, lease_until = NULL, error = NULL, updated_at = ? WHERE filename = ?",
+                         (time.time(), filename))
+
+    def fail(self, filename: str, error: str) -> None:
+        """Giữ checkpoint đã có; file được thử lại ở lần chạy sau nếu chưa hết số lần thử."""
+        with self._connect() as conn:
+            conn.execute("UPDATE ingest_jobs SET worker = NULL, lease_until = NULL, error = ?, updated_at = ? WHERE filename = ?",
+                         (error, time.time(), filename))
+
+    def release(self) -> None:
+        """Nhả mọi claim chưa xong của worker này (khi dừng giữa chừng)."""
+        with self._connect() as conn:
+            conn.execute("UPDATE ingest_jobs SET worker = NULL, lease_until = NULL WHERE worker = ?", (self.worker_id,))
+
+    def exhausted(self, filenames: list) -> dict:
+        """{filename: lỗi cuối} của các file trong filenames đã hết số lần thử."""
+        with self._connect() as conn:
+            rows = conn.execute("SELECT filename, error FROM ingest_jobs WHERE stage != 'indexed' AND attempts >= ?", (self.max_attempts,)).fetchall()
+        wanted = set(filenames)
+        return {filename: error for filename, error in rows if filename in wanted}
+
+    def reset_attempts(self) -> int:
+        """Cho các file đã hết số lần thử được thử lại (giữ checkpoint)."""
+        with self._connect() as conn:
+            return conn.execute("UPDATE ingest_jobs SET attempts = 0 WHERE stage != 'indexed' AND attempts >= ?", (self.max_attempts,)).rowcount
+
+    def counts(self) -> dict:
+        """Số file theo stage (file đang được giữ bởi worker nằm trong "claimed")."""
+        with self._connect() as conn:
+            counts = dict(conn.execute("SELECT stage, COUNT(*) FROM ingest_jobs GROUP BY stage").fetchall())
+            counts["claimed"] = conn.execute("SELECT COUNT(*) FROM ingest_jobs WHERE worker IS NOT NULL").fetchone()[0]
+        return counts
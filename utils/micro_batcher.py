@@ -0,0 +1,85 @@
+# utils/micro_batcher.py
+import queue
+import threading
+import time
+from concurrent.futures import Future
+
+from config.env import MICRO_BATCH_MAX_SIZE, MICRO_BATCH_WAIT_MS
+from utils.logging import setup_logging
+
+logger = setup_logging()
+
+
+class MicroBatcher:
+    """Gom các lời gọi đồng thời thành một batch cho process_fn, mỗi caller nhận lại đúng kết quả của mình.
+
+    Thread nền lấy item đầu tiên, chờ thêm tối đa max_wait_ms (hoặc tới max_batch_size item) rồi gọi
+    process_fn(list item) -> list kết quả cùng thứ tự. Trong lúc một batch đang chạy, request mới dồn lại
+    trong queue nên batch tự lớn lên theo tải. Lỗi của process_fn được trả về cho mọi caller trong batch.
+    """
+
+    def __init__(self, process_fn, max_batch_size: int = MICRO_BATCH_MAX_SIZE, max_wait_ms: float = MICRO_BATCH_WAIT_MS, name: str = "micro-batcher"):
+        self.process_fn = process_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait_s = max_wait_ms / 1000
+        self.name = name
+        self.queue = queue.Queue()
+        self.counters = {"batches": 0, "items": 0, "max_batch_size": 0}
+        self._lock = threading.Lock()
+        self.thread = threading.Thread(target=self._run, name=name, daemon=True)
+        self.thread.start()
+
+    def submit(self, item, timeout: float = None):
+        """Gửi một item và chờ kết quả (ném lại exception của process_fn nếu có)."""
+        future = Future()
+        self.queue.put((item, future))
+        return future.result(timeout)
+
+    def close(self) -> None:
+        self.queue.put(None)
+        self.thread.join()
+
+    def _collect(self, first) -> tuple:
+        batch = [first]
+        deadline = time.monotonic() + self.max_wait_s
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            try:
+                item = self.queue.get(timeout=remaining) if remaining > 0 else self.queue.get_nowait()
+            except queue.Empty:
+                break
+            if item is None:
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    def _run(self) -> None:
+        stopping = False
+        while not stopping:
+            first = self.queue.get()
+            if first is None:
+                break
+            batch, stopping = self._collect(first)
+            items = [item for item, _ in batch]
+            try:
+                results = self.process_fn(items)
+                if len(results) != len(items):
+                    raise RuntimeError(f"{self.name}: process_fn returned {len(results)} results for {len(items)} items")
+                for (_, future), result in zip(batch, results):
+                    future.set_result(result)
+            except Exception as e:
+                logger.error(f"{self.name} batch of {len(items)} failed: {str(e)}")
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+            with self._lock:
+                self.counters["batches"] += 1
+                self.counters["items"] += len(items)
+                self.counters["max_batch_size"] = max(self.counters["max_batch_size"], len(items))
+
+    def stats(self) -> dict:
+        with self._lock:
+            counters = dict(self.counters)
+        counters["avg_batch_size"] = round(counters["items"] / counters["batches"], 2) if counters["batches"] else 0.0
+        counters["pending"] = self.queue.qsize()
+        return counters
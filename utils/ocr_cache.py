@@ -0,0 +1,92 @@
+# utils/ocr_cache.py
+import hashlib
+import os
+
+from config.env import OCR_CACHE_DIR, OCR_CACHE_MAX_MB
+from utils.logging import setup_logging
+
+logger = setup_logging()
+
+HASH_BLOCK_BYTES = 1 << 20
+
+
+class OcrCache:
+    """Cache kết quả OCR theo hash của ảnh trang đã rasterize (cùng DPI/grayscale thì cùng ảnh).
+
+    Key gồm ngôn ngữ, phiên bản Tesseract và config OCR: nâng cấp Tesseract hay đổi config thì trang được OCR lại.
+    Mỗi trang một file <cache_dir>/<2 ký tự đầu>/<key>.txt, ghi qua file tạm + os.replace nên
+    nhiều process OCR ghi cùng lúc an toàn; lần nạp lại sau lỗi bỏ qua các trang đã OCR xong.
+    Lần đọc trúng cache cập nhật mtime của file để prune() xóa các trang lâu không dùng nhất trước (LRU).
+    """
+
+    def __init__(self, lang: str, cache_dir: str = OCR_CACHE_DIR, engine_version: str = "", config: str = "",
+                 max_bytes: int = OCR_CACHE_MAX_MB * (1 << 20)):
+        self.lang = lang
+        self.cache_dir = cache_dir
+        self.engine_version = engine_version
+        self.config = config
+        self.max_bytes = max_bytes
+
+    def image_key(self, image_path: str) -> str:
+        # Đọc theo block: ảnh trang 300 DPI có thể vài chục MB
+        digest = hashlib.sha256(f"{self.lang}\0{self.engine_version}\0{self.config}\0".encode("utf-8"))
+        with open(image_path, "rb") as file:
+            for block in iter(lambda: file.read(HASH_BLOCK_BYTES), b""):
+                digest.update(block)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> str:
+        return os.path.join(self.cache_dir, key[:2], f"{key}.txt")
+
+    def get(self, key: str) -> str:
+        """Text OCR đã cache của ảnh, hoặc None."""
+        path = self._path(key)
+        try:
+            with open(path, encoding="utf-8") as file:
+                text = file.read()
+        except FileNotFoundError:
+            return None
+        try:
+            os.utime(path)
+        except OSError:
+            pass
+        return text
+
+    def put(self, key: str, text: str) -> None:
+        path = self._path(key)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as file:
+            file.write(text)
+        os.replace(tmp_path, path)
+
+    def prune(self) -> int:
+        """Xóa các trang ít dùng gần đây nhất tới khi cache không vượt max_bytes (0 = không giới hạn). Trả về số file đã xóa."""
+        if self.max_bytes <= 0 or not os.path.isdir(self.cache_dir):
+            return 0
+        entries = []
+        total = 0
+        for root, _, files in os.walk(self.cache_dir):
+            for name in files:
+                if not name.endswith(".txt"):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    stat = os.stat(path)
+                except FileNotFoundError:
+                    continue
+                entries.append((stat.st_mtime_ns, stat.st_size, path))
+                total += stat.st_size
+        removed = 0
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+            removed += 1
+        if removed:
+            logger.info(f"Pruned {removed} OCR cache entries, {total / (1 << 20):.1f} MB left in {self.cache_dir}")
+        return removed
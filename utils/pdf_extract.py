@@ -0,0 +1,242 @@
+# utils/pdf_extract.py
+import os
+import re
+import tempfile
+import time
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from functools import lru_cache
+
+from pdf2image import convert_from_path, pdfinfo_from_path
+import pytesseract
+from PyPDF2 import PdfReader
+from config.env import TEXT_LAYER_MIN_CHARS, OCR_DPI, OCR_GRAYSCALE, OCR_CACHE_ENABLED
+from utils.chunker import is_table_line
+from utils.logging import setup_logging
+from utils.ocr_cache import OcrCache
+
+logger = setup_logging()
+
+OCR_LANG = "eng"
+# Config truyền cho Tesseract (--psm, --oem...); là một phần của key OCR cache
+OCR_CONFIG = ""
+
+
+@lru_cache(maxsize=1)
+def tesseract_version() -> str:
+    """Phiên bản Tesseract của process (gọi binary một lần), dùng trong key OCR cache."""
+    return str(pytesseract.get_tesseract_version())
+
+
+def clean_text(text):
+    text = re.sub(r'\s+', ' ', text)
+    text = re.sub(r'(?<=\w)- (?=\w)', '', text)
+    text = re.sub(r'[^\w\s.,!?&-]', '', text)
+    return text.strip()
+
+
+def detect_table_lines(text):
+    lines = text.split('\n')
+    table_lines = []
+    for line in lines:
+        if is_table_line(line):
+            table_lines.append(line.strip())
+    if table_lines:
+        return '\n'.join(table_lines) + '\n'
+    return ''
+
+
+def format_page_text(ocr_text: str) -> str:
+    """Giữ nguyên các dòng bảng, làm sạch phần còn lại của trang. Trả về '' nếu trang trống."""
+    if not ocr_text.strip():
+        return ''
+    table_text = detect_table_lines(ocr_text)
+    non_table_text = clean_text(re.sub(r'\n\s*\n', '\n', ocr_text))
+    return table_text + non_table_text + '\n'
+
+
+def _page_has_images(page) -> bool:
+    try:
+        xobjects = page["/Resources"].get("/XObject")
+        if not xobjects:
+            return False
+        xobjects = xobjects.get_object()
+        return any(xobjects[name].get_object().get("/Subtype") == "/Image" for name in xobjects)
+    except Exception:
+        return False
+
+
+def needs_ocr(text: str, has_images: bool) -> bool:
+    """Trang cần OCR khi text layer quá ít, hoặc là ảnh scan với text layer rác (OCR ẩn chất lượng thấp)."""
+    stripped = text.strip()
+    if len(stripped) < TEXT_LAYER_MIN_CHARS:
+        return True
+    alnum_ratio = sum(ch.isalnum() for ch in stripped) / len(stripped)
+    return has_images and alnum_ratio < 0.5
+
+
+def _budget_pages(filepath: str, total_pages: int, page_budget: int) -> int:
+    """Số trang được đọc từ file theo page_budget (0 = không giới hạn)."""
+    if page_budget and total_pages > page_budget:
+        logger.warning(f"{os.path.basename(filepath)} has {total_pages} pages, reading the first {page_budget} (PDF_PAGE_BUDGET)")
+        return page_budget
+    return total_pages
+
+
+def read_text_layer(filepath: str, page_budget: int) -> list:
+    """Đọc text layer của tối đa page_budget trang. Phần tử là text của trang, hoặc None nếu trang cần OCR."""
+    reader = PdfReader(filepath)
+    pages = []
+    for page in reader.pages[:_budget_pages(filepath, len(reader.pages), page_budget)]:
+        try:
+            text = page.extract_text() or ''
+        except Exception:
+            text = ''
+        pages.append(None if needs_ocr(text, _page_has_images(page)) else text)
+    return pages
+
+
+def _init_ocr_worker(nice: int = 0):
+    # Mỗi process chạy một trang; không để Tesseract tự mở thêm thread OpenMP
+    os.environ["OMP_THREAD_LIMIT"] = "1"
+    # Ingest nền: hạ độ ưu tiên CPU để không tranh với process phục vụ query
+    if nice and hasattr(os, "nice"):
+        os.nice(nice)
+
+
+def ocr_page(filepath: str, page_number: int, dpi: int = OCR_DPI, grayscale: bool = OCR_GRAYSCALE, use_cache: bool = OCR_CACHE_ENABLED) -> str:
+    """Rasterize và OCR một trang (1-based). Hàm top-level để chạy được trong ProcessPoolExecutor.
+
+    Ảnh trang được ghi ra file tạm và Tesseract đọc từ file, nên mỗi process chỉ giữ tối đa một trang
+    và không có ảnh nào nằm trong bộ nhớ Python. Text OCR được cache theo hash của ảnh.
+    """
+    with tempfile.TemporaryDirectory(prefix="ocr_page_") as tmp_dir:
+        image_paths = convert_from_path(
+            filepath, dpi=dpi, first_page=page_number, last_page=page_number, grayscale=grayscale,
+            output_folder=tmp_dir, fmt="png", paths_only=True
+        )
+        if not image_paths:
+            return ''
+        if not use_cache:
+            return pytesseract.image_to_string(image_paths[0], lang=OCR_LANG, config=OCR_CONFIG)
+        cache = OcrCache(OCR_LANG, engine_version=tesseract_version(), config=OCR_CONFIG)
+        key = cache.image_key(image_paths[0])
+        text = cache.get(key)
+        if text is None:
+            text = pytesseract.image_to_string(image_paths[0], lang=OCR_LANG, config=OCR_CONFIG)
+            cache.put(key, text)
+        return text
+
+
+def _ocr_only_pages(filepath: str, page_budget: int) -> list:
+    # PDF không đọc được bằng PyPDF2 (hỏng, mã hóa...): OCR toàn bộ trang
+    return [None] * _budget_pages(filepath, int(pdfinfo_from_path(filepath)["Pages"]), page_budget)
+
+
+def iter_documents(filepaths: list, page_budget: int, workers: int, max_inflight_files: int = None, nice: int = 0):
+    """Trích text từng trang của nhiều PDF và yield từng file ngay khi xong.
+
+    Đọc text layer trước, chỉ OCR các trang scan/ít text. Cả hai giai đoạn chạy trên cùng một process pool
+    (text layer theo file, OCR theo trang); tối đa max_inflight_files file được xử lý cùng lúc nên bộ nhớ
+    không tăng theo số file.
+
+    Args:
+        filepaths (list): Đường dẫn các file PDF.
+        page_budget (int): Số trang tối đa đọc từ mỗi file (0 = không giới hạn).
+        workers (int): Số process.
+        max_inflight_files (int): Số file tối đa đang xử lý (mặc định 2 * workers).
+        nice (int): Tăng niceness của các process trích xuất (0 = giữ nguyên).
+
+    Yields:
+        tuple: (filename, pages, error) với pages là [(page_text, method), ...] theo thứ tự trang,
+            method là "text_layer" hoặc "ocr"; error khác None nếu file lỗi (không ảnh hưởng file khác).
+    """
+    start = time.perf_counter()
+    max_inflight_files = max_inflight_files or 2 * workers
+    pending_files = list(filepaths)
+    pages = {}
+    remaining = {}
+    futures = {}
+    counts = {"text_layer": 0, "ocr": 0}
+
+    def finish(filepath, error=None):
+        file_pages = pages.pop(filepath, None)
+        remaining.pop(filepath, None)
+        filename = os.path.basename(filepath)
+        if error is not None:
+            for other, (other_path, _) in list(futures.items()):
+                if other_path == filepath:
+                    other.cancel()
+                    del futures[other]
+            logger.error(f"Extraction failed for {filename}: {str(error)}, filepath={filepath}")
+            return filename, None, error
+        for _, method in file_pages:
+            counts[method] += 1
+        return filename, [(format_page_text(text), method) for text, method in file_pages], None
+
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_ocr_worker, initargs=(nice,)) as executor:
+        while pending_files or futures:
+            while pending_files and len(pages) < max_inflight_files:
+                filepath = pending_files.pop(0)
+                pages[filepath] = None
+                futures[executor.submit(read_text_layer, filepath, page_budget)] = (filepath, None)
+
+            done, _ = wait(list(futures), return_when=FIRST_COMPLETED)
+            for future in done:
+                if future not in futures:
+                    continue
+                filepath, page_index = futures.pop(future)
+                if filepath not in pages:
+                    continue
+                if page_index is None:
+                    # Text layer xong: gửi OCR cho các trang cần OCR
+                    try:
+                        layer = future.result()
+                    except Exception as e:
+                        logger.warning(f"Text layer unreadable for {os.path.basename(filepath)}, using OCR: {str(e)}")
+                        try:
+                            layer = _ocr_only_pages(filepath, page_budget)
+                        except Exception as e:
+                            yield finish(filepath, e)
+                            continue
+                    pages[filepath] = [(text, "text_layer") if text is not None else None for text in layer]
+                    ocr_pages = [i for i, text in enumerate(layer) if text is None]
+                    remaining[filepath] = len(ocr_pages)
+                    for i in ocr_pages:
+                        futures[executor.submit(ocr_page, filepath, i + 1)] = (filepath, i)
+                else:
+                    try:
+                        ocr_text = future.result()
+                    except Exception as e:
+                        yield finish(filepath, e)
+                        continue
+                    pages[filepath][page_index] = (ocr_text, "ocr")
+                    remaining[filepath] -= 1
+                    logger.debug(f"OCR page {page_index + 1}/{len(pages[filepath])} of {os.path.basename(filepath)}: {len(ocr_text)} characters, sample={ocr_text[:100]}")
+                if remaining.get(filepath) == 0:
+                    yield finish(filepath)
+
+    elapsed = time.perf_counter() - start
+    total_pages = counts["text_layer"] + counts["ocr"]
+    logger.info(
+        f"Extraction finished: {total_pages} pages ({counts['text_layer']} text layer, {counts['ocr']} OCR) "
+        f"in {elapsed:.1f}s ({total_pages / elapsed if elapsed > 0 else 0:.2f} pages/sec)"
+    )
+    if OCR_CACHE_ENABLED and counts["ocr"]:
+        OcrCache(OCR_LANG).prune()
+
+
+def join_pages(pages: list) -> tuple:
+    """Nối text các trang, trả về (text, spans) với spans là [(start, end, page_number, method)]."""
+    parts = []
+    spans = []
+    offset = 0
+    for page_number, (page_text, method) in enumerate(pages, start=1):
+        parts.append(page_text)
+        spans.append((offset, offset + len(page_text), page_number, method))
+        offset += len(page_text)
+    return ''.join(parts), spans
+
+
+def page_extraction(spans: list, start: int, end: int) -> dict:
+    """{số trang: method} của các trang giao với đoạn [start, end) trong text đã nối."""
+    return {str(page_number): method for span_start, span_end, page_number, method in spans if span_start < end and span_end > start}
@@ -0,0 +1,50 @@
+# utils/pipeline.py
+import queue
+import threading
+
+from utils.logging import setup_logging
+
+logger = setup_logging()
+
+QUEUE_POLL_INTERVAL_S = 0.1
+
+
+def put_until_stopped(q: queue.Queue, item, stop_event: threading.Event) -> bool:
+    """put() chặn khi queue đầy (backpressure) nhưng thoát ngay khi pipeline bị dừng. Trả về False nếu đã dừng."""
+    while not stop_event.is_set():
+        try:
+            q.put(item, timeout=QUEUE_POLL_INTERVAL_S)
+            return True
+        except queue.Full:
+            continue
+    return False
+
+
+def get_until_stopped(q: queue.Queue, stop_event: threading.Event):
+    """get() chặn đến khi có item; trả về None (như sentinel kết thúc) khi pipeline bị dừng."""
+    while not stop_event.is_set():
+        try:
+            return q.get(timeout=QUEUE_POLL_INTERVAL_S)
+        except queue.Empty:
+            continue
+    return None
+
+
+class PipelineStage(threading.Thread):
+    """Một stage của pipeline chạy trên thread riêng. Lỗi được giữ lại trong .error và dừng cả pipeline."""
+
+    def __init__(self, name: str, target, args: tuple, stop_event: threading.Event):
+        super().__init__(name=f"pipeline-{name}", daemon=True)
+        self.stage_name = name
+        self.target = target
+        self.args = args
+        self.stop_event = stop_event
+        self.error = None
+
+    def run(self):
+        try:
+            self.target(*self.args)
+        except Exception as e:
+            self.error = e
+            logger.error(f"Pipeline stage '{self.stage_name}' failed: {str(e)}")
+            self.stop_event.set()
@@ -0,0 +1,226 @@
+# utils/price_store.py
+import json
+import os
+import shutil
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import text
+from config.env import PRICE_STORE_DIR
+from utils.logging import setup_logging
+
+logger = setup_logging()
+
+FIELDS = ["date", "open_price", "high_price", "low_price", "close_price", "volume"]
+CURRENT_FILE = "CURRENT"
+KEEP_VERSIONS = 2
+ROLLING_WINDOW = 30
+PRICE_STORE_QUERY = (
+    "SELECT symbol, date, open_price, high_price, low_price, close_price, volume "
+    "FROM stock_prices ORDER BY symbol, date"
+)
+# Các template sql_flow có thể trả lời trực tiếp từ price store
+SUPPORTED_TEMPLATES = {
+    "daily_closing_price_time_series",
+    "daily_closing_price_with_rolling_avg",
+    "time_series_volume",
+    "single_value",
+    "daily_returns_histogram",
+    "daily_returns_boxplot",
+}
+
+
+def build_price_store(df: pd.DataFrame, store_dir: str = PRICE_STORE_DIR) -> str:
+    """Ghi bảng giá thành các mảng NumPy liên tục theo (symbol, date) rồi chuyển CURRENT sang version mới.
+
+    Args:
+        df (pd.DataFrame): Các cột symbol, date, open_price, high_price, low_price, close_price, volume.
+        store_dir (str): Thư mục gốc của price store.
+
+    Returns:
+        str: Tên version vừa được kích hoạt.
+    """
+    os.makedirs(store_dir, exist_ok=True)
+    version = f"v{time.time_ns()}"
+    version_dir = os.path.join(store_dir, version)
+    os.makedirs(version_dir)
+    try:
+        df = df.sort_values(["symbol", "date"]).reset_index(drop=True)
+        arrays = {
+            "date": pd.to_datetime(df["date"]).values.astype("datetime64[D]"),
+            "open_price": df["open_price"].to_numpy(dtype=np.float64),
+            "high_price": df["high_price"].to_numpy(dtype=np.float64),
+            "low_price": df["low_price"].to_numpy(dtype=np.float64),
+            "close_price": df["close_price"].to_numpy(dtype=np.float64),
+            "volume": df["volume"].to_numpy(dtype=np.int64),
+        }
+        for field, array in arrays.items():
+            np.save(os.path.join(version_dir, f"{field}.npy"), np.ascontiguousarray(array))
+
+        # symbol -> [start, end) trong các mảng
+        symbols = df["symbol"].to_numpy()
+        boundaries = np.flatnonzero(symbols[1:] != symbols[:-1]) + 1
+        starts = np.concatenate(([0], boundaries)) if len(df) else np.array([], dtype=np.int64)
+        ends = np.concatenate((boundaries, [len(df)])) if len(df) else np.array([], dtype=np.int64)
+        index = {str(symbols[s]): [int(s), int(e)] for s, e in zip(starts, ends)}
+        with open(os.path.join(version_dir, "symbols.json"), "w") as file:
+            json.dump(index, file)
+
+        # Chuyển version nguyên tử: reader luôn thấy version cũ hoặc mới, không bao giờ dở dang
+        tmp_current = os.path.join(store_dir, CURRENT_FILE + ".tmp")
+        with open(tmp_current, "w") as file:
+            file.write(version)
+        os.replace(tmp_current, os.path.join(store_dir, CURRENT_FILE))
+    except Exception:
+        shutil.rmtree(version_dir, ignore_errors=True)
+        raise
+
+    _cleanup_old_versions(store_dir, version)
+    logger.info(f"Built price store {version}: {len(df)} rows, {len(index)} symbols")
+    return version
+
+
+def refresh_price_store(conn, store_dir: str = PRICE_STORE_DIR) -> str:
+    """Đọc lại toàn bộ stock_prices (sau mỗi lần ingest) và dựng version mới cho price store.
+
+    Lỗi chỉ được cảnh báo (trả về None): dữ liệu đã commit vào database, sql_flow dùng version cũ hoặc fallback về SQL.
+    """
+    try:
+        df = pd.read_sql_query(text(PRICE_STORE_QUERY), conn)
+        return build_price_store(df, store_dir)
+    except Exception as e:
+        logger.warning(f"Failed to refresh price store, queries fall back to SQL: {str(e)}")
+        return None
+
+
+def _cleanup_old_versions(store_dir: str, current_version: str) -> None:
+    versions = sorted(
+        (name for name in os.listdir(store_dir) if name.startswith("v") and name != current_version),
+        reverse=True
+    )
+    # Giữ lại version trước đó cho các worker chưa kịp mở version mới
+    for name in versions[KEEP_VERSIONS - 1:]:
+        shutil.rmtree(os.path.join(store_dir, name), ignore_errors=True)
+
+
+class PriceStore:
+    """Price store chỉ đọc: các mảng memory-mapped dùng chung page cache giữa mọi worker."""
+
+    def __init__(self, store_dir: str = PRICE_STORE_DIR):
+        self.store_dir = store_dir
+        self.version = None
+        self.current_mtime = None
+        # (arrays, index) được thay cùng lúc để reader không thấy trạng thái lẫn giữa hai version
+        self.snapshot = ({}, {})
+        self._lock = threading.Lock()
+        self.refresh()
+
+    def refresh(self) -> bool:
+        """Mở lại store nếu CURRENT đã trỏ sang version mới. Trả về True nếu có thay đổi.
+
+        Store chưa được build (chưa có CURRENT) thì giữ nguyên trạng thái và trả về False.
+        """
+        current_file = os.path.join(self.store_dir, CURRENT_FILE)
+        try:
+            stat = os.stat(current_file)
+        except FileNotFoundError:
+            return False
+        # os.replace tạo inode mới nên (inode, mtime) đổi mỗi lần chuyển version
+        mtime = (stat.st_ino, stat.st_mtime_ns)
+        if mtime == self.current_mtime:
+            return False
+        with self._lock:
+            with open(current_file, "r") as file:
+                version = file.read().strip()
+            if version != self.version:
+                version_dir = os.path.join(self.store_dir, version)
+                arrays = {field: np.load(os.path.join(version_dir, f"{field}.npy"), mmap_mode="r") for field in FIELDS}
+                with open(os.path.join(version_dir, "symbols.json"), "r") as file:
+                    index = json.load(file)
+                self.snapshot = (arrays, index)
+                self.version = version
+                logger.info(f"Opened price store {version} with {len(index)} symbols")
+            self.current_mtime = mtime
+        return True
+
+    def series(self, symbol: str, start_date: str, end_date: str) -> dict:
+        """Lát cắt [start_date, end_date] của một symbol bằng binary search, trả về view (không copy)."""
+        arrays, index = self.snapshot
+        bounds = index.get(symbol.upper())
+        if bounds is None:
+            return None
+        start, end = bounds
+        dates = arrays["date"][start:end]
+        lo = start + int(np.searchsorted(dates, np.datetime64(start_date, "D"), side="left"))
+        hi = start + int(np.searchsorted(dates, np.datetime64(end_date, "D"), side="right"))
+        return {field: array[lo:hi] for field, array in arrays.items()}
+
+    def answer_template(self, template_name: str, tickers: list, start_date: str, end_date: str) -> list:
+        """Trả lời template giống kết quả SQL tương ứng, hoặc None nếu cần fallback về SQL."""
+        if template_name not in SUPPORTED_TEMPLATES or not tickers:
+            return None
+        self.refresh()
+        if self.version is None:
+            logger.info("Price store not built yet, falling back to SQL")
+            return None
+        # single_value chỉ cho một ngày; khoảng nhiều ngày phải dùng daily_closing_price_time_series (sql_flow chọn qua match_template)
+        if template_name == "single_value" and start_date != end_date:
+            logger.info(f"single_value over {start_date}..{end_date} is not a single day, falling back to SQL")
+            return None
+        multi = len(tickers) > 1
+        # Cùng thứ tự với sql_multi (ORDER BY symbol)
+        symbols = sorted({t.upper() for t in tickers}) if multi else [tickers[0].upper()]
+        records = []
+        for ticker in symbols:
+            series = self.series(ticker, start_date, end_date)
+            if series is None:
+                logger.info(f"Symbol {ticker} not in price store, falling back to SQL")
+                return None
+            rows = _template_columns(template_name, series)
+            if multi:
+                rows = [{"symbol": ticker, **row} for row in rows]
+            records.extend(rows)
+        return records
+
+
+def _template_columns(template_name: str, series: dict) -> list:
+    dates = np.datetime_as_string(series["date"], unit="D").tolist()
+    close = series["close_price"]
+    if template_name in ("daily_closing_price_time_series", "single_value"):
+        return [{"date": d, "close_price": c} for d, c in zip(dates, close.tolist())]
+    if template_name == "time_series_volume":
+        return [{"date": d, "volume": v} for d, v in zip(dates, series["volume"].tolist())]
+    if template_name == "daily_closing_price_with_rolling_avg":
+        # AVG(...) OVER (ROWS BETWEEN 29 PRECEDING AND CURRENT ROW) trên lát cắt đã lọc
+        cumsum = np.cumsum(close)
+        shifted = np.zeros(len(close))
+        shifted[ROLLING_WINDOW:] = cumsum[:-ROLLING_WINDOW]
+        counts = np.minimum(np.arange(1, len(close) + 1), ROLLING_WINDOW)
+        rolling = (cumsum - shifted) / counts
+        return [{"date": d, "close_price": c, "rolling_avg": r} for d, c, r in zip(dates, close.tolist(), rolling.tolist())]
+    # daily_returns_*: (close - LAG(close)) / LAG(close), dòng đầu là NULL
+    returns = [None] + ((close[1:] - close[:-1]) / close[:-1]).tolist() if len(close) else []
+    if template_name == "daily_returns_histogram":
+        return [{"daily_return": r} for r in returns]
+    return [{"date": d, "daily_return": r} for d, r in zip(dates, returns)]
+
+
+_price_store = None
+_price_store_lock = threading.Lock()
+
+def get_price_store():
+    """PriceStore dùng chung trong process, hoặc None nếu store chưa được build."""
+    global _price_store
+    if _price_store is None:
+        with _price_store_lock:
+            if _price_store is None:
+                if not os.path.exists(os.path.join(PRICE_STORE_DIR, CURRENT_FILE)):
+                    return None
+                try:
+                    _price_store = PriceStore(PRICE_STORE_DIR)
+                except Exception as e:
+                    logger.error(f"Failed to open price store: {str(e)}")
+                    return None
+    return _price_store
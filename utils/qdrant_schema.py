@@ -0,0 +1,188 @@
+# utils/qdrant_schema.py
+import time
+
+from qdrant_client.http import models
+from config.env import QDRANT_COLLECTION_PROFILE
+from utils.logging import setup_logging
+
+logger = setup_logging()
+
+DENSE_VECTOR_SIZE = 384  # Kích thước vector của all-MiniLM-L6-v2
+SPARSE_VECTOR_NAME = "text_sparse"
+
+# company/report_type/filename/level lọc bằng MatchValue/MatchAny, year lọc theo khoảng nên dùng index integer
+PAYLOAD_INDEXES = {
+    "company": models.PayloadSchemaType.KEYWORD,
+    "report_type": models.PayloadSchemaType.KEYWORD,
+    "filename": models.PayloadSchemaType.KEYWORD,
+    "level": models.PayloadSchemaType.KEYWORD,
+    "year": models.PayloadSchemaType.INTEGER,
+}
+
+
+# Profile lưu trữ/index của collection. Quantization giữ bản nén trong RAM, vector gốc trên đĩa
+# dùng để rescore top (limit * oversampling) kết quả.
+COLLECTION_PROFILES = {
+    # float32 trong RAM, HNSW mặc định của Qdrant
+    "default": {"quantization": None, "on_disk": False, "m": 16, "ef_construct": 100, "hnsw_ef": None, "oversampling": None},
+    # int8 (4x nhỏ hơn) trong RAM, float32 trên đĩa để rescore
+    "int8": {"quantization": "int8", "on_disk": True, "m": 16, "ef_construct": 128, "hnsw_ef": 128, "oversampling": 2.0},
+    # 1 bit mỗi chiều (32x nhỏ hơn); 384 chiều của MiniLM cần oversampling cao để giữ recall
+    "binary": {"quantization": "binary", "on_disk": True, "m": 16, "ef_construct": 128, "hnsw_ef": 128, "oversampling": 4.0},
+    # int8 + HNSW graph và payload trên đĩa: RAM tối thiểu cho corpus rất lớn
+    "low_memory": {"quantization": "int8", "on_disk": True, "hnsw_on_disk": True, "on_disk_payload": True, "m": 16, "ef_construct": 100, "hnsw_ef": 96, "oversampling": 2.0},
+}
+
+
+def get_profile(profile: str = QDRANT_COLLECTION_PROFILE) -> dict:
+    if profile not in COLLECTION_PROFILES:
+        raise ValueError(f"Unknown collection profile: {profile}. Available: {list(COLLECTION_PROFILES)}")
+    return COLLECTION_PROFILES[profile]
+
+
+def quantization_config(profile: dict):
+    if profile["quantization"] == "int8":
+        return models.ScalarQuantization(
+            scalar=models.ScalarQuantizationConfig(type=models.ScalarType.INT8, quantile=0.99, always_ram=True)
+        )
+    if profile["quantization"] == "binary":
+        return models.BinaryQuantization(binary=models.BinaryQuantizationConfig(always_ram=True))
+    return None
+
+
+def search_params(profile_name: str = QDRANT_COLLECTION_PROFILE, exact: bool = False):
+    """SearchParams theo profile: hnsw_ef và rescore bằng vector gốc khi collection có quantization."""
+    profile = get_profile(profile_name)
+    quantization = None
+    if profile["quantization"]:
+        quantization = models.QuantizationSearchParams(rescore=True, oversampling=profile["oversampling"])
+    if exact:
+        return models.SearchParams(exact=True)
+    if profile["hnsw_ef"] is None and quantization is None:
+        return None
+    return models.SearchParams(hnsw_ef=profile["hnsw_ef"], quantization=quantization)
+
+
+def create_financial_collection(client, collection_name: str, profile_name: str = QDRANT_COLLECTION_PROFILE) -> None:
+    """Tạo collection tài liệu tài chính: dense vector (cosine) + sparse vector lexical (IDF) + payload index.
+
+    Args:
+        client (QdrantClient): Client Qdrant.
+        collection_name (str): Tên collection.
+        profile_name (str): Một key của COLLECTION_PROFILES (quantization, on-disk, tham số HNSW).
+    """
+    profile = get_profile(profile_name)
+    client.create_collection(
+        collection_name=collection_name,
+        vectors_config=models.VectorParams(
+            size=DENSE_VECTOR_SIZE,
+            distance=models.Distance.COSINE,
+            on_disk=profile["on_disk"]
+        ),
+        sparse_vectors_config={
+            SPARSE_VECTOR_NAME: models.SparseVectorParams(modifier=models.Modifier.IDF)
+        },
+        hnsw_config=models.HnswConfigDiff(
+            m=profile["m"],
+            ef_construct=profile["ef_construct"],
+            on_disk=profile.get("hnsw_on_disk", False)
+        ),
+        quantization_config=quantization_config(profile),
+        on_disk_payload=profile.get("on_disk_payload", False)
+    )
+    ensure_payload_indexes(client, collection_name)
+    logger.info(f"Created Qdrant collection: {collection_name} (profile={profile_name})")
+
+
+def ensure_payload_indexes(client, collection_name: str) -> None:
+    """Index payload cho các field dùng trong filter (tạo nếu collection chưa có)."""
+    existing = client.get_collection(collection_name).payload_schema or {}
+    for field_name, field_schema in PAYLOAD_INDEXES.items():
+        if field_name not in existing:
+            client.create_payload_index(
+                collection_name=collection_name,
+                field_name=field_name,
+                field_schema=field_schema
+            )
+            logger.info(f"Created payload index on {field_name} ({field_schema})")
+
+
+def has_sparse_vectors(client, collection_name: str) -> bool:
+    """Collection tạo trước khi có hybrid search không có sparse vector (cần build lại bằng scripts/reindex_rag.py)."""
+    sparse_config = client.get_collection(collection_name).config.params.sparse_vectors or {}
+    return SPARSE_VECTOR_NAME in sparse_config
+
+
+# financial_docs là alias trỏ tới collection có phiên bản (financial_docs_v<thời gian>): reindex build collection mới
+# rồi đổi alias trong một thao tác, collection cũ được giữ để rollback
+def versioned_collection_name(alias: str) -> str:
+    return f"{alias}_v{time.strftime('%Y%m%d%H%M%S')}"
+
+
+def resolve_collection(client, name: str):
+    """Collection thật mà name trỏ tới: đích của alias, chính name nếu là collection (chưa chuyển sang alias), hoặc None."""
+    for alias in client.get_aliases().aliases:
+        if alias.alias_name == name:
+            return alias.collection_name
+    if name in [col.name for col in client.get_collections().collections]:
+        return name
+    return None
+
+
+def versioned_collections(client, alias: str) -> list:
+    """Các collection có phiên bản của alias, cũ nhất trước."""
+    return sorted(col.name for col in client.get_collections().collections if col.name.startswith(f"{alias}_v"))
+
+
+def switch_alias(client, alias: str, collection_name: str, migrate: bool = False):
+    """Trỏ alias tới collection_name trong một request update_collection_aliases (atomic phía Qdrant).
+
+    alias đang là collection thường (tạo trước khi dùng alias) thì phải xóa collection đó để tạo alias cùng tên:
+    chỉ làm khi migrate=True. collection_name được kiểm tra qua một alias tạm trước, rồi xóa collection cũ và tạo
+    alias ngay sau đó; nếu tạo alias lỗi, dữ liệu vẫn còn trong collection_name (qua alias tạm) để khôi phục.
+
+    Returns:
+        str: Collection alias trỏ tới trước đó (None nếu chưa có).
+    """
+    previous = resolve_collection(client, alias)
+    if previous == alias:
+        if not migrate:
+            raise RuntimeError(
+                f"{alias} is a plain collection: switching to the alias deletes it (no rollback). Rerun with --migrate to confirm"
+            )
+        _migrate_to_alias(client, alias, collection_name)
+        return None
+    operations = []
+    if previous is not None:
+        operations.append(models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=alias)))
+    operations.append(models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name=collection_name, alias_name=alias)))
+    client.update_collection_aliases(change_aliases_operations=operations)
+    logger.info(f"Alias {alias} now points to {collection_name} (previously {previous})")
+    return previous
+
+
+def _migrate_to_alias(client, alias: str, collection_name: str) -> None:
+    """Thay collection thường alias bằng alias cùng tên trỏ tới collection_name (một lần, không rollback được)."""
+    staging = f"{alias}_migrating"
+    client.update_collection_aliases(change_aliases_operations=[
+        models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name=collection_name, alias_name=staging))
+    ])
+    if resolve_collection(client, staging) != collection_name:
+        raise RuntimeError(f"Staging alias {staging} does not point to {collection_name}, {alias} left unchanged")
+    staged_points = client.count(collection_name=staging, exact=True).count
+    logger.warning(f"Collection {alias} is a plain collection, replacing it with an alias to {collection_name} ({staged_points} points, no rollback)")
+
+    client.delete_collection(collection_name=alias)
+    try:
+        client.update_collection_aliases(change_aliases_operations=[
+            models.DeleteAliasOperation(delete_alias=models.DeleteAlias(alias_name=staging)),
+            models.CreateAliasOperation(create_alias=models.CreateAlias(collection_name=collection_name, alias_name=alias)),
+        ])
+    except Exception as e:
+        logger.error(
+            f"Deleted collection {alias} but failed to create alias {alias} -> {collection_name}: {str(e)}. "
+            f"The new index is intact in {collection_name} (alias {staging}); restore the alias with "
+            f"`python scripts/reindex_rag.py --alias {alias} --rollback`, which points {alias} at the newest versioned collection"
+        )
+        raise
+    logger.info(f"Alias {alias} now points to {collection_name} (migrated from a plain collection)")
@@ -0,0 +1,133 @@
+# utils/rag_manifest.py
+import hashlib
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: không khóa được, chỉ chạy một worker
+    fcntl = None
+
+from config.env import RAG_MANIFEST_PATH
+from utils.logging import setup_logging
+
+logger = setup_logging()
+
+# Namespace cố định để point ID chỉ phụ thuộc vào (file hash, chunk index)
+POINT_ID_NAMESPACE = uuid.UUID("6f1c2b7e-3a4d-5e8f-9a0b-1c2d3e4f5a6b")
+HASH_BLOCK_SIZE = 1 << 20
+
+
+def file_sha256(filepath: str) -> str:
+    sha = hashlib.sha256()
+    with open(filepath, "rb") as file:
+        for block in iter(lambda: file.read(HASH_BLOCK_SIZE), b""):
+            sha.update(block)
+    return sha.hexdigest()
+
+
+def point_id(file_hash: str, chunk_index: int) -> str:
+    """Point ID ổn định: cùng nội dung file và cùng vị trí chunk luôn cho cùng một UUID."""
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, f"{file_hash}:{chunk_index}"))
+
+
+def collection_manifest_path(collection_name: str, path: str = RAG_MANIFEST_PATH) -> str:
+    """Manifest của một collection có phiên bản đang được build (reindex), cạnh manifest của alias."""
+    root, ext = os.path.splitext(path)
+    return f"{root}.{collection_name}{ext or '.json'}"
+
+
+class RagManifest:
+    """Manifest {filename: {"hash", "point_ids", "ingested_at"}} của các file đã nạp vào Qdrant."""
+
+    def __init__(self, path: str = RAG_MANIFEST_PATH, settings: dict = None, shared: bool = False):
+        """settings: cấu hình ảnh hưởng tới chunk/vector (chunker, model...). Khác với lần nạp trước thì mọi file được nạp lại.
+        shared: nhiều worker cùng nạp (job table) - save() khóa file, đọc lại manifest trên đĩa và chỉ ghi đè các file worker này đã record/remove.
+        """
+        self.path = path
+        self.settings = settings or {}
+        self.shared = shared
+        self.touched = set()
+        self.rewrite = False
+        self.files = self._read()
+
+    def _read(self, log: bool = True) -> dict:
+        if not os.path.exists(self.path):
+            return {}
+        try:
+            with open(self.path, "r") as file:
+                data = json.load(file)
+            files = data.get("files", {})
+            if data.get("settings", {}) != self.settings:
+                if log:
+                    logger.info("RAG ingestion settings changed, all files will be re-ingested")
+                for entry in files.values():
+                    entry["hash"] = None
+            return files
+        except Exception as e:
+            logger.error(f"Failed to read RAG manifest {self.path}, starting empty: {str(e)}")
+            return {}
+
+    def diff(self, current_hashes: dict) -> tuple:
+        """So sánh {filename: hash} hiện tại với manifest.
+
+        Returns:
+            tuple: (changed, removed, unchanged) - changed gồm file mới và file có hash khác.
+        """
+        changed = [name for name, digest in current_hashes.items() if self.files.get(name, {}).get("hash") != digest]
+        removed = [name for name in self.files if name not in current_hashes]
+        unchanged = [name for name in current_hashes if name not in changed]
+        return changed, removed, unchanged
+
+    def point_ids(self, filename: str) -> list:
+        return self.files.get(filename, {}).get("point_ids", [])
+
+    def all_point_ids(self) -> list:
+        return [pid for entry in self.files.values() for pid in entry.get("point_ids", [])]
+
+    def record(self, filename: str, file_hash: str, point_ids: list) -> None:
+        self.files[filename] = {"hash": file_hash, "point_ids": point_ids, "ingested_at": int(time.time())}
+        self.touched.add(filename)
+
+    def remove(self, filename: str) -> None:
+        self.files.pop(filename, None)
+        self.touched.add(filename)
+
+    def clear(self) -> None:
+        self.files = {}
+        self.rewrite = True
+
+    @contextmanager
+    def _lock(self):
+        if not self.shared or fcntl is None:
+            yield
+            return
+        with open(self.path + ".lock", "w") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def save(self) -> None:
+        """Ghi file tạm rồi os.replace để không bao giờ để lại manifest dở dang."""
+        os.makedirs(os.path.dirname(self.path) or ".", exist_ok=True)
+        with self._lock():
+            if self.shared and not self.rewrite:
+                # Giữ các file worker khác đã ghi kể từ lúc manifest này được đọc
+                files = self._read(log=False)
+                for filename in self.touched:
+                    if filename in self.files:
+                        files[filename] = self.files[filename]
+                    else:
+                        files.pop(filename, None)
+                self.files = files
+            tmp_path = f"{self.path}.{os.getpid()}.tmp" if self.shared else self.path + ".tmp"
+            with open(tmp_path, "w") as file:
+                json.dump({"settings": self.settings, "files": self.files}, file)
+            os.replace(tmp_path, self.path)
+        self.touched.clear()
+        self.rewrite = False
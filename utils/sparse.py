@@ -0,0 +1,49 @@
+# utils/sparse.py
+import re
+import zlib
+from collections import Counter
+
+# Lexical index cho hybrid search: term frequency kiểu BM25 ở phía document,
+# IDF do Qdrant tính (SparseVectorParams(modifier=IDF)) nên không cần thống kê toàn corpus lúc ingest.
+BM25_K1 = 1.2
+BM25_B = 0.75
+AVG_DOC_TERMS = 150
+TOKEN_RE = re.compile(r"[a-z0-9]+(?:[.,][0-9]+)*")
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or that the this to was were will with".split()
+)
+
+
+def tokenize(text: str) -> list:
+    """Unigram và bigram liền kề (sau khi bỏ stopword) để giữ các cụm như 'diluted earnings', 'fy 2023'."""
+    words = [word for word in TOKEN_RE.findall(text.lower()) if word not in STOPWORDS]
+    return words + [f"{a} {b}" for a, b in zip(words, words[1:])]
+
+
+def term_index(term: str) -> int:
+    # crc32 ổn định giữa các process (khác hash() của Python)
+    return zlib.crc32(term.encode("utf-8")) & 0x7FFFFFFF
+
+
+def _to_sparse(weights: dict) -> tuple:
+    merged = {}
+    for term, weight in weights.items():
+        index = term_index(term)
+        merged[index] = merged.get(index, 0.0) + weight
+    indices = sorted(merged)
+    return indices, [merged[i] for i in indices]
+
+
+def encode_document(text: str) -> tuple:
+    """(indices, values) cho một chunk: tf bão hòa và chuẩn hóa theo độ dài (phần tf của BM25)."""
+    terms = tokenize(text)
+    if not terms:
+        return [], []
+    length_norm = 1 - BM25_B + BM25_B * len(terms) / AVG_DOC_TERMS
+    weights = {term: tf * (BM25_K1 + 1) / (tf + BM25_K1 * length_norm) for term, tf in Counter(terms).items()}
+    return _to_sparse(weights)
+
+
+def encode_query(text: str) -> tuple:
+    """(indices, values) cho query: mỗi term một lần, trọng số 1 (IDF được áp ở phía Qdrant)."""
+    return _to_sparse({term: 1.0 for term in set(tokenize(text))})
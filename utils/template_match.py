@@ -0,0 +1,89 @@
+# utils/template_match.py
+import re
+
+# Từ chỉ phép tổng hợp: template chỉ trả về chuỗi giá trị thô, query có các từ này phải qua sql_agent
+AGGREGATE_TERMS = re.compile(
+    r"\b(highest|lowest|max|maximum|min|minimum|peak|average|avg|mean|median|total|sum"
+    r"|difference|change|growth|increase|decrease|percent|percentage|rank|top|best|worst|why|how much|volatility)\b"
+)
+# So sánh một chuỗi giữa nhiều tickers chính là kết quả sql_multi (một dòng mỗi symbol); với một ticker thì không rõ so với gì
+COMPARISON_TERMS = re.compile(r"\b(compare|comparison|versus|vs)\b")
+# Khoảng thời gian cửa sổ ("30-day", "7 day") chỉ khớp template có window đúng bằng số đó
+WINDOW_TERM = re.compile(r"\b(\d+)[- ]?day\b")
+SQL_WINDOW = re.compile(r"ROWS BETWEEN (\d+) PRECEDING", re.IGNORECASE)
+# Template lọc đúng một ngày (date = start_date) và template khoảng ngày (date BETWEEN start_date AND end_date)
+SINGLE_DAY_SQL = re.compile(r"\bdate = '\{start_date\}'")
+RANGE_SQL = re.compile(r"\bdate BETWEEN '\{start_date\}' AND '\{end_date\}'")
+
+
+def _keyword_spans(query: str, keywords: list) -> list:
+    return [match.span() for keyword in keywords for match in re.finditer(re.escape(keyword), query)]
+
+
+def _covered(spans: list) -> int:
+    """Số ký tự của query nằm trong ít nhất một span."""
+    covered, end = 0, -1
+    for start, stop in sorted(spans):
+        if stop > end:
+            covered += stop - max(start, end)
+            end = stop
+    return covered
+
+
+def _range_template(templates: list, template: dict) -> dict:
+    """Template cùng cột kết quả với template một ngày nhưng lọc theo khoảng ngày, hoặc None."""
+    for other in templates:
+        if other is not template and other.get("required_columns") == template.get("required_columns") and RANGE_SQL.search(other.get("sql", "")):
+            return other
+    return None
+
+
+def match_template(templates: list, sub_query: str, tickers: list = None, date_range: dict = None) -> dict:
+    """Template khớp query một cách không mơ hồ, hoặc None nếu phải để sql_agent quyết định.
+
+    Khác select_template (template đầu tiên có keyword xuất hiện), dùng để bỏ qua LLM nên chỉ nhận khi:
+    - một template phủ nhiều ký tự của query bằng intent_keywords nhất; khi hòa, template có tập keyword rộng hơn
+      (biến thể chuyên biệt như rolling average) bị loại vì các keyword riêng của nó không có trong query;
+    - phần còn lại của query không chứa từ tổng hợp (highest, average...), hay từ so sánh (compare, vs...) khi chỉ có một ticker;
+    - khoảng "N-day" (nếu có) đúng bằng cửa sổ trong SQL của template.
+    Template một ngày (single_value) chỉ dùng khi date_range là một ngày; khoảng nhiều ngày (hoặc không có date_range,
+    mặc định cả năm 2024) dùng template khoảng ngày cùng cột, vì ngày đầu khoảng có thể là ngày nghỉ.
+    """
+    query = sub_query.lower()
+    scored = []
+    for template in templates:
+        keywords = template.get("intent_keywords", [])
+        spans = _keyword_spans(query, keywords)
+        if spans:
+            scored.append((_covered(spans), template, spans))
+    if not scored:
+        return None
+    best = max(score for score, _, _ in scored)
+    tied = [(template, spans) for score, template, spans in scored if score == best]
+    if len(tied) > 1:
+        keyword_sets = [set(template.get("intent_keywords", [])) for template, _ in tied]
+        tied = [
+            (template, spans) for (template, spans), keywords in zip(tied, keyword_sets)
+            if not any(other < keywords for other in keyword_sets)
+        ]
+    if len(tied) != 1:
+        return None
+    template, spans = tied[0]
+
+    remainder = query
+    for start, stop in sorted(spans, reverse=True):
+        remainder = remainder[:start] + " " + remainder[stop:]
+    if AGGREGATE_TERMS.search(remainder):
+        return None
+    if len(tickers or []) < 2 and COMPARISON_TERMS.search(remainder):
+        return None
+    window = WINDOW_TERM.search(remainder)
+    if window:
+        sql_window = SQL_WINDOW.search(template.get("sql", ""))
+        if sql_window is None or int(window.group(1)) != int(sql_window.group(1)) + 1:
+            return None
+    if SINGLE_DAY_SQL.search(template.get("sql", "")):
+        single_day = bool(date_range) and date_range.get("start_date") is not None and date_range.get("start_date") == date_range.get("end_date")
+        if not single_day:
+            return _range_template(templates, template)
+    return template
@@ -0,0 +1,526 @@
+# utils/vector_index.py
+import json
+import math
+import os
+import shutil
+import threading
+import time
+from collections import defaultdict
+from contextlib import contextmanager
+
+try:
+    import fcntl
+except ImportError:  # Windows: không khóa được giữa các process, chỉ chạy một writer
+    fcntl = None
+
+import numpy as np
+from config.env import EMBEDDED_EXACT_MAX_ROWS, IVF_NPROBE
+from utils.logging import setup_logging
+
+logger = setup_logging()
+
+CURRENT_FILE = "CURRENT"
+LOCK_FILE = "LOCK"
+VECTORS_FILE = "vectors.f32"
+OPS_FILE = "ops.jsonl"
+IVF_FILE = "ivf.npz"
+KMEANS_ITERATIONS = 10
+KMEANS_SAMPLE = 100_000
+SCORE_BLOCK_ROWS = 65_536
+NO_YEAR = -1
+NO_COMPANY = -1
+NO_FILENAME = -1
+# payload "level": chunk (mặc định khi thiếu), section và document là vector tóm tắt dùng cho retrieval hai tầng
+POINT_LEVELS = ("chunk", "section", "document")
+
+
+class SearchHit:
+    """Kết quả search, cùng thuộc tính id/score/payload/vector với ScoredPoint của Qdrant."""
+    __slots__ = ("id", "score", "payload", "vector")
+
+    def __init__(self, id, score: float, payload: dict, vector: list = None):
+        self.id = id
+        self.score = score
+        self.payload = payload
+        self.vector = vector
+
+
+def normalize_rows(vectors: np.ndarray) -> np.ndarray:
+    vectors = np.asarray(vectors, dtype=np.float32)
+    norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+    return vectors / np.maximum(norms, 1e-12)
+
+
+def top_k(scores: np.ndarray, rows: np.ndarray, k: int) -> list:
+    """[(row, score)] của k điểm cao nhất, giảm dần."""
+    if len(scores) == 0 or k <= 0:
+        return []
+    if len(scores) > k:
+        picked = np.argpartition(-scores, k - 1)[:k]
+    else:
+        picked = np.arange(len(scores))
+    picked = picked[np.argsort(-scores[picked], kind="stable")]
+    return [(int(rows[i]), float(scores[i])) for i in picked]
+
+
+def kmeans(vectors: np.ndarray, n_lists: int, iterations: int = KMEANS_ITERATIONS, seed: int = 42) -> np.ndarray:
+    """Spherical k-means (cosine) cho IVF; vectors đã chuẩn hóa."""
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), size=n_lists, replace=False)].copy()
+    for _ in range(iterations):
+        assignment = assign_lists(vectors, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, assignment, vectors)
+        empty = np.bincount(assignment, minlength=n_lists) == 0
+        # List rỗng lấy lại một vector ngẫu nhiên để không mất centroid
+        sums[empty] = vectors[rng.choice(len(vectors), size=int(empty.sum()))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+def assign_lists(vectors: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    assignment = np.empty(len(vectors), dtype=np.int32)
+    for start in range(0, len(vectors), SCORE_BLOCK_ROWS):
+        block = np.asarray(vectors[start:start + SCORE_BLOCK_ROWS])
+        assignment[start:start + len(block)] = np.argmax(block @ centroids.T, axis=1)
+    return assignment
+
+
+class EmbeddedVectorIndex:
+    """Vector index chạy trong process, thay cho Qdrant server khi phát triển local, CI hoặc edge.
+
+    Mỗi generation (thư mục trỏ bởi CURRENT) gồm vectors.f32 (float32 đã chuẩn hóa, chỉ ghi nối thêm, đọc qua memmap),
+    ops.jsonl (log upsert/delete kèm payload và sparse vector) và ivf.npz (IVF tùy chọn do build_index tạo).
+    Vector được ghi trước dòng log nên reader ở process khác không bao giờ thấy log trỏ tới vector chưa có.
+    Writer (upsert/delete/clear/build_index) giữ flock trên LOCK trong thư mục index, nên nhiều process nạp cùng lúc
+    (job table, ingest worker nền) không ghi trùng số row và build_index không bỏ sót row đang được ghi thêm;
+    reader không cần khóa và tự nạp phần log mới khi search.
+    """
+
+    def __init__(self, index_dir: str, dim: int, exact_max_rows: int = EMBEDDED_EXACT_MAX_ROWS, nprobe: int = IVF_NPROBE):
+        self.index_dir = index_dir
+        self.dim = dim
+        self.exact_max_rows = exact_max_rows
+        self.nprobe = nprobe
+        self._lock = threading.RLock()
+        self._reset(None)
+        with self._lock:
+            self._refresh()
+
+    def _reset(self, generation) -> None:
+        self.generation = generation
+        self.ops_offset = 0
+        self.vectors = None
+        self.id_to_row = {}
+        self.row_ids = []
+        self.payloads = []
+        # Bộ đệm tăng gấp đôi khi đầy; self.alive là view độ dài đúng bằng số row
+        self._alive = np.zeros(0, dtype=bool)
+        self.alive = self._alive
+        # Cột filter: company/filename lưu dạng mã số nguyên để mask bằng np.isin trên int32
+        self.company_codes = {}
+        self.companies = []
+        self.filename_codes = {}
+        self.filenames = []
+        self.levels = []
+        self.years = []
+        self.postings = defaultdict(dict)
+        self.row_terms = []
+        self.ivf = None
+        self.ivf_mtime = None
+        self._columns = None
+
+    # ---- Đọc trạng thái từ đĩa ----
+
+    def _generation_dir(self, generation: str = None) -> str:
+        return os.path.join(self.index_dir, generation or self.generation)
+
+    def _current_generation(self):
+        try:
+            with open(os.path.join(self.index_dir, CURRENT_FILE)) as file:
+                return file.read().strip() or None
+        except FileNotFoundError:
+            return None
+
+    def _refresh(self) -> None:
+        """Nạp phần log mới; generation đổi (build_index vừa compact) thì nạp lại từ đầu."""
+        generation = self._current_generation()
+        if generation != self.generation:
+            self._reset(generation)
+        if generation is None:
+            return
+        ops_path = os.path.join(self._generation_dir(), OPS_FILE)
+        if os.path.exists(ops_path) and os.path.getsize(ops_path) > self.ops_offset:
+            with open(ops_path, "rb") as file:
+                file.seek(self.ops_offset)
+                data = file.read()
+            # Bỏ dòng cuối dở dang nếu writer đang ghi giữa chừng
+            complete = data[:data.rfind(b"\n") + 1]
+            for line in complete.splitlines():
+                if line.strip():
+                    self._apply(json.loads(line))
+            self.ops_offset += len(complete)
+            rows = len(self.row_ids)
+            if rows:
+                self.vectors = np.memmap(os.path.join(self._generation_dir(), VECTORS_FILE), dtype=np.float32, mode="r", shape=(rows, self.dim))
+            self._columns = None
+        ivf_path = os.path.join(self._generation_dir(), IVF_FILE)
+        ivf_mtime = os.path.getmtime(ivf_path) if os.path.exists(ivf_path) else None
+        if ivf_mtime != self.ivf_mtime:
+            self.ivf = dict(np.load(ivf_path)) if ivf_mtime is not None else None
+            self.ivf_mtime = ivf_mtime
+
+    def _apply(self, op: dict) -> None:
+        if op["op"] == "upsert":
+            row = op["row"]
+            self._kill(self.id_to_row.get(op["id"]))
+            while len(self.row_ids) <= row:
+                self.row_ids.append(None)
+                self.payloads.append(None)
+                self.companies.append(NO_COMPANY)
+                self.filenames.append(NO_FILENAME)
+                self.levels.append(0)
+                self.years.append(NO_YEAR)
+                self.row_terms.append(())
+            if len(self.row_ids) > len(self._alive):
+                grown = np.zeros(max(len(self.row_ids), 2 * len(self._alive)), dtype=bool)
+                grown[:len(self._alive)] = self._alive
+                self._alive = grown
+            self.alive = self._alive[:len(self.row_ids)]
+            payload = op.get("payload") or {}
+            self.id_to_row[op["id"]] = row
+            self.row_ids[row] = op["id"]
+            self.payloads[row] = payload
+            company = payload.get("company")
+            self.companies[row] = NO_COMPANY if company is None else self.company_codes.setdefault(company, len(self.company_codes))
+            filename = payload.get("filename")
+            self.filenames[row] = NO_FILENAME if filename is None else self.filename_codes.setdefault(filename, len(self.filename_codes))
+            self.levels[row] = POINT_LEVELS.index(payload["level"]) if payload.get("level") in POINT_LEVELS else 0
+            self.years[row] = payload["year"] if isinstance(payload.get("year"), int) else NO_YEAR
+            self.alive[row] = True
+            if op.get("sparse"):
+                indices, values = op["sparse"]
+                for index, value in zip(indices, values):
+                    self.postings[index][row] = value
+                self.row_terms[row] = tuple(indices)
+        elif op["op"] == "delete":
+            for point_id in op["ids"]:
+                self._kill(self.id_to_row.pop(point_id, None))
+
+    def _kill(self, row) -> None:
+        if row is None:
+            return
+        self.alive[row] = False
+        self.payloads[row] = None
+        for index in self.row_terms[row]:
+            self.postings[index].pop(row, None)
+        self.row_terms[row] = ()
+
+    def _filter_columns(self) -> tuple:
+        if self._columns is None:
+            self._columns = tuple(np.array(column, dtype=np.int32) for column in (self.companies, self.years, self.filenames, self.levels))
+        return self._columns
+
+    # ---- Ghi ----
+
+    @contextmanager
+    def _write_lock(self):
+        """Khóa ghi giữa các thread (RLock) và giữa các process (flock trên LOCK_FILE)."""
+        with self._lock:
+            if fcntl is None:
+                yield
+                return
+            os.makedirs(self.index_dir, exist_ok=True)
+            with open(os.path.join(self.index_dir, LOCK_FILE), "w") as lock_file:
+                fcntl.flock(lock_file, fcntl.LOCK_EX)
+                try:
+                    yield
+                finally:
+                    fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _ensure_generation(self) -> None:
+        if self.generation is not None:
+            return
+        os.makedirs(self.index_dir, exist_ok=True)
+        generation = f"g{time.time_ns()}"
+        os.makedirs(self._generation_dir(generation))
+        self._write_current(generation)
+        self._reset(generation)
+
+    def _write_current(self, generation: str) -> None:
+        tmp_path = os.path.join(self.index_dir, CURRENT_FILE + ".tmp")
+        with open(tmp_path, "w") as file:
+            file.write(generation)
+        os.replace(tmp_path, os.path.join(self.index_dir, CURRENT_FILE))
+
+    def _discard_partial_writes(self) -> None:
+        """Cắt phần ghi dở của writer bị crash (giữ write lock, sau _refresh).
+
+        Vector được ghi trước dòng log: crash giữa hai bước để lại vector thừa cuối vectors.f32, và dòng log cuối
+        có thể dở dang. Không cắt thì batch sau được ghi nối sau phần thừa và mọi row mới trỏ nhầm vector.
+        """
+        vectors_path = os.path.join(self._generation_dir(), VECTORS_FILE)
+        expected = len(self.row_ids) * self.dim * np.dtype(np.float32).itemsize
+        if os.path.exists(vectors_path) and os.path.getsize(vectors_path) > expected:
+            logger.warning(f"Truncating {os.path.getsize(vectors_path) - expected} stray bytes from {vectors_path} (interrupted write)")
+            os.truncate(vectors_path, expected)
+        ops_path = os.path.join(self._generation_dir(), OPS_FILE)
+        if os.path.exists(ops_path) and os.path.getsize(ops_path) > self.ops_offset:
+            logger.warning(f"Truncating incomplete last line of {ops_path} (interrupted write)")
+            os.truncate(ops_path, self.ops_offset)
+
+    def _append_ops(self, ops: list) -> None:
+        with open(os.path.join(self._generation_dir(), OPS_FILE), "a") as file:
+            file.write("".join(json.dumps(op, ensure_ascii=False) + "\n" for op in ops))
+
+    def upsert(self, ids: list, vectors, payloads: list, sparse_vectors: list = None) -> None:
+        """Ghi (hoặc ghi đè theo id) một batch point.
+
+        Args:
+            ids (list): Point ID (string/int, dùng được làm key JSON).
+            vectors: Mảng (n, dim); được chuẩn hóa để inner product bằng cosine.
+            payloads (list): Payload dict của từng point.
+            sparse_vectors (list): (indices, values) của từng point hoặc None.
+        """
+        if not ids:
+            return
+        vectors = normalize_rows(vectors).reshape(len(ids), self.dim)
+        with self._write_lock():
+            # Nạp log mới nhất (kể cả generation do process khác vừa tạo/compact) trước khi lấy số row
+            self._refresh()
+            self._ensure_generation()
+            self._discard_partial_writes()
+            first_row = len(self.row_ids)
+            with open(os.path.join(self._generation_dir(), VECTORS_FILE), "ab") as file:
+                file.write(np.ascontiguousarray(vectors).tobytes())
+            sparse_vectors = sparse_vectors or [None] * len(ids)
+            self._append_ops([
+                {"op": "upsert", "id": point_id, "row": first_row + i, "payload": payload, "sparse": sparse_vector}
+                for i, (point_id, payload, sparse_vector) in enumerate(zip(ids, payloads, sparse_vectors))
+            ])
+            self._refresh()
+
+    def delete(self, ids: list) -> None:
+        if not ids:
+            return
+        with self._write_lock():
+            self._refresh()
+            if self.generation is None:
+                return
+            self._discard_partial_writes()
+            self._append_ops([{"op": "delete", "ids": list(ids)}])
+            self._refresh()
+
+    def clear(self) -> None:
+        """Xóa toàn bộ index (tương đương xóa và tạo lại collection)."""
+        with self._write_lock():
+            if os.path.isdir(self.index_dir):
+                for name in os.listdir(self.index_dir):
+                    if name.startswith("g") and os.path.isdir(os.path.join(self.index_dir, name)):
+                        shutil.rmtree(os.path.join(self.index_dir, name), ignore_errors=True)
+                    elif name.startswith(CURRENT_FILE):
+                        os.remove(os.path.join(self.index_dir, name))
+            self._reset(None)
+
+    def count(self) -> int:
+        with self._lock:
+            self._refresh()
+            return int(self.alive.sum())
+
+    def iter_points(self, batch_size: int = 10_000):
+        """Duyệt các point còn sống theo batch: list các (id, vector, payload, sparse) với sparse là [indices, values] hoặc None."""
+        with self._lock:
+            self._refresh()
+            live_rows = np.flatnonzero(self.alive) if self.generation is not None else np.zeros(0, dtype=np.int64)
+            for start in range(0, len(live_rows), batch_size):
+                rows = live_rows[start:start + batch_size]
+                vectors = np.asarray(self.vectors[rows])
+                batch = []
+                for row, vector in zip(rows, vectors):
+                    terms = self.row_terms[row]
+                    sparse_vector = [list(terms), [self.postings[index][row] for index in terms]] if terms else None
+                    batch.append((self.row_ids[row], vector, self.payloads[row], sparse_vector))
+                yield batch
+
+    def build_index(self, n_lists: int = None) -> dict:
+        """Compact các row đã bị xóa/ghi đè sang generation mới và train IVF (k-means) trên toàn bộ vector.
+
+        Corpus nhỏ hơn exact_max_rows không cần IVF (search chính xác đã đủ nhanh) nên chỉ compact.
+        Reader đang mở generation cũ chuyển sang generation mới ở lần search kế tiếp.
+        """
+        with self._write_lock():
+            self._refresh()
+            live_rows = np.flatnonzero(self.alive)
+            if self.generation is None or not len(live_rows):
+                return {"rows": 0, "lists": 0}
+            old_dir = self._generation_dir()
+            generation = f"g{time.time_ns()}"
+            new_dir = self._generation_dir(generation)
+            os.makedirs(new_dir)
+            try:
+                vectors = np.empty((len(live_rows), self.dim), dtype=np.float32)
+                for start in range(0, len(live_rows), SCORE_BLOCK_ROWS):
+                    vectors[start:start + SCORE_BLOCK_ROWS] = self.vectors[live_rows[start:start + SCORE_BLOCK_ROWS]]
+                vectors.tofile(os.path.join(new_dir, VECTORS_FILE))
+                with open(os.path.join(new_dir, OPS_FILE), "w") as file:
+                    for new_row, row in enumerate(live_rows):
+                        terms = self.row_terms[row]
+                        op = {
+                            "op": "upsert",
+                            "id": self.row_ids[row],
+                            "row": new_row,
+                            "payload": self.payloads[row],
+                            "sparse": [list(terms), [self.postings[index][row] for index in terms]] if terms else None,
+                        }
+                        file.write(json.dumps(op, ensure_ascii=False) + "\n")
+                n_lists = n_lists or (int(math.sqrt(len(vectors))) if len(vectors) > self.exact_max_rows else 0)
+                if n_lists:
+                    sample = vectors
+                    if len(vectors) > KMEANS_SAMPLE:
+                        sample = vectors[np.random.default_rng(0).choice(len(vectors), size=KMEANS_SAMPLE, replace=False)]
+                    centroids = kmeans(sample, min(n_lists, len(sample)))
+                    assignment = assign_lists(vectors, centroids)
+                    order = np.argsort(assignment, kind="stable").astype(np.int64)
+                    offsets = np.concatenate([[0], np.cumsum(np.bincount(assignment, minlength=len(centroids)))]).astype(np.int64)
+                    np.savez(os.path.join(new_dir, IVF_FILE), centroids=centroids, offsets=offsets, rows=order, built_rows=np.int64(len(vectors)))
+            except Exception:
+                shutil.rmtree(new_dir, ignore_errors=True)
+                raise
+            self._write_current(generation)
+            self._refresh()
+            shutil.rmtree(old_dir, ignore_errors=True)
+            logger.info(f"Built embedded vector index {generation}: {len(live_rows)} rows, {n_lists} IVF lists")
+            return {"rows": len(live_rows), "lists": n_lists}
+
+    # ---- Search ----
+
+    def _filter_mask(self, companies: list = None, year_range: tuple = None, filenames: list = None, levels: tuple = None) -> np.ndarray:
+        mask = self.alive.copy()
+        company_column, year_column, filename_column, level_column = self._filter_columns()
+        mask &= np.isin(level_column, [POINT_LEVELS.index(level) for level in (levels or ("chunk",))])
+        if filenames:
+            mask &= np.isin(filename_column, [self.filename_codes[name] for name in filenames if name in self.filename_codes])
+        if companies:
+            codes = [self.company_codes[company] for company in companies if company in self.company_codes]
+            mask &= np.isin(company_column, codes)
+        if year_range is not None:
+            gte, lte = year_range
+            mask &= year_column != NO_YEAR
+            if gte is not None:
+                mask &= year_column >= gte
+            if lte is not None:
+                mask &= year_column <= lte
+        return mask
+
+    def _ivf_candidates(self, query: np.ndarray) -> np.ndarray:
+        centroids = self.ivf["centroids"]
+        probes = np.argsort(-(centroids @ query))[:self.nprobe]
+        offsets, rows = self.ivf["offsets"], self.ivf["rows"]
+        candidates = [rows[offsets[probe]:offsets[probe + 1]] for probe in probes]
+        # Row ghi thêm sau lần build_index chưa thuộc list nào: quét chính xác
+        candidates.append(np.arange(int(self.ivf["built_rows"]), len(self.row_ids)))
+        return np.concatenate(candidates)
+
+    def _score_rows(self, query: np.ndarray, rows: np.ndarray, limit: int) -> list:
+        scores = np.empty(len(rows), dtype=np.float32)
+        for start in range(0, len(rows), SCORE_BLOCK_ROWS):
+            block = rows[start:start + SCORE_BLOCK_ROWS]
+            scores[start:start + len(block)] = np.asarray(self.vectors[block]) @ query
+        return top_k(scores, rows, limit)
+
+    def _scan_batch(self, queries: np.ndarray, masks: list, limits: list) -> list:
+        """Quét toàn bộ ma trận một lần cho cả batch query (một phép nhân ma trận mỗi block)."""
+        partial = [[] for _ in range(len(queries))]
+        for start in range(0, len(self.row_ids), SCORE_BLOCK_ROWS):
+            block_scores = np.asarray(self.vectors[start:start + SCORE_BLOCK_ROWS]) @ queries.T
+            for j in range(len(queries)):
+                rows = np.flatnonzero(masks[j][start:start + len(block_scores)])
+                partial[j].extend(top_k(block_scores[rows, j], rows + start, limits[j]))
+        return [sorted(hits, key=lambda hit: -hit[1])[:limit] for hits, limit in zip(partial, limits)]
+
+    def _dense_search_batch(self, queries: np.ndarray, masks: list, limits: list, exact: bool = False) -> list:
+        results = [[] for _ in range(len(queries))]
+        scan = []
+        for j, (query, mask, limit) in enumerate(zip(queries, masks, limits)):
+            selected = int(mask.sum())
+            if not selected:
+                continue
+            # Corpus (hoặc tập đã lọc) nhỏ thì exact; IVF chỉ dùng khi còn đủ ứng viên sau filter
+            if not exact and self.ivf is not None and selected > self.exact_max_rows:
+                candidates = self._ivf_candidates(query)
+                rows = np.sort(candidates[mask[candidates]])
+                if len(rows) >= limit:
+                    results[j] = self._score_rows(query, rows, limit)
+                    continue
+            if selected * 8 < len(mask):
+                # Filter chọn lọc: chỉ đọc các row đã lọc
+                results[j] = self._score_rows(query, np.flatnonzero(mask), limit)
+            else:
+                scan.append(j)
+        if scan:
+            for j, hits in zip(scan, self._scan_batch(queries[scan], [masks[j] for j in scan], [limits[j] for j in scan])):
+                results[j] = hits
+        return results
+
+    def _sparse_search(self, indices: list, mask: np.ndarray, limit: int) -> list:
+        """BM25: tf đã tính lúc ingest (utils/sparse.py), IDF theo công thức của Qdrant trên các row còn sống."""
+        total = int(self.alive.sum())
+        scores = defaultdict(float)
+        for index in indices:
+            posting = self.postings.get(index)
+            if not posting:
+                continue
+            idf = math.log((total - len(posting) + 0.5) / (len(posting) + 0.5) + 1)
+            for row, value in posting.items():
+                if mask[row]:
+                    scores[row] += idf * value
+        if not scores:
+            return []
+        rows = np.fromiter(scores.keys(), dtype=np.int64, count=len(scores))
+        return top_k(np.fromiter(scores.values(), dtype=np.float32, count=len(scores)), rows, limit)
+
+    def search(self, query_vector, companies: list = None, year_range: tuple = None, limit: int = 5,
+               sparse_query: tuple = None, prefetch_limit: int = 20, exact: bool = False, with_vectors: bool = False,
+               filenames: list = None, levels: tuple = None) -> list:
+        """Top-k theo cosine với filter company (khớp một trong các tên), khoảng năm [gte, lte] và filename.
+
+        levels: các POINT_LEVELS được search, mặc định chỉ chunk.
+
+        sparse_query (indices, values) bật hybrid: dense và sparse mỗi nhánh lấy prefetch_limit kết quả
+        rồi gộp bằng reciprocal rank fusion, tương đương query_points(prefetch, FusionQuery(RRF)) của QdrantBackend.
+        with_vectors: kèm vector (đã chuẩn hóa) của point trong SearchHit.vector.
+        """
+        request = {
+            "query_vector": query_vector, "companies": companies, "year_range": year_range,
+            "limit": limit, "sparse_query": sparse_query, "prefetch_limit": prefetch_limit, "with_vectors": with_vectors,
+            "filenames": filenames, "levels": levels,
+        }
+        return self.search_batch([request], exact)[0]
+
+    def search_batch(self, requests: list, exact: bool = False) -> list:
+        """search() cho nhiều request (dict cùng tham số) một lần: nhánh dense exact dùng chung một lượt quét ma trận."""
+        with self._lock:
+            self._refresh()
+            if self.vectors is None or not requests:
+                return [[] for _ in requests]
+            masks = [
+                self._filter_mask(request.get("companies"), request.get("year_range"), request.get("filenames"), request.get("levels"))
+                for request in requests
+            ]
+            queries = normalize_rows(np.stack([np.asarray(request["query_vector"], dtype=np.float32) for request in requests]))
+            hybrid = [bool(request.get("sparse_query") and request["sparse_query"][0]) for request in requests]
+            limits = [request.get("prefetch_limit", 20) if is_hybrid else request.get("limit", 5) for request, is_hybrid in zip(requests, hybrid)]
+            dense = self._dense_search_batch(queries, masks, limits, exact)
+            results = []
+            for request, mask, is_hybrid, limit, ranked in zip(requests, masks, hybrid, limits, dense):
+                if is_hybrid:
+                    fused = defaultdict(float)
+                    for branch in (ranked, self._sparse_search(request["sparse_query"][0], mask, limit)):
+                        for rank, (row, _) in enumerate(branch):
+                            fused[row] += 1.0 / (rank + 1)
+                    ranked = sorted(fused.items(), key=lambda item: -item[1])[:request.get("limit", 5)]
+                results.append([
+                    SearchHit(self.row_ids[row], score, self.payloads[row], np.array(self.vectors[row]) if request.get("with_vectors") else None)
+                    for row, score in ranked
+                ])
+            return results